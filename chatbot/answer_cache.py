@@ -0,0 +1,140 @@
+"""
+Semantic answer cache for near-duplicate questions.
+
+Many citizen queries are paraphrases of each other ("when is property tax
+due", "property tax due date"). The chat pipeline looks up this cache after
+retrieval and before building the GPT-4o prompt: an answer is reused when a
+new query's embedding is within a cosine threshold of a cached query, in the
+same language, and retrieval returned the same top record IDs (so the answer
+is grounded in the same records). Follow-up questions depend on the
+conversation and bypass the cache.
+
+Configuration (environment variables):
+    ANSWER_CACHE_SIZE        max cached answers (default 1024, 0 disables the cache)
+    ANSWER_CACHE_THRESHOLD   min cosine similarity to reuse an answer (default 0.95)
+    ANSWER_CACHE_TTL         seconds before an answer expires (default 3600)
+    ANSWER_CACHE_MATCH_IDS   number of top record IDs that must match (default 3)
+"""
+
+import os
+import threading
+import time
+import numpy as np
+
+ANSWER_CACHE_SIZE = int(os.getenv('ANSWER_CACHE_SIZE', '1024'))
+ANSWER_CACHE_THRESHOLD = float(os.getenv('ANSWER_CACHE_THRESHOLD', '0.95'))
+ANSWER_CACHE_TTL = float(os.getenv('ANSWER_CACHE_TTL', '3600'))
+ANSWER_CACHE_MATCH_IDS = int(os.getenv('ANSWER_CACHE_MATCH_IDS', '3'))
+
+def _unit(vector):
+    vector = np.asarray(vector, dtype=np.float32)
+    norm = np.linalg.norm(vector)
+    return vector / norm if norm else vector
+
+class SemanticAnswerCache:
+    """Answers indexed by (language, top record IDs), matched by query-embedding cosine.
+
+    Query vectors live in one preallocated float32 matrix; a lookup only scores
+    the rows that share the request's language and record IDs.
+    """
+
+    def __init__(self, max_entries=ANSWER_CACHE_SIZE, threshold=ANSWER_CACHE_THRESHOLD,
+                 ttl=ANSWER_CACHE_TTL, match_ids=ANSWER_CACHE_MATCH_IDS):
+        self.max_entries = max_entries
+        self.threshold = threshold
+        self.ttl = ttl
+        self.match_ids = match_ids
+        self._lock = threading.Lock()
+        self._vectors = None           # (max_entries, dim) unit vectors, allocated on first store
+        self._slots = {}               # slot -> (key, answer, expires_at)
+        self._by_key = {}              # (lang, record ids) -> [slots]
+        self._last_used = np.zeros(max(max_entries, 0), dtype=np.int64)
+        self._clock = 0
+        self.hits = 0
+        self.misses = 0
+        self.bypasses = 0
+
+    def make_key(self, lang, doc_ids):
+        return (lang, tuple(doc_ids[:self.match_ids]))
+
+    def lookup(self, query_emb, lang, doc_ids):
+        """Return (answer, similarity) for a near-duplicate query, or (None, 0.0)"""
+        key = self.make_key(lang, doc_ids)
+        with self._lock:
+            slots = self._by_key.get(key)
+            if not slots or self._vectors is None:
+                self.misses += 1
+                return None, 0.0
+            now = time.monotonic()
+            for slot in [s for s in slots if self._slots[s][2] < now]:
+                self._free(slot)
+            slots = self._by_key.get(key)
+            if not slots:
+                self.misses += 1
+                return None, 0.0
+            sims = self._vectors[slots] @ _unit(query_emb)
+            best = int(np.argmax(sims))
+            if sims[best] < self.threshold:
+                self.misses += 1
+                return None, float(sims[best])
+            slot = slots[best]
+            self._clock += 1
+            self._last_used[slot] = self._clock
+            self.hits += 1
+            return self._slots[slot][1], float(sims[best])
+
+    def store(self, query_emb, lang, doc_ids, answer):
+        if self.max_entries <= 0 or not doc_ids:
+            return
+        vector = _unit(query_emb)
+        key = self.make_key(lang, doc_ids)
+        with self._lock:
+            if self._vectors is None:
+                self._vectors = np.zeros((self.max_entries, vector.shape[0]), dtype=np.float32)
+            if len(self._slots) < self.max_entries:
+                slot = len(self._slots)
+                while slot in self._slots:
+                    slot = (slot + 1) % self.max_entries
+            else:
+                # Evict the least recently used answer
+                slot = min(self._slots, key=lambda s: self._last_used[s])
+                self._free(slot)
+            self._vectors[slot] = vector
+            self._slots[slot] = (key, answer, time.monotonic() + self.ttl)
+            self._by_key.setdefault(key, []).append(slot)
+            self._clock += 1
+            self._last_used[slot] = self._clock
+
+    def record_bypass(self):
+        with self._lock:
+            self.bypasses += 1
+
+    def _free(self, slot):
+        key = self._slots.pop(slot)[0]
+        slots = self._by_key[key]
+        slots.remove(slot)
+        if not slots:
+            del self._by_key[key]
+
+    def clear(self):
+        with self._lock:
+            self._slots.clear()
+            self._by_key.clear()
+
+    def stats(self):
+        """Counters for the /health endpoint"""
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                'size': len(self._slots),
+                'max_entries': self.max_entries,
+                'threshold': self.threshold,
+                'ttl_seconds': self.ttl,
+                'hits': self.hits,
+                'misses': self.misses,
+                'bypasses': self.bypasses,
+                'hit_rate': round(self.hits / lookups, 4) if lookups else 0.0
+            }
+
+# Process-wide cache used by the API server
+answer_cache = SemanticAnswerCache()
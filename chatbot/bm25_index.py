@@ -0,0 +1,230 @@
+"""
+In-process BM25 keyword index and reciprocal-rank fusion.
+
+Dense retrieval is weak at exact lookups (circular numbers, ward names,
+phone numbers, PDF names), so the chat pipeline also ranks records with
+BM25 over an inverted index built from ``pmc_data_normalized.jsonl`` and
+merges the two rankings with reciprocal-rank fusion (RRF). Each record is
+indexed once, with the same text and metadata as its vectors
+(``record_metadata``), so keyword hits can be formatted like vector hits.
+
+Tokenization handles Marathi as well as English: text is NFC-normalized
+and case-folded, Devanagari digits map to ASCII, zero-width joiners are
+dropped, Devanagari words keep their vowel signs and viramas, and common
+Marathi case suffixes / postpositions and a final vowel sign are stripped
+(``मालमत्तेची`` and ``मालमत्ता`` share a term).
+
+Configuration (environment variables):
+    HYBRID_RETRIEVAL         1 (default) fuses BM25 with the vector results, 0 disables
+    BM25_DATA_FILE           normalized records to index (default data/pmc_data_normalized.jsonl)
+    BM25_TOP_K               keyword candidates per query (default 15)
+    RRF_K                    RRF rank constant (default 60)
+    HYBRID_CONTEXT_RESULTS   fused records passed to the LLM (default 5)
+"""
+
+import json
+import math
+import os
+import re
+import threading
+import unicodedata
+from functools import lru_cache
+import numpy as np
+
+from local_index import Match, DateIndex, ValueIndex, matches_filter
+from record_metadata import filter_metadata, extract_text_for_embedding
+
+HYBRID_RETRIEVAL = os.getenv('HYBRID_RETRIEVAL', '1') != '0'
+BM25_DATA_FILE = os.getenv(
+    'BM25_DATA_FILE', os.path.join(os.path.dirname(__file__), '..', 'data', 'pmc_data_normalized.jsonl')
+)
+BM25_TOP_K = int(os.getenv('BM25_TOP_K', '15'))
+RRF_K = int(os.getenv('RRF_K', '60'))
+HYBRID_CONTEXT_RESULTS = int(os.getenv('HYBRID_CONTEXT_RESULTS', '5'))
+
+# BM25 parameters
+K1 = 1.2
+B = 0.75
+
+# Words: letters/digits of any script plus Devanagari vowel signs and viramas (not the dandas)
+_TOKEN = re.compile(r'(?:[^\W_]|[\u0900-\u0963\u0971-\u097f])+')
+# Devanagari digits to ASCII; zero-width (non-)joiners and BOMs dropped
+_CHAR_MAP = {**str.maketrans('०१२३४५६७८९', '0123456789'), **dict.fromkeys([0x200b, 0x200c, 0x200d, 0xfeff])}
+_DEVANAGARI = re.compile(r'[\u0900-\u097f]')
+
+# Longest first, so 'ांच्या' is stripped before 'च्या'
+MARATHI_SUFFIXES = sorted([
+    'ांच्या', 'ाच्या', 'च्या', 'ांची', 'ांचा', 'ांचे', 'मधील', 'मध्ये', 'साठी', 'पर्यंत', 'कडून', 'कडे',
+    'तील', 'ातील', 'ची', 'चा', 'चे', 'ला', 'ना', 'ने', 'नी', 'ही', 'वर', 'ांना', 'ाला',
+], key=len, reverse=True)
+_VOWEL_SIGNS = set('\u093e\u093f\u0940\u0941\u0942\u0943\u0947\u0948\u094b\u094c')
+
+STOPWORDS = frozenset(
+    'a an and are as at be by for from how i in is it me of on or show tell the this to what when '
+    'where which who with about give please my can do does'.split()
+    + 'आणि व की हे ही आहे आहेत या ते तो ती का काय कसे कोणते कोणती मला द्या सांगा मधील मध्ये साठी'.split()
+)
+
+@lru_cache(maxsize=65536)
+def _term(token):
+    """Index term for a token, or None for a stopword (cached: the vocabulary is small)"""
+    if token in STOPWORDS:
+        return None
+    if _DEVANAGARI.search(token):
+        return _stem_marathi(token)
+    return token
+
+def _stem_marathi(token):
+    for suffix in MARATHI_SUFFIXES:
+        if token.endswith(suffix) and len(token) - len(suffix) >= 2:
+            token = token[:-len(suffix)]
+            break
+    if len(token) > 2 and token[-1] in _VOWEL_SIGNS:
+        token = token[:-1]
+    return token
+
+def tokenize(text):
+    """Index/query terms of a text (English and Marathi)"""
+    if not text:
+        return []
+    text = unicodedata.normalize('NFC', text).casefold().translate(_CHAR_MAP)
+    return [term for term in map(_term, _TOKEN.findall(text)) if term]
+
+def record_search_text(rec):
+    """Text a record is indexed under; the title is repeated to weight it"""
+    return f"{rec.get('title', '')}\n{extract_text_for_embedding(rec)}"
+
+class BM25Index:
+    """Okapi BM25 over an inverted index with precomputed per-posting weights.
+
+    Each term maps to (document rows, weights) NumPy arrays, where the weight
+    already includes the term-frequency saturation and length normalization,
+    so a query is one idf-scaled scatter-add per query term plus a top-k.
+    The records' DateIndex also gives the date cutoffs of "latest" queries.
+    """
+
+    def __init__(self, ids, metadata, postings, idf):
+        self.ids = ids
+        self.metadata = metadata
+        self.postings = postings
+        self.idf = idf
+        self.dates = DateIndex(metadata)
+        self.values = ValueIndex(metadata)
+
+    @classmethod
+    def build(cls, records):
+        ids, metadata, doc_terms = [], [], []
+        for rec in records:
+            terms = tokenize(record_search_text(rec))
+            if not terms or not rec.get('id'):
+                continue
+            ids.append(rec['id'])
+            metadata.append(filter_metadata(rec))
+            doc_terms.append(terms)
+        n_docs = len(ids)
+        avgdl = sum(len(terms) for terms in doc_terms) / n_docs if n_docs else 0.0
+
+        raw = {}  # term -> ([rows], [weights])
+        for row, terms in enumerate(doc_terms):
+            counts = {}
+            for term in terms:
+                counts[term] = counts.get(term, 0) + 1
+            norm = K1 * (1 - B + B * len(terms) / avgdl)
+            for term, tf in counts.items():
+                rows, weights = raw.setdefault(term, ([], []))
+                rows.append(row)
+                weights.append(tf * (K1 + 1) / (tf + norm))
+
+        postings, idf = {}, {}
+        for term, (rows, weights) in raw.items():
+            postings[term] = (np.array(rows, dtype=np.int32), np.array(weights, dtype=np.float32))
+            df = len(rows)
+            idf[term] = math.log(1 + (n_docs - df + 0.5) / (df + 0.5))
+        return cls(ids, metadata, postings, idf)
+
+    @classmethod
+    def from_jsonl(cls, path):
+        def records():
+            with open(path, 'r', encoding='utf-8') as f:
+                for line in f:
+                    line = line.strip()
+                    if line:
+                        yield json.loads(line)
+        return cls.build(records())
+
+    def __len__(self):
+        return len(self.ids)
+
+    def search(self, query, top_k=BM25_TOP_K, filter=None):
+        """Top records for a query as Pinecone-style matches (score = BM25).
+
+        filter is a Pinecone metadata filter, resolved from the value index when
+        it can be and otherwise checked on the scoring records only.
+        """
+        terms = [term for term in dict.fromkeys(tokenize(query)) if term in self.postings]
+        if not terms or not self.ids:
+            return []
+        scores = np.zeros(len(self.ids), dtype=np.float32)
+        for term in terms:
+            rows, weights = self.postings[term]
+            scores[rows] += self.idf[term] * weights
+        hits = np.flatnonzero(scores)
+        if filter:
+            rows = self.values.filter_rows(filter)
+            if rows is not None:
+                hits = np.intersect1d(hits, rows, assume_unique=True)
+            else:
+                hits = np.array([row for row in hits if matches_filter(self.metadata[row], filter)], dtype=np.int64)
+        top_k = min(top_k, len(hits))
+        if not top_k:
+            return []
+        top = hits[np.argpartition(-scores[hits], top_k - 1)[:top_k]]
+        top = top[np.argsort(-scores[top], kind='stable')]
+        return [Match(id=self.ids[row], score=float(scores[row]), metadata=self.metadata[row]) for row in top]
+
+def record_key(doc):
+    """The record a match belongs to: chunks of one record share metadata['id']"""
+    metadata = doc.get('metadata') or {}
+    return metadata.get('id') or doc.get('id')
+
+def reciprocal_rank_fusion(rankings, k=RRF_K, key=record_key):
+    """Merge ranked match lists by RRF score, sum of 1 / (k + rank).
+
+    Matches are grouped by record, each counting at its best rank within a
+    list, and the first match seen for a record represents it (so vector
+    matches, listed first, keep their metadata and score).
+    """
+    scores = {}
+    representative = {}
+    for ranking in rankings:
+        rank = 0
+        seen = set()
+        for doc in ranking:
+            doc_key = key(doc)
+            if doc_key in seen:
+                continue
+            seen.add(doc_key)
+            rank += 1
+            scores[doc_key] = scores.get(doc_key, 0.0) + 1.0 / (k + rank)
+            representative.setdefault(doc_key, doc)
+    ordered = sorted(scores, key=scores.get, reverse=True)
+    return [representative[doc_key] for doc_key in ordered]
+
+_bm25_index = None
+_bm25_lock = threading.Lock()
+_bm25_loaded = False
+
+def get_bm25_index():
+    """The shared keyword index, built on first use; None when disabled or the data file is missing"""
+    global _bm25_index, _bm25_loaded
+    if not _bm25_loaded:
+        with _bm25_lock:
+            if not _bm25_loaded:
+                if HYBRID_RETRIEVAL:
+                    if os.path.exists(BM25_DATA_FILE):
+                        _bm25_index = BM25Index.from_jsonl(BM25_DATA_FILE)
+                        print(f"[INFO] BM25 index: {len(_bm25_index)} records from {BM25_DATA_FILE}")
+                    else:
+                        print(f"[WARN] {BM25_DATA_FILE} not found; using vector retrieval only")
+                _bm25_loaded = True
+    return _bm25_index
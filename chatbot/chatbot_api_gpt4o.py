@@ -3,15 +3,15 @@ from pydantic import BaseModel
 from typing import List, Optional, Dict
 from collections import deque
 from fastapi.middleware.cors import CORSMiddleware
-import openai
 import os
 from terminal_chatbot_openai import (
     detect_language, is_followup_query, is_latest_query, embed_query, index, TOP_K, CONTEXT_RESULTS, format_pinecone_results, build_llm_prompt, remove_duplicate_links
 )
+from openai_client import get_openai_client
+from record_metadata import record_date_key
 from dotenv import load_dotenv
 load_dotenv()
 OPENAI_API_KEY = os.getenv('OPENAI_API_KEY')
-openai.api_key = OPENAI_API_KEY
 
 app = FastAPI()
 
@@ -50,17 +50,14 @@ def chat_endpoint(request: ChatRequest):
         results = index.query(vector=query_emb, top_k=TOP_K, include_metadata=True)
         docs = results.get('matches', [])
         if is_latest_query(user_input):
-            def parse_date_safe(meta):
-                d = meta.get('metadata', {})
-                return d.get('date') or d.get('display_date') or ''
-            docs = sorted(docs, key=parse_date_safe, reverse=True)
+            docs = sorted(docs, key=lambda doc: record_date_key(doc.get('metadata', {})), reverse=True)
         context_docs = docs[:CONTEXT_RESULTS]
         pinecone_context = format_pinecone_results(context_docs) if context_docs else "No relevant information found."
         chat_history = list(history)
         prompt = build_llm_prompt(user_input, pinecone_context, chat_history, lang)
         print(f"[INFO] Prompt sent to OpenAI:\n{prompt}")
         # Generate answer using OpenAI GPT-4o-mini
-        response = openai.chat.completions.create(
+        response = get_openai_client().chat.completions.create(
             model="gpt-4o",
             messages=[{"role": "system", "content": "You are a helpful assistant."}, {"role": "user", "content": prompt}],
             max_tokens=1024,
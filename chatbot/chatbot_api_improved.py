@@ -1,10 +1,12 @@
 from fastapi import FastAPI, Request
-from pydantic import BaseModel
+from pydantic import BaseModel, Field
 from typing import List, Optional, Dict
-from collections import deque
 from fastapi.middleware.cors import CORSMiddleware
-import openai
+from fastapi.responses import StreamingResponse
+from contextlib import asynccontextmanager
+from dataclasses import dataclass
 import os
+import json
 import re
 from datetime import datetime
 from urllib.parse import urlparse
@@ -13,16 +15,39 @@ import uuid
 
 # Import improved functions
 from terminal_chatbot_openai_improved import (
-    detect_language, is_followup_query, is_latest_query, embed_query, 
-    index, TOP_K, CONTEXT_RESULTS, format_pinecone_results, 
-    build_llm_prompt, remove_duplicate_links, parse_date_safe
+    detect_language, aembed_query, 
+    get_async_index, close_async_index, asearch_index, analyze_query, get_query_vocabulary, pack_records, 
+    build_llm_prompt, remove_duplicate_links, hybrid_rank
 )
+from bm25_index import get_bm25_index
+from record_metadata import record_date_key
+from openai_client import get_async_openai_client, close_async_openai_client
+from embedding_cache import embedding_cache
+from answer_cache import answer_cache
+from session_store import session_store, SESSION_WINDOW
+from language_detection import language_detector
+from intent_router import classify_query
+from context_packer import token_counter, count_tokens, context_stats
 
 load_dotenv()
 OPENAI_API_KEY = os.getenv('OPENAI_API_KEY')
-openai.api_key = OPENAI_API_KEY
 
-app = FastAPI()
+@asynccontextmanager
+async def lifespan(app):
+    """Create the shared async clients up front and close them on shutdown"""
+    get_async_openai_client()
+    get_async_index()
+    # Build the keyword index and query-filter vocabulary now rather than during the first chat
+    get_bm25_index()
+    get_query_vocabulary()
+    language_detector.warm_up()
+    token_counter.warm_up()
+    yield
+    await close_async_index()
+    await close_async_openai_client()
+    await session_store.close()
+
+app = FastAPI(lifespan=lifespan)
 
 app.add_middleware(
     CORSMiddleware,
@@ -38,8 +63,9 @@ class ChatHistoryItem(BaseModel):
 
 class ChatRequest(BaseModel):
     user_input: str
+    # Deprecated: the server keeps the history per session_id; only used for sessions it doesn't know
     history: Optional[List[ChatHistoryItem]] = None
-    session_id: Optional[str] = None
+    session_id: Optional[str] = Field(None, max_length=128)
 
 class ChatResponse(BaseModel):
     answer: str
@@ -48,86 +74,151 @@ class ChatResponse(BaseModel):
 @app.get("/health")
 async def health_check():
     """Health check endpoint"""
-    return {"status": "healthy", "service": "PMC Chatbot (Improved)"}
+    return {
+        "status": "healthy",
+        "service": "PMC Chatbot (Improved)",
+        "embedding_cache": embedding_cache.stats(),
+        "answer_cache": answer_cache.stats(),
+        "sessions": session_store.stats(),
+        "language_detection": language_detector.stats(),
+        "context_packing": context_stats.stats()
+    }
+
+SYSTEM_MESSAGE = """You are a helpful assistant for Pune Municipal Corporation (PMC) information. 
+You have access to PMC's official records and documents. When users ask follow-up questions, 
+always check the previous conversation context first before searching the PMC records. 
+If the information is available in the previous conversation, use it to answer the follow-up question."""
+
+EMBEDDING_ERROR_ANSWER = "I apologize, but I'm having trouble processing your query right now. Please try again."
+SERVER_ERROR_ANSWER = "I apologize, but I encountered an error while processing your request. Please try again."
+
+@dataclass
+class PreparedChat:
+    """Result of the retrieval half of the pipeline.
+
+    Exactly one of prompt/answer is set: answer when the reply is already known
+    (semantic cache hit or embedding failure), prompt when GPT-4o must generate it.
+    user_input is set when the final answer should be recorded in the session.
+    """
+    session_id: str
+    user_input: Optional[str] = None
+    prompt: Optional[str] = None
+    answer: Optional[str] = None
+    lang: str = 'en'
+    query_emb: Optional[List[float]] = None
+    doc_ids: Optional[List[str]] = None
+    cacheable: bool = False
+
+    def cache_answer(self, answer):
+        """Remember a generated answer for near-duplicate questions"""
+        if self.cacheable:
+            answer_cache.store(self.query_emb, self.lang, self.doc_ids, answer)
+
+    async def finish(self, answer):
+        """Cache a generated answer and record the turn in the session"""
+        self.cache_answer(answer)
+        if self.user_input is not None:
+            await session_store.add_turn(self.session_id, self.user_input, answer)
+
+async def load_history(request: ChatRequest, session_id):
+    """The conversation window for a request: the stored session, else the tail of a client-sent history"""
+    history = await session_store.get_history(session_id) if request.session_id else []
+    if not history and request.history:
+        history = [item.model_dump() for item in request.history[-SESSION_WINDOW:]]
+    return history
+
+async def prepare_chat(request: ChatRequest):
+    """Run language detection, retrieval, the answer cache and prompt building"""
+    # Generate session ID if not provided
+    session_id = request.session_id or str(uuid.uuid4())
+    
+    user_input = request.user_input.strip()
+    history = await load_history(request, session_id)
+    prev_user_query = history[-1].get('user') if history else None
+    lang = detect_language(user_input)
+    
+    # Enhanced query processing
+    query_for_search = user_input
+    intent = classify_query(user_input, prev_user_query)
+    if intent.followup:
+        query_for_search = f"{user_input.strip()} (context: {prev_user_query})"
+        print(f"[INFO] Detected follow-up query. Original: '{user_input}', Enhanced: '{query_for_search}'")
+    else:
+        print(f"[INFO] Regular query: '{user_input}'")
+    
+    # Embed and search with improved parameters
+    query_emb = await aembed_query(query_for_search)
+    if not query_emb:
+        return PreparedChat(session_id=session_id, answer=EMBEDDING_ERROR_ANSWER)
+    
+    # Latest queries for a record type are pre-filtered by type and date
+    # Other queries are restricted to the record types, departments and wards they name
+    query_filter = analyze_query(query_for_search, intent)
+    matches, search_filter = await asearch_index(query_emb, intent, query_filter)
+    if query_filter is not None:
+        print(f"[INFO] Query filter: {query_filter} ({'used' if search_filter is query_filter else 'too few matches'})")
+    # Vector matches fused with BM25 keyword matches
+    docs, context_results = hybrid_rank(query_for_search, matches, search_filter, query_filter)
+    
+    # Enhanced sorting for latest queries
+    if intent.latest:
+        docs = sorted(docs, key=lambda doc: record_date_key(doc.metadata), reverse=True)
+    
+    # Top distinct records that fit the context token budget
+    packed = pack_records(docs, context_results)
+    doc_ids = [doc.get('id') for doc in packed.docs]
+    
+    # Paraphrases of a recent question grounded in the same records reuse its answer;
+    # follow-ups depend on the conversation, so they always go to the LLM
+    if intent.followup:
+        answer_cache.record_bypass()
+    else:
+        cached_answer, similarity = answer_cache.lookup(query_emb, lang, doc_ids)
+        if cached_answer is not None:
+            print(f"[INFO] Semantic answer cache hit (similarity {similarity:.3f})")
+            return PreparedChat(session_id=session_id, answer=cached_answer, user_input=user_input)
+    
+    pinecone_context = packed.text or "No relevant information found."
+    
+    print(f"[INFO] Chat history length: {len(history)}")
+    if history:
+        print(f"[INFO] Previous user query: '{prev_user_query}'")
+        print(f"[INFO] History items: {[(h.get('user', '')[:50] + '...' if len(h.get('user', '')) > 50 else h.get('user', '')) for h in history]}")
+    
+    prompt = build_llm_prompt(user_input, pinecone_context, history, lang)
+    prompt_tokens = count_tokens(SYSTEM_MESSAGE) + count_tokens(prompt)
+    context_stats.record(packed, prompt_tokens)
+    print(f"[INFO] Context: {len(packed.docs)} records, {packed.tokens} tokens "
+          f"({packed.saved_tokens} saved, {packed.duplicates} duplicates, {packed.truncated} truncated); "
+          f"prompt {prompt_tokens} tokens")
+    
+    print(f"[INFO] Prompt sent to OpenAI:\n{prompt}")
+    return PreparedChat(
+        session_id=session_id, prompt=prompt, lang=lang, query_emb=query_emb,
+        doc_ids=doc_ids, cacheable=not intent.followup, user_input=user_input
+    )
+
+def build_chat_messages(prompt):
+    return [
+        {"role": "system", "content": SYSTEM_MESSAGE}, 
+        {"role": "user", "content": prompt}
+    ]
 
 @app.post("/chat", response_model=ChatResponse)
-def chat_endpoint(request: ChatRequest):
+async def chat_endpoint(request: ChatRequest):
     try:
         print("[INFO] Received /chat request")
         print(f"[INFO] Request data: {request}")
         
-        # Generate session ID if not provided
-        session_id = request.session_id or str(uuid.uuid4())
-        
-        user_input = request.user_input.strip()
-        history = deque(request.history or [], maxlen=2)
-        # Handle both ChatHistoryItem objects and plain dictionaries
-        prev_user_query = None
-        if history:
-            last_item = history[-1]
-            if hasattr(last_item, 'user'):
-                prev_user_query = last_item.user
-            elif isinstance(last_item, dict):
-                prev_user_query = last_item.get('user')
-        lang = detect_language(user_input)
-        
-        # Enhanced query processing
-        query_for_search = user_input
-        is_followup = is_followup_query(user_input, prev_user_query)
-        if is_followup:
-            query_for_search = f"{user_input.strip()} (context: {prev_user_query})"
-            print(f"[INFO] Detected follow-up query. Original: '{user_input}', Enhanced: '{query_for_search}'")
-        else:
-            print(f"[INFO] Regular query: '{user_input}'")
-        
-        # Embed and search with improved parameters
-        query_emb = embed_query(query_for_search)
-        if not query_emb:
-            return ChatResponse(answer="I apologize, but I'm having trouble processing your query right now. Please try again.")
-        
-        results = index.query(vector=query_emb, top_k=TOP_K, include_metadata=True)
-        docs = results.get('matches', [])
-        
-        # Enhanced sorting for latest queries
-        if is_latest_query(user_input):
-            def safe_date_sort(doc):
-                date_str = doc.metadata.get('date', doc.metadata.get('display_date', ''))
-                return parse_date_safe(date_str)
-            docs = sorted(docs, key=safe_date_sort, reverse=True)
-        
-        # Use more context for better responses
-        context_docs = docs[:CONTEXT_RESULTS]
-        pinecone_context = format_pinecone_results(context_docs) if context_docs else "No relevant information found."
-        
-        # Convert history to the format expected by build_llm_prompt
-        chat_history = []
-        for item in history:
-            if hasattr(item, 'user') and hasattr(item, 'bot'):
-                chat_history.append({'user': item.user, 'bot': item.bot})
-            elif isinstance(item, dict):
-                chat_history.append(item)
-        
-        print(f"[INFO] Chat history length: {len(chat_history)}")
-        if chat_history:
-            print(f"[INFO] Previous user query: '{prev_user_query}'")
-            print(f"[INFO] History items: {[(h.get('user', '')[:50] + '...' if len(h.get('user', '')) > 50 else h.get('user', '')) for h in chat_history]}")
-        
-        prompt = build_llm_prompt(user_input, pinecone_context, chat_history, lang)
-        
-        print(f"[INFO] Prompt sent to OpenAI:\n{prompt}")
+        chat = await prepare_chat(request)
+        if chat.answer is not None:
+            await chat.finish(chat.answer)
+            return ChatResponse(answer=chat.answer, session_id=chat.session_id)
         
         # Generate answer using OpenAI GPT-4o
-        system_message = """You are a helpful assistant for Pune Municipal Corporation (PMC) information. 
-You have access to PMC's official records and documents. When users ask follow-up questions, 
-always check the previous conversation context first before searching the PMC records. 
-If the information is available in the previous conversation, use it to answer the follow-up question."""
-        
-        response = openai.chat.completions.create(
+        response = await get_async_openai_client().chat.completions.create(
             model="gpt-4o",
-            messages=[
-                {"role": "system", "content": system_message}, 
-                {"role": "user", "content": prompt}
-            ],
+            messages=build_chat_messages(chat.prompt),
             max_tokens=1024,
             temperature=0.2
         )
@@ -137,14 +228,76 @@ If the information is available in the previous conversation, use it to answer t
         
         # Clean up the response
         answer = remove_duplicate_links(answer)
+        await chat.finish(answer)
         
-        return ChatResponse(answer=answer, session_id=session_id)
+        return ChatResponse(answer=answer, session_id=chat.session_id)
         
     except Exception as e:
         import traceback
         print("[ERROR] Exception in /chat endpoint:")
         traceback.print_exc()
-        return ChatResponse(answer=f"I apologize, but I encountered an error while processing your request. Please try again.")
+        return ChatResponse(answer=SERVER_ERROR_ANSWER)
+
+def sse_event(event, data):
+    """Format one Server-Sent Event with a JSON payload"""
+    return f"event: {event}\ndata: {json.dumps(data, ensure_ascii=False)}\n\n"
+
+async def stream_chat_events(request: ChatRequest):
+    """Yield the chat answer as SSE: 'token' events while GPT-4o generates,
+    then a final 'done' event carrying the cleaned answer.
+
+    remove_duplicate_links needs the whole answer, so clients render tokens as
+    they arrive and replace the message with the 'done' answer at the end.
+    """
+    try:
+        print("[INFO] Received /chat/stream request")
+        print(f"[INFO] Request data: {request}")
+        
+        chat = await prepare_chat(request)
+        if chat.answer is not None:
+            await chat.finish(chat.answer)
+            yield sse_event('done', {'answer': chat.answer, 'session_id': chat.session_id})
+            return
+        
+        stream = await get_async_openai_client().chat.completions.create(
+            model="gpt-4o",
+            messages=build_chat_messages(chat.prompt),
+            max_tokens=1024,
+            temperature=0.2,
+            stream=True
+        )
+        
+        parts = []
+        async for chunk in stream:
+            if not chunk.choices:
+                continue
+            delta = chunk.choices[0].delta.content
+            if delta:
+                parts.append(delta)
+                yield sse_event('token', {'text': delta})
+        
+        answer = "".join(parts).strip()
+        print(f"[INFO] OpenAI answer: {answer}")
+        
+        # Clean up the response; clients replace the streamed text with this
+        answer = remove_duplicate_links(answer)
+        await chat.finish(answer)
+        yield sse_event('done', {'answer': answer, 'session_id': chat.session_id})
+        
+    except Exception as e:
+        import traceback
+        print("[ERROR] Exception in /chat/stream endpoint:")
+        traceback.print_exc()
+        yield sse_event('done', {'answer': SERVER_ERROR_ANSWER, 'session_id': request.session_id})
+
+@app.post("/chat/stream")
+async def chat_stream_endpoint(request: ChatRequest):
+    """Streaming variant of /chat using Server-Sent Events"""
+    return StreamingResponse(
+        stream_chat_events(request),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
 
 if __name__ == "__main__":
     import uvicorn
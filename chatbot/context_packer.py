@@ -0,0 +1,240 @@
+"""
+Token-budgeted packing of retrieved records into the LLM prompt.
+
+The prompt used to take the first CONTEXT_RESULTS records whole: chunks of
+one record (same metadata id) could fill several slots, and a handful of
+1000-character descriptions made the prompt, and so latency and cost,
+vary widely per request. pack_context() walks the ranked records in order
+of relevance and:
+
+    - skips records already packed: chunks sharing a record id, and records
+      whose title and description words overlap a packed record's by
+      NEAR_DUPLICATE_SIMILARITY or more (the same notice republished)
+    - adds each record while it fits CONTEXT_TOKEN_BUDGET, up to max_records
+    - shortens the description of the record that would overflow the budget
+      (if at least MIN_RECORD_TOKENS are left), then stops
+
+Tokens are counted with tiktoken (TOKENIZER_ENCODING, gpt-4o's o200k_base).
+tiktoken downloads the encoding on first use; when that fails (offline
+servers without TIKTOKEN_CACHE_DIR), a warning is logged and tokens are
+counted with a local approximation of the same pre-tokenization (letters,
+digit groups of three, punctuation runs). Per-request input tokens and
+the tokens saved against the unpacked context are kept in context_stats
+and reported by /health.
+
+Configuration (environment variables):
+    CONTEXT_TOKEN_BUDGET   tokens of retrieved records per prompt (default 1200)
+    TOKENIZER_ENCODING     tiktoken encoding used to count tokens (default o200k_base)
+"""
+
+import math
+import os
+import re
+import threading
+from dataclasses import dataclass
+
+import tiktoken
+
+from bm25_index import record_key, tokenize
+
+CONTEXT_TOKEN_BUDGET = int(os.getenv('CONTEXT_TOKEN_BUDGET', '1200'))
+TOKENIZER_ENCODING = os.getenv('TOKENIZER_ENCODING', 'o200k_base')
+# A record shortened to fit the budget keeps at least this many tokens
+MIN_RECORD_TOKENS = 48
+# Jaccard similarity of title + description words at which two records are the same
+NEAR_DUPLICATE_SIMILARITY = 0.9
+RECORD_SEPARATOR = '\n---\n'
+
+_PIECE = re.compile(r"[A-Za-z]+|\d+|(?:[^\W\d_]|[\u0900-\u097f])+|[^\w\s]+|\n+|[^\S\n]+")
+
+def approximate_token_count(text):
+    """Token count estimate for o200k-style BPE without the vocabulary.
+
+    English words up to ~8 letters are usually one token, digits go in groups
+    of three, Devanagari words take about one token per two characters, runs
+    of punctuation about one per two characters, and a space merges into the
+    word after it.
+    """
+    tokens = 0
+    for piece in _PIECE.findall(text):
+        first = piece[0]
+        if first.isascii() and first.isalpha():
+            tokens += 1 + len(piece) // 9
+        elif first.isdigit():
+            tokens += math.ceil(len(piece) / 3)
+        elif first.isalpha() or not first.isascii() and not first.isspace():
+            tokens += math.ceil(len(piece) / 2)
+        elif first == '\n':
+            tokens += 1
+        elif not first.isspace():
+            tokens += math.ceil(len(piece) / 2)
+    return tokens
+
+class TokenCounter:
+    """tiktoken's encoding, or approximate_token_count when it cannot be downloaded"""
+
+    def __init__(self, encoding=TOKENIZER_ENCODING):
+        self.encoding_name = encoding
+        self._encoding = None
+        self._loaded = False
+        self._lock = threading.Lock()
+
+    def _load(self):
+        with self._lock:
+            if not self._loaded:
+                try:
+                    self._encoding = tiktoken.get_encoding(self.encoding_name)
+                except Exception as e:
+                    # Offline servers cannot download the encoding file, and tiktoken's errors vary
+                    # (requests errors, ValueError for an unknown name, a corrupt cache file);
+                    # counting tokens must not fail the warm-up
+                    print(f"[WARN] tiktoken encoding {self.encoding_name} could not be loaded "
+                          f"({type(e).__name__}: {e}); counting tokens approximately, "
+                          f"so CONTEXT_TOKEN_BUDGET is only approximate")
+                self._loaded = True
+        return self._encoding
+
+    @property
+    def name(self):
+        encoding = self._encoding if self._loaded else self._load()
+        return f'tiktoken/{self.encoding_name}' if encoding is not None else 'approximate'
+
+    def count(self, text):
+        encoding = self._encoding if self._loaded else self._load()
+        if encoding is not None:
+            return len(encoding.encode(text, disallowed_special=()))
+        return approximate_token_count(text)
+
+    def warm_up(self):
+        """Load the encoding now rather than during the first chat"""
+        self._load()
+
+token_counter = TokenCounter()
+
+def count_tokens(text):
+    return token_counter.count(text)
+
+def _content_words(doc):
+    metadata = doc.get('metadata') or {}
+    return frozenset(tokenize(f"{metadata.get('title') or ''} {metadata.get('description') or ''}"))
+
+def _is_near_duplicate(words, packed_words):
+    return bool(words) and any(
+        len(words & other) >= NEAR_DUPLICATE_SIMILARITY * len(words | other) for other in packed_words
+    )
+
+@dataclass
+class PackedContext:
+    """Records chosen for a prompt and their token accounting"""
+    text: str
+    docs: list
+    tokens: int
+    unpacked_tokens: int
+    duplicates: int = 0
+    truncated: int = 0
+
+    @property
+    def saved_tokens(self):
+        return self.unpacked_tokens - self.tokens
+
+def _fit_description(format_record, number, doc, available):
+    """The record formatted with the longest description that fits `available` tokens, or None"""
+    description = str((doc.get('metadata') or {}).get('description') or '')
+    lo, hi = 0, len(description)
+    best = None
+    while lo <= hi:
+        mid = (lo + hi) // 2
+        text = format_record(number, doc, max_description_chars=mid)
+        tokens = count_tokens(text)
+        if tokens <= available:
+            best, lo = (text, tokens), mid + 1
+        else:
+            hi = mid - 1
+    return best
+
+def pack_context(docs, format_record, max_records, budget=CONTEXT_TOKEN_BUDGET):
+    """Pack ranked docs into at most max_records records within `budget` tokens.
+
+    format_record(number, doc, max_description_chars=None) formats one record
+    as the prompt shows it. unpacked_tokens is the size of the first
+    max_records records formatted whole, as the prompt took them before.
+    """
+    unpacked = RECORD_SEPARATOR.join(format_record(i, doc) for i, doc in enumerate(docs[:max_records], 1))
+    unpacked_tokens = count_tokens(unpacked) if unpacked else 0
+    separator_tokens = count_tokens(RECORD_SEPARATOR)
+
+    parts, chosen = [], []
+    seen_keys, packed_words = set(), []
+    used = duplicates = truncated = 0
+    for doc in docs:
+        if len(chosen) >= max_records:
+            break
+        key, words = record_key(doc), _content_words(doc)
+        if key in seen_keys or _is_near_duplicate(words, packed_words):
+            duplicates += 1
+            continue
+        number = len(chosen) + 1
+        text = format_record(number, doc)
+        tokens = count_tokens(text) + (separator_tokens if chosen else 0)
+        if used + tokens > budget:
+            available = budget - used - (separator_tokens if chosen else 0)
+            fitted = _fit_description(format_record, number, doc, available) if available >= MIN_RECORD_TOKENS else None
+            if fitted is None and not chosen:
+                # Always keep the most relevant record, without its description if need be
+                text = format_record(number, doc, max_description_chars=0)
+                fitted = (text, count_tokens(text))
+            if fitted is not None:
+                parts.append(fitted[0])
+                chosen.append(doc)
+                used += fitted[1] + (separator_tokens if len(chosen) > 1 else 0)
+                truncated += 1
+            break
+        seen_keys.add(key)
+        packed_words.append(words)
+        parts.append(text)
+        chosen.append(doc)
+        used += tokens
+    text = RECORD_SEPARATOR.join(parts)
+    return PackedContext(
+        text=text, docs=chosen, tokens=count_tokens(text) if text else 0, unpacked_tokens=unpacked_tokens,
+        duplicates=duplicates, truncated=truncated
+    )
+
+class ContextStats:
+    """Process-wide prompt token accounting for the /health endpoint"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.requests = 0
+        self.prompt_tokens = 0
+        self.context_tokens = 0
+        self.saved_tokens = 0
+        self.duplicates = 0
+        self.truncated = 0
+
+    def record(self, packed, prompt_tokens):
+        with self._lock:
+            self.requests += 1
+            self.prompt_tokens += prompt_tokens
+            self.context_tokens += packed.tokens
+            self.saved_tokens += packed.saved_tokens
+            self.duplicates += packed.duplicates
+            self.truncated += packed.truncated
+
+    def stats(self):
+        """Counters for the /health endpoint"""
+        with self._lock:
+            unpacked = self.prompt_tokens + self.saved_tokens
+            return {
+                'tokenizer': token_counter.name,
+                'budget_tokens': CONTEXT_TOKEN_BUDGET,
+                'requests': self.requests,
+                'avg_prompt_tokens': round(self.prompt_tokens / self.requests, 1) if self.requests else 0.0,
+                'avg_context_tokens': round(self.context_tokens / self.requests, 1) if self.requests else 0.0,
+                'saved_tokens': self.saved_tokens,
+                'saved_ratio': round(self.saved_tokens / unpacked, 4) if unpacked else 0.0,
+                'duplicates_skipped': self.duplicates,
+                'records_truncated': self.truncated
+            }
+
+context_stats = ContextStats()
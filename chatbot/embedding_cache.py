@@ -0,0 +1,107 @@
+"""
+In-process LRU + TTL cache for query embeddings.
+
+Citizens ask the same questions over and over ("property tax due date",
+"latest circular", ward office numbers), so the chat pipeline checks this
+cache before calling the embeddings API. Keys are the normalized query text
+plus the embedding model; vectors are kept as read-only float32 NumPy arrays
+(6 KB for 1536 dims instead of ~50 KB as a list of Python floats).
+
+Configuration (environment variables):
+    EMBEDDING_CACHE_SIZE   max cached queries (default 2048, 0 disables the cache)
+    EMBEDDING_CACHE_TTL    seconds before an entry expires (default 86400)
+"""
+
+import os
+import re
+import threading
+import time
+from collections import OrderedDict
+import numpy as np
+
+EMBEDDING_CACHE_SIZE = int(os.getenv('EMBEDDING_CACHE_SIZE', '2048'))
+EMBEDDING_CACHE_TTL = float(os.getenv('EMBEDDING_CACHE_TTL', '86400'))
+
+_WHITESPACE = re.compile(r'\s+')
+
+def normalize_query(text):
+    """Canonical cache key text: case-folded, whitespace collapsed, edge punctuation dropped"""
+    return _WHITESPACE.sub(' ', text.casefold()).strip(' ?!.,;:')
+
+class EmbeddingCache:
+    """Thread-safe LRU cache of float32 query vectors with per-entry expiry"""
+
+    def __init__(self, max_entries=EMBEDDING_CACHE_SIZE, ttl=EMBEDDING_CACHE_TTL):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self._entries = OrderedDict()  # (model, normalized text) -> (expires_at, vector)
+        self._lock = threading.Lock()
+        self._nbytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+
+    def get(self, text, model):
+        """Return the cached vector for text/model, or None on a miss"""
+        key = (model, normalize_query(text))
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self.misses += 1
+                return None
+            expires_at, vector = entry
+            if expires_at < time.monotonic():
+                self._remove(key)
+                self.expirations += 1
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return vector
+
+    def put(self, text, model, embedding):
+        """Store an embedding (any float sequence) and return it as a float32 array"""
+        vector = np.asarray(embedding, dtype=np.float32)
+        vector.setflags(write=False)
+        if self.max_entries <= 0:
+            return vector
+        key = (model, normalize_query(text))
+        with self._lock:
+            if key in self._entries:
+                self._remove(key)
+            self._entries[key] = (time.monotonic() + self.ttl, vector)
+            self._nbytes += vector.nbytes
+            while len(self._entries) > self.max_entries:
+                oldest = next(iter(self._entries))
+                self._remove(oldest)
+                self.evictions += 1
+        return vector
+
+    def _remove(self, key):
+        _, vector = self._entries.pop(key)
+        self._nbytes -= vector.nbytes
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._nbytes = 0
+
+    def stats(self):
+        """Counters for the /health endpoint"""
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                'size': len(self._entries),
+                'max_entries': self.max_entries,
+                'ttl_seconds': self.ttl,
+                'hits': self.hits,
+                'misses': self.misses,
+                'hit_rate': round(self.hits / lookups, 4) if lookups else 0.0,
+                'evictions': self.evictions,
+                'expirations': self.expirations,
+                'memory_bytes': self._nbytes
+            }
+
+# Process-wide cache shared by the API server and the terminal chatbot
+embedding_cache = EmbeddingCache()
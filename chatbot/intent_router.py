@@ -0,0 +1,159 @@
+"""
+Query intent classification shared by the chat modules.
+
+classify_query() reads everything the retrieval pipeline needs from a
+query in one call: whether it asks for the latest records, whether it
+follows up on the previous question, the record type it names and the
+PMC ward office it mentions. Every keyword list is compiled once at
+import into a single alternation, so a query costs a handful of regex
+scans instead of one re.compile and ~30 re.search calls.
+
+is_followup_query and latest_record_type keep the behaviour of the
+functions they replace; is_latest_query does too, except that its keywords
+are matched as whole words and "new" counts when a record type follows it
+("any new circular?"). scripts/check_intent_router.py checks them against
+verbatim copies of the old code.
+"""
+
+import re
+from dataclasses import dataclass
+
+# Matched as whole words ("last" is not in "plastic" or "lastly")
+LATEST_KEYWORDS = [
+    r"latest", r"most recent", r"newest", r"recent", r"recently", r"last", r"current",
+    r"today(?:'s)?", r"this week", r"fresh", r"updated", r"up-to-date",
+    r"just published", r"just released", r"recently issued", r"recently published",
+    r"recently released"
+]
+# "new" only asks for the latest records when a record type follows it ("any new circular?")
+NEW_KEYWORDS = ["new", "नवीन", "नवे"]
+
+# Follow-up signals, matched as substrings of the lower-cased query
+FOLLOWUP_PRONOUNS = ["it", "that", "this", "one", "which", "above", "them", "those", "these"]
+FOLLOWUP_PHRASES = [
+    "from above", "from the list", "from those", "which one", "nearest to me", "closest to me",
+    "near me", "nearby", "the one", "that one", "this one", "what is the date", "when was it",
+    "where is it", "who issued it", "which department", "what about", "tell me more",
+    "give me details", "what else", "any other", "is there more"
+]
+QUESTION_WORDS = ["which", "what", "where", "who", "when", "how"]
+CONTEXT_WORDS = [
+    "date", "time", "location", "department", "ward", "circular", "notice", "place", "places",
+    "nearest", "closest", "near", "nearby", "distance", "area", "region", "zone", "above", "list",
+    "those", "one"
+]
+# Short queries (in words) that count as follow-ups
+PRONOUN_FOLLOWUP_WORDS = 6
+QUESTION_FOLLOWUP_WORDS = 4
+
+# record_type a query names, in priority order when it names several
+LATEST_RECORD_TYPES = [
+    ('circular', ['circular', 'notice', 'notification', 'परिपत्रक', 'सूचना']),
+    ('news', ['news', 'press note', 'press release', 'बातमी', 'बातम्या']),
+    ('committee_decision', ['committee decision', 'resolution', 'ठराव']),
+    ('event', ['event', 'कार्यक्रम']),
+    ('project', ['project', 'प्रकल्प']),
+    ('scheme', ['scheme', 'योजना']),
+    ('policy', ['policy', 'धोरण']),
+    ('award', ['award', 'पुरस्कार']),
+]
+
+# PMC ward offices (kshetriya karyalay) and the place names citizens use for them
+WARD_OFFICES = [
+    ('Aundh-Baner', ['aundh', 'baner', 'औंध', 'बाणेर']),
+    ('Bhavani Peth', ['bhavani peth', 'भवानी पेठ']),
+    ('Bibwewadi', ['bibwewadi', 'बिबवेवाडी']),
+    ('Dhole Patil Road', ['dhole patil', 'ढोले पाटील']),
+    ('Dhankawadi-Sahakarnagar', ['dhankawadi', 'sahakarnagar', 'sahakar nagar', 'धनकवडी', 'सहकारनगर']),
+    ('Hadapsar-Mundhwa', ['hadapsar', 'mundhwa', 'हडपसर', 'मुंढवा']),
+    ('Kasba-Vishrambaug', ['kasba', 'vishrambaug', 'vishrambag', 'कसबा', 'विश्रामबाग']),
+    ('Kondhwa-Yewalewadi', ['kondhwa', 'yewalewadi', 'कोंढवा', 'येवलेवाडी']),
+    ('Kothrud-Bawdhan', ['kothrud', 'bawdhan', 'कोथरूड', 'बावधन']),
+    ('Nagar Road-Vadgaonsheri', ['nagar road', 'vadgaonsheri', 'vadgaon sheri', 'wadgaonsheri', 'नगर रोड', 'वडगावशेरी']),
+    ('Shivajinagar-Ghole Road', ['shivajinagar', 'shivaji nagar', 'ghole road', 'शिवाजीनगर', 'घोले रोड']),
+    ('Sinhagad Road', ['sinhagad', 'सिंहगड']),
+    ('Wanowrie-Ramtekdi', ['wanowrie', 'wanawadi', 'ramtekdi', 'वानवडी', 'रामटेकडी']),
+    ('Warje-Karvenagar', ['warje', 'karvenagar', 'karve nagar', 'वारजे', 'कर्वेनगर']),
+    ('Yerawada-Kalas-Dhanori', ['yerawada', 'yerwada', 'kalas', 'dhanori', 'येरवडा', 'कळस', 'धानोरी']),
+]
+
+def _literal_alternation(words):
+    """Escaped literals, longest first, so the alternation prefers the longest phrase"""
+    return '|'.join(re.escape(word) for word in sorted(words, key=len, reverse=True))
+
+# Patterns run on the lower-cased query, which is faster than case-insensitive matching
+_PRONOUN = re.compile(_literal_alternation(FOLLOWUP_PRONOUNS))
+_FOLLOWUP_PHRASE = re.compile(_literal_alternation(FOLLOWUP_PHRASES))
+_QUESTION_START = re.compile(_literal_alternation(QUESTION_WORDS))
+_CONTEXT_WORD = re.compile(_literal_alternation(CONTEXT_WORDS))
+# One named group per record type; the priority order breaks ties between several matches
+_RECORD_TYPE = re.compile(
+    r'(?<!\w)(?:' + '|'.join(f'(?P<{record_type}>{_literal_alternation(words)})'
+                             for record_type, words in LATEST_RECORD_TYPES) + ')'
+)
+_LATEST = re.compile(
+    r'(?<!\w)(?:' + '|'.join(LATEST_KEYWORDS) + r')(?!\w)'
+    r'|(?<!\w)(?:' + _literal_alternation(NEW_KEYWORDS) + r')\s+(?:'
+    + '|'.join(_literal_alternation(words) for _, words in LATEST_RECORD_TYPES) + ')'
+)
+_RECORD_TYPE_PRIORITY = {record_type: i for i, (record_type, _) in enumerate(LATEST_RECORD_TYPES)}
+_WARD_ALIASES = {alias: ward for ward, aliases in WARD_OFFICES for alias in aliases}
+_WARD = re.compile(r'(?<!\w)(?:' + _literal_alternation(_WARD_ALIASES) + r')(?!\w)')
+
+@dataclass
+class QueryIntent:
+    """What a query asks for, as read by classify_query"""
+    latest: bool = False
+    followup: bool = False
+    record_type: str = None
+    ward: str = None
+
+def _record_type(q_lower):
+    found = [match.lastgroup for match in _RECORD_TYPE.finditer(q_lower)]
+    return min(found, key=_RECORD_TYPE_PRIORITY.get) if found else None
+
+def _ward(q_lower):
+    match = _WARD.search(q_lower)
+    return _WARD_ALIASES[match.group(0)] if match else None
+
+def _is_followup(q_lower, prev_user_query):
+    if not prev_user_query:
+        return False
+    q_lower = q_lower.strip()
+    n_words = len(q_lower.split())
+    if n_words <= PRONOUN_FOLLOWUP_WORDS and _PRONOUN.search(q_lower):
+        return True
+    if _FOLLOWUP_PHRASE.search(q_lower):
+        return True
+    if _QUESTION_START.match(q_lower):
+        return n_words <= QUESTION_FOLLOWUP_WORDS or _CONTEXT_WORD.search(q_lower) is not None
+    return False
+
+def is_latest_query(query):
+    """Whether the query asks for the latest / most recent records"""
+    return _LATEST.search(query.lower()) is not None
+
+def latest_record_type(query):
+    """The record_type a query names ('latest circulars' -> 'circular'), or None"""
+    return _record_type(query.lower())
+
+def is_followup_query(query, prev_user_query):
+    """Whether the query refers back to the previous question (pronouns, "which one", short questions)"""
+    return _is_followup(query.lower(), prev_user_query)
+
+def is_basic_followup_query(query, prev_user_query):
+    """Follow-up detection of the original chat modules: a short query with a pronoun"""
+    if not prev_user_query:
+        return False
+    q_lower = query.lower().strip()
+    return len(q_lower.split()) <= PRONOUN_FOLLOWUP_WORDS and _PRONOUN.search(q_lower) is not None
+
+def classify_query(query, prev_user_query=None):
+    """The QueryIntent of a user query; follow-ups need the previous user query"""
+    q_lower = query.lower()
+    return QueryIntent(
+        latest=_LATEST.search(q_lower) is not None,
+        followup=_is_followup(q_lower, prev_user_query),
+        record_type=_record_type(q_lower),
+        ward=_ward(q_lower)
+    )
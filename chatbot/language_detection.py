@@ -0,0 +1,161 @@
+"""
+Query language detection (Marathi or English) with a script check first.
+
+The chat prompt only needs to know whether to answer in Marathi or in
+English. Most queries settle that from their script alone:
+
+    Devanagari letters make up at least DEVANAGARI_RATIO of the
+    letters                                     -> 'mr'
+    no Devanagari and no romanized Marathi word -> 'en'
+
+Anything else (Latin-script Marathi such as "kar kasa bharaycha", or
+English with a few Devanagari words) goes to a fallback model:
+
+    lexicon     (default) the share of tokens that are Devanagari words or
+                common romanized Marathi words ("aahe", "kasa", "pahije",
+                "-aycha" verb forms); 'mr' at ROMAN_MARATHI_RATIO or more
+    langdetect  langdetect with a fixed seed (deterministic). Its Marathi
+                profile is Devanagari-only, so it does not recognise
+                romanized Marathi.
+
+Results are memoized per normalized query in an LRU cache. warm_up()
+runs at server startup so the first chat does not pay for loading the
+fallback model (langdetect builds its profiles on first use, ~0.3 s).
+
+Configuration (environment variables):
+    LANGUAGE_CACHE_SIZE    max cached queries (default 4096, 0 disables the cache)
+    LANGUAGE_MODEL         fallback model for ambiguous queries: lexicon or langdetect (default lexicon)
+    DEVANAGARI_RATIO       share of Devanagari letters that means Marathi (default 0.5)
+    ROMAN_MARATHI_RATIO    share of Marathi tokens the lexicon model needs (default 0.2)
+"""
+
+import os
+import re
+import threading
+from functools import lru_cache
+
+LANGUAGE_CACHE_SIZE = int(os.getenv('LANGUAGE_CACHE_SIZE', '4096'))
+LANGUAGE_MODEL = os.getenv('LANGUAGE_MODEL', 'lexicon').lower()
+DEVANAGARI_RATIO = float(os.getenv('DEVANAGARI_RATIO', '0.5'))
+ROMAN_MARATHI_RATIO = float(os.getenv('ROMAN_MARATHI_RATIO', '0.2'))
+
+# Common romanized Marathi words that are not English words
+ROMAN_MARATHI_WORDS = frozenset('''
+    aahe ahe aahet ahet ahes nahi naahi nahit kay kaay kasa kashi kasha kase kuthe kuthla kuthli
+    kuthun kothe kadhi kevha kiti konta konti kontya konala kon mala amhala aamhala tumhala majha
+    maza mazha majhi mazi mazhi maze majhe tumcha tumchi tumche aamcha amcha pahije pahijet sanga
+    saanga sangaa sangal dya dyaa hava havi ani aani kinva kinwa ka cha chi che chya madhe madhye
+    madhil sathi saathi kade paryant jawal javal jawalcha javalcha jawalchi javalchi pani suru chalu
+    milel miltil milnar hoil hotil hota hoti hote zala jhala zali jhali zale jhale mhanje yeil yetil
+    ata aata udya aaj sadhya navin navi naveen sarva saglya sagle sagla kuthlya ghya kara karu
+'''.split())
+# Verb forms such as karaycha, bharaychi, bharayla
+_ROMAN_MARATHI_SUFFIX = re.compile(r'[a-z]{2,}(?:aycha|aychi|ayche|aychya|ayla|ayala)$')
+
+_DEVANAGARI = re.compile(r'[ऀ-ॿ]')
+_LATIN = re.compile(r'[a-z]')
+_TOKEN = re.compile(r'[a-z]+|[ऀ-ॿ]+')
+_WHITESPACE = re.compile(r'\s+')
+
+def normalize_text(text):
+    """Cache key text: case-folded with whitespace collapsed"""
+    return _WHITESPACE.sub(' ', text.casefold()).strip()
+
+def is_roman_marathi(token):
+    return token in ROMAN_MARATHI_WORDS or bool(_ROMAN_MARATHI_SUFFIX.match(token))
+
+def devanagari_ratio(text):
+    """Share of Devanagari characters among the letters of (case-folded) text, None without letters"""
+    devanagari = len(_DEVANAGARI.findall(text))
+    latin = len(_LATIN.findall(text))
+    if not devanagari and not latin:
+        return None
+    return devanagari / (devanagari + latin)
+
+def marathi_token_ratio(tokens):
+    """Share of tokens that are Devanagari words or romanized Marathi words"""
+    if not tokens:
+        return 0.0
+    marathi = sum(1 for token in tokens if not token.isascii() or is_roman_marathi(token))
+    return marathi / len(tokens)
+
+class LanguageDetector:
+    """Script check, then the fallback model for ambiguous queries, memoized in an LRU cache"""
+
+    def __init__(self, model=LANGUAGE_MODEL, cache_size=LANGUAGE_CACHE_SIZE,
+                 devanagari_ratio=DEVANAGARI_RATIO, roman_marathi_ratio=ROMAN_MARATHI_RATIO):
+        if model not in ('lexicon', 'langdetect'):
+            raise ValueError(f"Unknown LANGUAGE_MODEL '{model}' (expected 'lexicon' or 'langdetect')")
+        self.model = model
+        self.devanagari_ratio = devanagari_ratio
+        self.roman_marathi_ratio = roman_marathi_ratio
+        self._detect_cached = lru_cache(maxsize=cache_size)(self._detect) if cache_size > 0 else self._detect
+        self._langdetect = None
+        self._lock = threading.Lock()
+        self.script_decisions = 0
+        self.model_decisions = 0
+
+    def detect(self, text):
+        """'mr' or 'en' for a user query"""
+        return self._detect_cached(normalize_text(text or ''))
+
+    def _detect(self, text):
+        ratio = devanagari_ratio(text)
+        if ratio is None:
+            self.script_decisions += 1
+            return 'en'
+        if ratio >= self.devanagari_ratio:
+            self.script_decisions += 1
+            return 'mr'
+        tokens = _TOKEN.findall(text)
+        if ratio == 0 and not any(is_roman_marathi(token) for token in tokens):
+            self.script_decisions += 1
+            return 'en'
+        self.model_decisions += 1
+        if self.model == 'langdetect':
+            return self._langdetect_language(text)
+        return 'mr' if marathi_token_ratio(tokens) >= self.roman_marathi_ratio else 'en'
+
+    def _load_langdetect(self):
+        with self._lock:
+            if self._langdetect is None:
+                from langdetect import DetectorFactory, detect
+                DetectorFactory.seed = 0
+                detect('warm up')  # builds the profile factory
+                self._langdetect = detect
+        return self._langdetect
+
+    def _langdetect_language(self, text):
+        try:
+            return 'mr' if self._load_langdetect()(text) == 'mr' else 'en'
+        except Exception:
+            return 'en'
+
+    def warm_up(self):
+        """Load the fallback model now rather than during the first chat"""
+        if self.model == 'langdetect':
+            self._load_langdetect()
+
+    def cache_clear(self):
+        if hasattr(self._detect_cached, 'cache_clear'):
+            self._detect_cached.cache_clear()
+
+    def stats(self):
+        """Counters for the /health endpoint"""
+        stats = {
+            'model': self.model,
+            'script_decisions': self.script_decisions,
+            'model_decisions': self.model_decisions
+        }
+        if hasattr(self._detect_cached, 'cache_info'):
+            info = self._detect_cached.cache_info()
+            stats.update({'cache_entries': info.currsize, 'max_entries': info.maxsize,
+                          'hits': info.hits, 'misses': info.misses})
+        return stats
+
+# Process-wide detector used by the chat modules
+language_detector = LanguageDetector()
+
+def detect_language(text):
+    """'mr' or 'en' for a user query"""
+    return language_detector.detect(text)
@@ -0,0 +1,353 @@
+"""
+Local in-process vector index, a drop-in alternative to Pinecone.
+
+The PMC corpus is a few thousand records, so exact search over all of them
+is a single matrix-vector product and much faster than a network round-trip.
+An index directory holds:
+
+    embeddings.npy   float32 matrix (n_vectors x dim) of unit-length rows,
+                     memory-mapped on load
+    metadata.jsonl   one {"id": ..., "metadata": {...}} line per row, in row order
+
+``LocalVectorIndex.query`` mirrors ``pinecone.Index.query`` and returns a
+``{'matches': [...]}`` result whose matches support both ``match['metadata']``
+and ``match.metadata``, so the chat modules can use either backend unchanged.
+``scripts/embed_and_upsert_openai.py`` writes this format when
+``RETRIEVER_BACKEND=local``.
+
+Queries accept Pinecone metadata filters (``$eq``, ``$ne``, ``$in``, ``$nin``,
+``$gt``, ``$gte``, ``$lt``, ``$lte``, ``$and``, ``$or``). Rows are also kept in
+a secondary index sorted by ``date_epoch`` (``DateIndex``), so a date range is
+a binary search and ``newest=n`` restricts a query to the n most recent
+matching rows, found by walking that index from the end. Equality filters
+on record_type, department, ward_name and lang are resolved from per-value
+row lists (``ValueIndex``).
+"""
+
+import json
+import os
+import numpy as np
+
+from record_metadata import record_date_epoch
+
+EMBEDDINGS_FILE = 'embeddings.npy'
+METADATA_FILE = 'metadata.jsonl'
+# Categorical metadata fields kept in a value index (ValueIndex)
+VALUE_FIELDS = ('record_type', 'department', 'ward_name', 'lang')
+
+def normalize_rows(matrix):
+    """Scale each row to unit length so a dot product is cosine similarity"""
+    matrix = np.asarray(matrix, dtype=np.float32)
+    norms = np.linalg.norm(matrix, axis=-1, keepdims=True)
+    norms[norms == 0] = 1.0
+    return matrix / norms
+
+class Match(dict):
+    """A scored record, readable as a dict or through Pinecone-style attributes"""
+
+    @property
+    def id(self):
+        return self['id']
+
+    @property
+    def score(self):
+        return self['score']
+
+    @property
+    def metadata(self):
+        return self.get('metadata', {})
+
+def _condition_matches(value, condition):
+    if not isinstance(condition, dict):
+        condition = {'$eq': condition}
+    for op, arg in condition.items():
+        if op == '$eq':
+            ok = value == arg
+        elif op == '$ne':
+            ok = value != arg
+        elif op == '$in':
+            ok = value in arg
+        elif op == '$nin':
+            ok = value not in arg
+        elif op in ('$gt', '$gte', '$lt', '$lte'):
+            if not isinstance(value, (int, float)) or isinstance(value, bool):
+                return False
+            ok = {'$gt': value > arg, '$gte': value >= arg, '$lt': value < arg, '$lte': value <= arg}[op]
+        else:
+            raise ValueError(f'Unsupported filter operator {op}')
+        if not ok:
+            return False
+    return True
+
+def matches_filter(metadata, filter):
+    """Whether metadata satisfies a Pinecone metadata filter (None matches everything)"""
+    if not filter:
+        return True
+    for field, condition in filter.items():
+        if field == '$and':
+            if not all(matches_filter(metadata, clause) for clause in condition):
+                return False
+        elif field == '$or':
+            if not any(matches_filter(metadata, clause) for clause in condition):
+                return False
+        elif not _condition_matches(metadata.get(field), condition):
+            return False
+    return True
+
+class DateIndex:
+    """Secondary index of a metadata list: dated rows in ascending date_epoch order.
+
+    Metadata written before date_epoch existed gets it derived from its date.
+    """
+
+    def __init__(self, metadata):
+        self.metadata = metadata
+        dated = sorted((epoch, row) for row, epoch in enumerate(map(record_date_epoch, metadata)) if epoch is not None)
+        self.epochs = np.array([epoch for epoch, _ in dated], dtype=np.int64)
+        self.rows = np.array([row for _, row in dated], dtype=np.int64)
+
+    def __len__(self):
+        return len(self.rows)
+
+    def range_rows(self, condition):
+        """Rows whose date_epoch satisfies a {'$gte': ..., '$lt': ...} condition, by binary search"""
+        lo, hi = 0, len(self.epochs)
+        for op, arg in condition.items():
+            if op == '$gte':
+                lo = max(lo, int(np.searchsorted(self.epochs, arg, side='left')))
+            elif op == '$gt':
+                lo = max(lo, int(np.searchsorted(self.epochs, arg, side='right')))
+            elif op == '$lte':
+                hi = min(hi, int(np.searchsorted(self.epochs, arg, side='right')))
+            elif op == '$lt':
+                hi = min(hi, int(np.searchsorted(self.epochs, arg, side='left')))
+        return self.rows[lo:max(lo, hi)]
+
+    def _newest_positions(self, n, filter):
+        found = 0
+        for position in range(len(self.rows) - 1, -1, -1):
+            if found == n:
+                return
+            if matches_filter(self.metadata[self.rows[position]], filter):
+                found += 1
+                yield position
+
+    def newest_rows(self, n, filter=None):
+        """The n most recent rows matching a filter, newest first (O(n) for a common filter)"""
+        return np.array([self.rows[p] for p in self._newest_positions(n, filter)], dtype=np.int64)
+
+    def newest_cutoff(self, n, filter=None):
+        """date_epoch of the n-th most recent row matching a filter (the oldest if fewer), or None"""
+        positions = list(self._newest_positions(n, filter))
+        return int(self.epochs[positions[-1]]) if positions else None
+
+class ValueIndex:
+    """Secondary index of a metadata list: sorted rows per value of the categorical VALUE_FIELDS.
+
+    Filters made only of $eq / $in conditions on these fields, combined with
+    $and / $or, resolve to rows by set operations instead of a scan.
+    """
+
+    def __init__(self, metadata, fields=None):
+        fields = VALUE_FIELDS if fields is None else fields
+        rows = {field: {} for field in fields}
+        for row, meta in enumerate(metadata):
+            for field in fields:
+                value = meta.get(field)
+                if isinstance(value, str):
+                    rows[field].setdefault(value, []).append(row)
+        self.rows = {field: {value: np.array(r, dtype=np.int64) for value, r in values.items()}
+                     for field, values in rows.items()}
+
+    def _condition_rows(self, field, condition):
+        if field not in self.rows:
+            return None
+        if not isinstance(condition, dict):
+            condition = {'$eq': condition}
+        result = None
+        for op, arg in condition.items():
+            if op == '$eq':
+                values = [arg]
+            elif op == '$in':
+                values = arg
+            else:
+                return None
+            found = [self.rows[field][value] for value in values if value in self.rows[field]]
+            rows = np.unique(np.concatenate(found)) if found else np.empty(0, dtype=np.int64)
+            result = rows if result is None else np.intersect1d(result, rows, assume_unique=True)
+        return result
+
+    def filter_rows(self, filter):
+        """Sorted rows matching a filter, or None if it uses other fields or operators"""
+        result = None
+        for field, condition in filter.items():
+            if field in ('$and', '$or'):
+                parts = [self.filter_rows(clause) for clause in condition]
+                if not parts or any(part is None for part in parts):
+                    return None
+                rows = parts[0]
+                for part in parts[1:]:
+                    rows = np.intersect1d(rows, part, assume_unique=True) if field == '$and' else np.union1d(rows, part)
+            else:
+                rows = self._condition_rows(field, condition)
+                if rows is None:
+                    return None
+            result = rows if result is None else np.intersect1d(result, rows, assume_unique=True)
+        return result
+
+class LocalVectorIndex:
+    """Exact cosine top-k over a memory-mapped float32 embedding matrix"""
+
+    def __init__(self, embeddings, ids, metadata):
+        self.embeddings = embeddings
+        self.ids = ids
+        self.metadata = metadata
+        self.dates = DateIndex(metadata)
+        self.values = ValueIndex(metadata)
+
+    @classmethod
+    def load(cls, path):
+        embeddings_path = os.path.join(path, EMBEDDINGS_FILE)
+        metadata_path = os.path.join(path, METADATA_FILE)
+        if not os.path.exists(embeddings_path) or not os.path.exists(metadata_path):
+            raise FileNotFoundError(
+                f'No local index in {path}; build one with '
+                f'RETRIEVER_BACKEND=local python scripts/embed_and_upsert_openai.py'
+            )
+        embeddings = np.load(embeddings_path, mmap_mode='r')
+        ids = []
+        metadata = []
+        with open(metadata_path, 'r', encoding='utf-8') as f:
+            for line in f:
+                row = json.loads(line)
+                ids.append(row['id'])
+                metadata.append(row.get('metadata', {}))
+        if len(ids) != embeddings.shape[0]:
+            raise ValueError(f'{metadata_path} has {len(ids)} rows but {embeddings_path} has {embeddings.shape[0]}')
+        return cls(embeddings, ids, metadata)
+
+    def __len__(self):
+        return len(self.ids)
+
+    def filter_rows(self, filter):
+        """Row numbers matching a metadata filter, in row order"""
+        rest = dict(filter)
+        date_condition = rest.get('date_epoch')
+        if isinstance(date_condition, dict) and set(date_condition) <= {'$gt', '$gte', '$lt', '$lte'}:
+            del rest['date_epoch']
+            rows = np.sort(self.dates.range_rows(date_condition))
+        else:
+            rows = np.arange(len(self.ids), dtype=np.int64)
+        if rest:
+            indexed = self.values.filter_rows(rest)
+            if indexed is not None:
+                rows = np.intersect1d(rows, indexed, assume_unique=True)
+            else:
+                rows = [row for row in rows if matches_filter(self.metadata[row], rest)]
+        return np.asarray(rows, dtype=np.int64)
+
+    def query(self, vector, top_k=10, include_metadata=True, filter=None, newest=None, **kwargs):
+        """Return the top_k rows by cosine similarity, Pinecone-style.
+
+        filter is a Pinecone metadata filter; newest (local only) limits the
+        search to the newest matching rows that have a date.
+        """
+        if not self.ids:
+            return {'matches': []}
+        query = normalize_rows(vector)
+        if newest is not None:
+            rows = self.dates.newest_rows(newest, filter)
+        elif filter:
+            rows = self.filter_rows(filter)
+        else:
+            rows = None
+        if rows is None:
+            scores = self.embeddings @ query
+        else:
+            if not len(rows):
+                return {'matches': []}
+            scores = self.embeddings[rows] @ query
+        top_k = min(top_k, len(scores))
+        # argpartition finds the top k in O(n); only those k get sorted
+        top = np.argpartition(-scores, top_k - 1)[:top_k]
+        top = top[np.argsort(-scores[top], kind='stable')]
+        matches = []
+        for i in top:
+            row = i if rows is None else rows[i]
+            match = Match(id=self.ids[row], score=float(scores[i]))
+            if include_metadata:
+                match['metadata'] = self.metadata[row]
+            matches.append(match)
+        return {'matches': matches}
+
+    def describe_index_stats(self):
+        return {
+            'dimension': int(self.embeddings.shape[1]) if len(self.embeddings.shape) == 2 else 0,
+            'total_vector_count': len(self.ids)
+        }
+
+class AsyncLocalVectorIndex:
+    """Awaitable facade over LocalVectorIndex matching pinecone's IndexAsyncio.
+
+    A query is a few milliseconds of NumPy work, so it runs inline on the event loop.
+    """
+
+    def __init__(self, index):
+        self.index = index
+
+    async def query(self, vector, top_k=10, include_metadata=True, filter=None, newest=None, **kwargs):
+        return self.index.query(vector=vector, top_k=top_k, include_metadata=include_metadata,
+                                filter=filter, newest=newest)
+
+    async def close(self):
+        pass
+
+class LocalIndexWriter:
+    """Collect vectors with a Pinecone-style ``upsert`` and write a local index.
+
+    Existing rows are loaded first so interrupted ingestion runs can resume;
+    upserting an existing ID replaces its row.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self._rows = {}  # id -> (vector, metadata), insertion ordered
+        if os.path.exists(os.path.join(path, EMBEDDINGS_FILE)):
+            existing = LocalVectorIndex.load(path)
+            for i, vector_id in enumerate(existing.ids):
+                self._rows[vector_id] = (np.array(existing.embeddings[i]), existing.metadata[i])
+
+    def __len__(self):
+        return len(self._rows)
+
+    def upsert(self, vectors, **kwargs):
+        for vector in vectors:
+            self._rows[vector['id']] = (
+                np.asarray(vector['values'], dtype=np.float32),
+                vector.get('metadata', {})
+            )
+        return {'upserted_count': len(vectors)}
+
+    def delete(self, ids, **kwargs):
+        for vector_id in ids:
+            self._rows.pop(vector_id, None)
+        return {}
+
+    def save(self):
+        """Write the index atomically (readers never see a half-written file)"""
+        os.makedirs(self.path, exist_ok=True)
+        ids = list(self._rows)
+        if ids:
+            matrix = normalize_rows(np.stack([self._rows[i][0] for i in ids]))
+        else:
+            matrix = np.zeros((0, 0), dtype=np.float32)
+
+        embeddings_path = os.path.join(self.path, EMBEDDINGS_FILE)
+        metadata_path = os.path.join(self.path, METADATA_FILE)
+        with open(embeddings_path + '.tmp', 'wb') as f:
+            np.save(f, matrix)
+        with open(metadata_path + '.tmp', 'w', encoding='utf-8') as f:
+            for vector_id in ids:
+                f.write(json.dumps({'id': vector_id, 'metadata': self._rows[vector_id][1]}, ensure_ascii=False) + '\n')
+        os.replace(embeddings_path + '.tmp', embeddings_path)
+        os.replace(metadata_path + '.tmp', metadata_path)
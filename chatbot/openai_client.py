@@ -0,0 +1,100 @@
+"""
+Shared OpenAI client provider.
+
+Building ``OpenAI(...)`` inside every call creates a fresh HTTP connection
+pool, so each embedding or completion pays for a new TCP/TLS handshake.
+This module keeps one long-lived client per process with a keep-alive
+connection pool that the API server, terminal chatbots and ingestion
+scripts all reuse. The async API pipeline gets an ``AsyncOpenAI``
+counterpart with the same pool settings.
+
+Configuration (environment variables):
+    OPENAI_POOL_SIZE              max open connections (default 100)
+    OPENAI_KEEPALIVE_CONNECTIONS  idle connections kept alive (default 20)
+    OPENAI_KEEPALIVE_EXPIRY       seconds an idle connection is kept (default 60)
+    OPENAI_TIMEOUT                read/write timeout in seconds (default 60)
+    OPENAI_CONNECT_TIMEOUT        connect timeout in seconds (default 10)
+    OPENAI_MAX_RETRIES            SDK-level retries (default 2)
+    OPENAI_BASE_URL               honoured by the SDK, e.g. for a local stub server
+"""
+
+import os
+import threading
+import httpx
+from openai import OpenAI, AsyncOpenAI
+from dotenv import load_dotenv
+
+load_dotenv()
+OPENAI_API_KEY = os.getenv('OPENAI_API_KEY')
+
+# Connection pool settings
+OPENAI_POOL_SIZE = int(os.getenv('OPENAI_POOL_SIZE', '100'))
+OPENAI_KEEPALIVE_CONNECTIONS = int(os.getenv('OPENAI_KEEPALIVE_CONNECTIONS', '20'))
+OPENAI_KEEPALIVE_EXPIRY = float(os.getenv('OPENAI_KEEPALIVE_EXPIRY', '60'))
+OPENAI_TIMEOUT = float(os.getenv('OPENAI_TIMEOUT', '60'))
+OPENAI_CONNECT_TIMEOUT = float(os.getenv('OPENAI_CONNECT_TIMEOUT', '10'))
+OPENAI_MAX_RETRIES = int(os.getenv('OPENAI_MAX_RETRIES', '2'))
+
+_client = None
+_client_pid = None
+_client_lock = threading.Lock()
+_async_client = None
+_async_client_pid = None
+
+def build_http_limits():
+    """Connection pool limits shared by the sync and async clients"""
+    return httpx.Limits(
+        max_connections=OPENAI_POOL_SIZE,
+        max_keepalive_connections=OPENAI_KEEPALIVE_CONNECTIONS,
+        keepalive_expiry=OPENAI_KEEPALIVE_EXPIRY
+    )
+
+def build_http_timeout():
+    """Request timeouts shared by the sync and async clients"""
+    return httpx.Timeout(OPENAI_TIMEOUT, connect=OPENAI_CONNECT_TIMEOUT)
+
+def get_openai_client():
+    """Return the process-wide OpenAI client, creating it on first use"""
+    global _client, _client_pid
+    # A pool inherited across fork() shares sockets with the parent, so rebuild it
+    if _client is None or _client_pid != os.getpid():
+        with _client_lock:
+            if _client is None or _client_pid != os.getpid():
+                http_client = httpx.Client(limits=build_http_limits(), timeout=build_http_timeout())
+                _client = OpenAI(
+                    api_key=OPENAI_API_KEY,
+                    http_client=http_client,
+                    max_retries=OPENAI_MAX_RETRIES
+                )
+                _client_pid = os.getpid()
+    return _client
+
+def close_openai_client():
+    """Close the shared client and release its pooled connections"""
+    global _client, _client_pid
+    with _client_lock:
+        if _client is not None and _client_pid == os.getpid():
+            _client.close()
+        _client = None
+        _client_pid = None
+
+def get_async_openai_client():
+    """Return the process-wide AsyncOpenAI client, creating it on first use"""
+    global _async_client, _async_client_pid
+    if _async_client is None or _async_client_pid != os.getpid():
+        http_client = httpx.AsyncClient(limits=build_http_limits(), timeout=build_http_timeout())
+        _async_client = AsyncOpenAI(
+            api_key=OPENAI_API_KEY,
+            http_client=http_client,
+            max_retries=OPENAI_MAX_RETRIES
+        )
+        _async_client_pid = os.getpid()
+    return _async_client
+
+async def close_async_openai_client():
+    """Close the shared async client (call from the server's shutdown hook)"""
+    global _async_client, _async_client_pid
+    if _async_client is not None and _async_client_pid == os.getpid():
+        await _async_client.close()
+    _async_client = None
+    _async_client_pid = None
@@ -0,0 +1,166 @@
+"""
+Query analysis: metadata filters from the record types, departments and
+wards a query names.
+
+Records carry record_type, department and ward_name metadata, but a plain
+vector search ignores it: "crematorium near Kothrud" gets the top-k of
+everything and leaves the LLM to pick out the crematoria. MetadataVocabulary
+is built from the values the corpus actually uses (so a filter never names
+a value with no records) and matches a query against them:
+
+    record_type   'crematorium', 'fire_brigade' -> "fire brigade", plurals ("policies"),
+                  and the type words of intent_router ("notice" -> circular)
+    department    'Electrical Department' -> "electrical department", "electrical"
+    ward_name     the value and its parts ("Kothrud-Bawdhan" -> "kothrud"); the ward
+                  office of QueryIntent.ward ("कोथरूड", "warje") adds the values
+                  its intent_router.WARD_OFFICES place names match
+
+Terms naming values of one field are combined with $in; a term naming
+values of several fields ("garden": a record type and a department) becomes
+an $or; different terms are combined with $and. The search falls back to no
+filter when too few records match, so a filtered search can use a smaller
+FILTERED_TOP_K and pass only FILTERED_CONTEXT_RESULTS records to the LLM.
+
+Configuration (environment variables):
+    QUERY_FILTERS              1 (default) filters retrieval by the metadata a query names, 0 disables
+    FILTERED_TOP_K             vector candidates for a filtered search (default 8)
+    FILTERED_CONTEXT_RESULTS   records passed to the LLM from a filtered search (default 4)
+    FILTER_MIN_RECORDS         values used by fewer records are not matched (default 3)
+"""
+
+import os
+import re
+from collections import Counter
+
+from intent_router import LATEST_RECORD_TYPES, WARD_OFFICES
+
+QUERY_FILTERS = os.getenv('QUERY_FILTERS', '1') != '0'
+FILTERED_TOP_K = int(os.getenv('FILTERED_TOP_K', '8'))
+FILTERED_CONTEXT_RESULTS = int(os.getenv('FILTERED_CONTEXT_RESULTS', '4'))
+FILTER_MIN_RECORDS = int(os.getenv('FILTER_MIN_RECORDS', '3'))
+
+FILTER_FIELDS = ('record_type', 'department', 'ward_name')
+# Values too generic to mean a filter when they appear in a question ("which department ...")
+GENERIC_VALUES = frozenset(['other', 'department', 'service', 'faq', 'general', 'unknown'])
+# Words that name the kind of value rather than the value itself
+_DEPARTMENT_WORDS = re.compile(r'\b(?:department|dept|section|cell)\b\.?|विभाग')
+_WARD_WORDS = re.compile(r'\b(?:ward office|ward|kshetriya karyalay|office)\b|क्षेत्रीय कार्यालय|वॉर्ड')
+_SEPARATORS = re.compile(r'[\s_\-/,&]+')
+
+def normalize_phrase(text):
+    """Lower-cased text with underscores, dashes and runs of spaces as single spaces"""
+    return _SEPARATORS.sub(' ', text.lower()).strip()
+
+def value_phrases(field, value):
+    """The phrases a query may use for a metadata value"""
+    phrase = normalize_phrase(value)
+    phrases = {phrase}
+    if field == 'department':
+        phrases.add(normalize_phrase(_DEPARTMENT_WORDS.sub(' ', value.lower())))
+    elif field == 'ward_name':
+        core = _WARD_WORDS.sub(' ', value.lower())
+        phrases.add(normalize_phrase(core))
+        phrases.update(normalize_phrase(part) for part in re.split(r'[-/,&]', core))
+    return {p for p in phrases if len(p) > 2 and p not in GENERIC_VALUES}
+
+class MetadataVocabulary:
+    """Phrases for the record_type, department and ward_name values of a set of records"""
+
+    def __init__(self, metadata, min_records=FILTER_MIN_RECORDS):
+        counts = Counter(
+            (field, meta[field]) for meta in metadata for field in FILTER_FIELDS
+            if isinstance(meta.get(field), str) and meta[field].strip()
+        )
+        self.values = {key: n for key, n in counts.items() if n >= min_records}
+        self.phrases = {}  # phrase -> {(field, value)}
+        for field, value in self.values:
+            if value.lower() in GENERIC_VALUES:
+                continue
+            for phrase in value_phrases(field, value):
+                self.phrases.setdefault(phrase, set()).add((field, value))
+
+        # Curated aliases, for the values that exist in this corpus
+        for record_type, words in LATEST_RECORD_TYPES:
+            if ('record_type', record_type) in self.values:
+                for word in words:
+                    self.phrases.setdefault(normalize_phrase(word), set()).add(('record_type', record_type))
+        # The ward_name values of each intent_router ward office, for QueryIntent.ward
+        self.ward_offices = {}  # ward office -> {ward_name values}
+        for ward, aliases in WARD_OFFICES:
+            values = {value for alias in aliases
+                      for field, value in self.phrases.get(normalize_phrase(alias), ()) if field == 'ward_name'}
+            if values:
+                self.ward_offices[ward] = values
+
+        # Longest phrases first; words in a phrase may be separated by any spacing,
+        # and English phrases also match their plural
+        alternatives = []
+        for phrase in sorted(self.phrases, key=len, reverse=True):
+            pattern = r'[\s_\-]+'.join(map(re.escape, phrase.split(' ')))
+            if phrase.isascii():
+                pattern = pattern[:-1] + '(?:y|ies)' if phrase.endswith('y') else pattern + '(?:e?s)?'
+            alternatives.append(pattern)
+        self._pattern = re.compile(r'(?<!\w)(' + '|'.join(alternatives) + r')(?!\w)') if alternatives else None
+
+    def __len__(self):
+        return len(self.phrases)
+
+    def match(self, query):
+        """{phrase: {(field, value)}} for the phrases a query contains"""
+        if self._pattern is None:
+            return {}
+        found = {}
+        for match in self._pattern.finditer(query.lower()):
+            phrase = normalize_phrase(match.group(1))
+            keys = self.phrases.get(phrase)
+            if keys is None and phrase.endswith('ies'):
+                keys = self.phrases.get(phrase[:-3] + 'y')
+            if keys is None and phrase.endswith('s'):
+                keys = self.phrases.get(phrase[:-1]) or self.phrases.get(phrase[:-2])
+            if keys:
+                found[phrase] = keys
+        return found
+
+    def query_filter(self, query, ward=None):
+        """Pinecone metadata filter for the values a query names, or None.
+
+        ward is the ward office classify_query found in the query (QueryIntent.ward).
+        """
+        by_field = {}  # field -> {values}, from terms naming a single field
+        either = []    # terms naming values of several fields
+        for keys in self.match(query).values():
+            fields = {field for field, _ in keys}
+            if len(fields) == 1:
+                by_field.setdefault(fields.pop(), set()).update(value for _, value in keys)
+            else:
+                either.append(keys)
+        if ward in self.ward_offices:
+            by_field.setdefault('ward_name', set()).update(self.ward_offices[ward])
+        clauses = [_field_condition(field, values) for field, values in by_field.items()]
+        for keys in either:
+            # Already implied by a single-field term on one of its fields
+            if any(value in by_field.get(field, ()) for field, value in keys):
+                continue
+            grouped = {}
+            for field, value in keys:
+                grouped.setdefault(field, set()).add(value)
+            clauses.append({'$or': [_field_condition(field, values) for field, values in sorted(grouped.items())]})
+        if not clauses:
+            return None
+        return clauses[0] if len(clauses) == 1 else {'$and': clauses}
+
+def _field_condition(field, values):
+    values = sorted(values)
+    return {field: {'$eq': values[0]}} if len(values) == 1 else {field: {'$in': values}}
+
+_vocabulary = None
+_vocabulary_source = None
+
+def get_vocabulary(metadata):
+    """The vocabulary of a record catalog (the keyword index's or the local index's metadata), built once"""
+    global _vocabulary, _vocabulary_source
+    if _vocabulary_source is not metadata:
+        _vocabulary = MetadataVocabulary(metadata)
+        _vocabulary_source = metadata
+        print(f"[INFO] Query filters: {len(_vocabulary)} phrases for {len(_vocabulary.values)} metadata values")
+    return _vocabulary
@@ -0,0 +1,144 @@
+"""
+Record text and metadata shared by ingestion and retrieval.
+
+``extract_text_for_embedding`` is the searchable text of a normalized PMC
+record and ``filter_metadata`` the metadata stored with its vectors. Both
+the embedding script and the chatbot's keyword index use them, so vector
+and keyword matches for a record carry the same text and metadata.
+
+Record dates are canonicalized once, at normalization or ingestion, into
+``date_iso`` (YYYY-MM-DD, sortable as a string) and ``date_epoch`` (integer
+seconds, UTC midnight, which the vector store can range-filter on), so
+"latest" sorting is a key lookup. Records and vectors written before these
+fields existed are parsed through a memoized parser.
+"""
+
+from datetime import datetime, timezone
+from functools import lru_cache
+
+DATE_FORMATS = [
+    '%d %B %Y', '%d %b %Y', '%Y-%m-%d', '%d/%m/%Y', '%m/%d/%Y',
+    '%d-%m-%Y', '%Y/%m/%d', '%B %d, %Y', '%b %d, %Y'
+]
+NO_DATE = (None, None)
+
+@lru_cache(maxsize=16384)
+def _canonical_date(date_str):
+    date_str = date_str.strip()
+    for fmt in DATE_FORMATS:
+        try:
+            parsed = datetime.strptime(date_str, fmt)
+            break
+        except ValueError:
+            continue
+    else:
+        # ISO timestamps such as 2024-05-10T09:30:00+05:30
+        try:
+            parsed = datetime.strptime(date_str[:10], '%Y-%m-%d')
+        except ValueError:
+            return NO_DATE
+    parsed = parsed.replace(tzinfo=timezone.utc)
+    return parsed.strftime('%Y-%m-%d'), int(parsed.timestamp())
+
+def canonical_date(date_str):
+    """(date_iso, date_epoch) of a date string, or (None, None) if it is not a date (memoized)"""
+    if not date_str or not isinstance(date_str, str):
+        return NO_DATE
+    return _canonical_date(date_str)
+
+def record_date_fields(meta):
+    """{'date_iso', 'date_epoch'} for a record's date (date, else display_date); empty if it has none"""
+    date_iso, date_epoch = canonical_date(meta.get('date') or meta.get('display_date'))
+    return {'date_iso': date_iso, 'date_epoch': date_epoch} if date_iso else {}
+
+def record_date_epoch(meta):
+    """Unix time of a record's date, or None when it has no parseable date"""
+    if isinstance(meta.get('date_epoch'), int):
+        return meta['date_epoch']
+    return canonical_date(meta.get('date') or meta.get('display_date'))[1]
+
+def record_date_key(meta):
+    """Newest-first sort key of a record: its date_iso, else the raw date string (unparseable dates)"""
+    date_iso = meta.get('date_iso')
+    if date_iso:
+        return date_iso
+    date_str = meta.get('date') or meta.get('display_date') or ''
+    return canonical_date(date_str)[0] or date_str
+
+def filter_metadata(meta):
+    """Filter metadata to only include essential fields within Pinecone limits"""
+    # Only keep essential metadata fields to stay within 40KB limit
+    essential_fields = {
+        'id', 'title', 'description', 'date', 'display_date', 
+        'department', 'ward_name', 'record_type', 'lang',
+        'pdf_url', 'external_link', 'url', 'chunk_id', 'total_chunks',
+        'embedding_model', 'date_iso', 'date_epoch'
+    }
+    
+    filtered = {}
+    for k, v in meta.items():
+        if k in essential_fields:
+            if isinstance(v, str) and len(v) > 1000:  # Truncate long strings
+                filtered[k] = v[:1000] + "..."
+            elif isinstance(v, (str, int, float, bool)):
+                filtered[k] = v
+            elif isinstance(v, list) and all(isinstance(i, str) for i in v):
+                # Truncate list items if too long
+                filtered[k] = [item[:500] + "..." if len(item) > 500 else item for item in v[:5]]
+    
+    # Canonical dates for sorting and range filters, if normalization did not add them
+    if 'date_iso' not in filtered:
+        filtered.update(record_date_fields(meta))
+    
+    return filtered
+
+def extract_text_for_embedding(rec):
+    """Enhanced text extraction optimized for OpenAI embeddings"""
+    text_parts = []
+    
+    # Use the enhanced full_content if available
+    if rec.get('full_content'):
+        text_parts.append(rec['full_content'])
+    else:
+        # Fallback to original method with improvements
+        title = rec.get('title', '')
+        if title:
+            text_parts.append(f"Title: {title}")
+        
+        description = rec.get('description')
+        if description:
+            text_parts.append(f"Description: {description}")
+        
+        # Add other important fields
+        long_desc = rec.get('long_description')
+        if long_desc:
+            text_parts.append(f"Details: {long_desc}")
+        
+        summary = rec.get('summary')
+        if summary:
+            if isinstance(summary, list):
+                for item in summary:
+                    text_parts.append(f"Summary: {item}")
+            else:
+                text_parts.append(f"Summary: {summary}")
+    
+    # Add department and ward information for better context
+    department = rec.get('department')
+    if department:
+        text_parts.append(f"Department: {department}")
+    
+    ward_name = rec.get('ward_name')
+    if ward_name:
+        text_parts.append(f"Ward: {ward_name}")
+    
+    # Add record type for better categorization
+    record_type = rec.get('record_type')
+    if record_type and record_type != 'other':
+        text_parts.append(f"Type: {record_type}")
+    
+    # Add contact information if available
+    contact = rec.get('contact')
+    if contact:
+        text_parts.append(f"Contact: {contact}")
+    
+    return "\n".join(text_parts)
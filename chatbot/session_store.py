@@ -0,0 +1,248 @@
+"""
+Server-side chat sessions keyed by session_id.
+
+The API hands out a session_id with every answer; clients send it back
+instead of their whole chat history. Each session keeps only the last
+SESSION_WINDOW turns (the window the prompt uses), so request size and
+parse cost stay constant however long the conversation runs. Sessions
+expire SESSION_TTL seconds after their last turn.
+
+Backends (SESSION_BACKEND):
+    memory   per-process LRU dict (default); sessions are lost on restart
+             and not shared between workers
+    sqlite   one SQLite file (WAL mode), shared by the workers on a host
+    redis    any Redis-compatible server (redis-py's asyncio client, or any
+             client with async get / set(ex=), e.g. a local stand-in)
+
+Configuration (environment variables):
+    SESSION_BACKEND       memory, sqlite or redis (default memory)
+    SESSION_WINDOW        turns kept per session (default 2)
+    SESSION_TTL           seconds of inactivity before a session expires (default 3600)
+    SESSION_MAX           max sessions held by the memory backend (default 10000)
+    SESSION_SQLITE_PATH   SQLite file (default data/sessions.sqlite3)
+    SESSION_REDIS_URL     Redis URL (default redis://localhost:6379/0)
+"""
+
+import json
+import os
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+
+SESSION_BACKEND = os.getenv('SESSION_BACKEND', 'memory').lower()
+SESSION_WINDOW = int(os.getenv('SESSION_WINDOW', '2'))
+SESSION_TTL = float(os.getenv('SESSION_TTL', '3600'))
+SESSION_MAX = int(os.getenv('SESSION_MAX', '10000'))
+SESSION_SQLITE_PATH = os.getenv(
+    'SESSION_SQLITE_PATH', os.path.join(os.path.dirname(__file__), '..', 'data', 'sessions.sqlite3')
+)
+SESSION_REDIS_URL = os.getenv('SESSION_REDIS_URL', 'redis://localhost:6379/0')
+
+class MemorySessionStore:
+    """Sessions in an LRU-ordered dict with per-session expiry"""
+
+    backend = 'memory'
+
+    def __init__(self, window=SESSION_WINDOW, ttl=SESSION_TTL, max_sessions=SESSION_MAX):
+        self.window = window
+        self.ttl = ttl
+        self.max_sessions = max_sessions
+        self._sessions = OrderedDict()  # session_id -> (expires_at, [turns])
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+
+    async def get_history(self, session_id):
+        """The session's recent turns, oldest first ([] for unknown or expired sessions)"""
+        with self._lock:
+            entry = self._sessions.get(session_id)
+            if entry is None:
+                self.misses += 1
+                return []
+            expires_at, turns = entry
+            if expires_at < time.monotonic():
+                del self._sessions[session_id]
+                self.expirations += 1
+                self.misses += 1
+                return []
+            self._sessions.move_to_end(session_id)
+            self.hits += 1
+            return list(turns)
+
+    async def add_turn(self, session_id, user, bot):
+        """Append a turn, keeping the last window turns, and renew the session's expiry"""
+        with self._lock:
+            entry = self._sessions.pop(session_id, None)
+            turns = entry[1] if entry and entry[0] >= time.monotonic() else []
+            turns = (turns + [{'user': user, 'bot': bot}])[-self.window:]
+            self._sessions[session_id] = (time.monotonic() + self.ttl, turns)
+            while len(self._sessions) > self.max_sessions:
+                self._sessions.popitem(last=False)
+                self.evictions += 1
+
+    async def close(self):
+        pass
+
+    def stats(self):
+        """Counters for the /health endpoint"""
+        with self._lock:
+            return {
+                'backend': self.backend,
+                'sessions': len(self._sessions),
+                'max_sessions': self.max_sessions,
+                'window': self.window,
+                'ttl_seconds': self.ttl,
+                'hits': self.hits,
+                'misses': self.misses,
+                'evictions': self.evictions,
+                'expirations': self.expirations
+            }
+
+class SQLiteSessionStore:
+    """Sessions as JSON rows in a SQLite table; expired rows are purged every PURGE_EVERY writes.
+
+    Reads and writes are single-row statements on the primary key, fast
+    enough to run inline on the event loop.
+    """
+
+    backend = 'sqlite'
+    PURGE_EVERY = 1000
+
+    def __init__(self, path=SESSION_SQLITE_PATH, window=SESSION_WINDOW, ttl=SESSION_TTL):
+        self.path = path
+        self.window = window
+        self.ttl = ttl
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute('PRAGMA journal_mode=WAL')
+        self._conn.execute('PRAGMA synchronous=NORMAL')
+        self._conn.execute(
+            'CREATE TABLE IF NOT EXISTS sessions ('
+            ' session_id TEXT PRIMARY KEY,'
+            ' turns TEXT NOT NULL,'
+            ' expires_at REAL NOT NULL)'
+        )
+        self._conn.commit()
+        self._lock = threading.Lock()
+        self._writes = 0
+        self.hits = 0
+        self.misses = 0
+
+    def _load(self, session_id):
+        row = self._conn.execute(
+            'SELECT turns FROM sessions WHERE session_id = ? AND expires_at >= ?', (session_id, time.time())
+        ).fetchone()
+        return json.loads(row[0]) if row else None
+
+    async def get_history(self, session_id):
+        """The session's recent turns, oldest first ([] for unknown or expired sessions)"""
+        with self._lock:
+            turns = self._load(session_id)
+            if turns is None:
+                self.misses += 1
+                return []
+            self.hits += 1
+            return turns
+
+    async def add_turn(self, session_id, user, bot):
+        """Append a turn, keeping the last window turns, and renew the session's expiry"""
+        with self._lock:
+            turns = ((self._load(session_id) or []) + [{'user': user, 'bot': bot}])[-self.window:]
+            self._conn.execute(
+                'INSERT OR REPLACE INTO sessions (session_id, turns, expires_at) VALUES (?, ?, ?)',
+                (session_id, json.dumps(turns, ensure_ascii=False), time.time() + self.ttl)
+            )
+            self._writes += 1
+            if self._writes % self.PURGE_EVERY == 0:
+                self._conn.execute('DELETE FROM sessions WHERE expires_at < ?', (time.time(),))
+            self._conn.commit()
+
+    async def close(self):
+        with self._lock:
+            self._conn.close()
+
+    def stats(self):
+        """Counters for the /health endpoint"""
+        with self._lock:
+            sessions = self._conn.execute(
+                'SELECT COUNT(*) FROM sessions WHERE expires_at >= ?', (time.time(),)
+            ).fetchone()[0]
+            return {
+                'backend': self.backend,
+                'sessions': sessions,
+                'window': self.window,
+                'ttl_seconds': self.ttl,
+                'hits': self.hits,
+                'misses': self.misses
+            }
+
+class RedisSessionStore:
+    """Sessions as JSON strings in a Redis-compatible server, expired by the server (SET ... EX).
+
+    client needs async get(key) and set(key, value, ex=seconds).
+    A turn is a GET and a SET, so two concurrent requests on one session
+    may keep only the later turn.
+    """
+
+    backend = 'redis'
+    KEY_PREFIX = 'pmc:session:'
+
+    def __init__(self, client, window=SESSION_WINDOW, ttl=SESSION_TTL):
+        self.client = client
+        self.window = window
+        self.ttl = ttl
+        self.hits = 0
+        self.misses = 0
+
+    async def get_history(self, session_id):
+        """The session's recent turns, oldest first ([] for unknown or expired sessions)"""
+        value = await self.client.get(self.KEY_PREFIX + session_id)
+        if value is None:
+            self.misses += 1
+            return []
+        self.hits += 1
+        return json.loads(value)
+
+    async def add_turn(self, session_id, user, bot):
+        """Append a turn, keeping the last window turns, and renew the session's expiry"""
+        key = self.KEY_PREFIX + session_id
+        value = await self.client.get(key)
+        turns = ((json.loads(value) if value is not None else []) + [{'user': user, 'bot': bot}])[-self.window:]
+        await self.client.set(key, json.dumps(turns, ensure_ascii=False), ex=max(1, int(self.ttl)))
+
+    async def close(self):
+        close = getattr(self.client, 'aclose', None) or getattr(self.client, 'close', None)
+        if close is not None:
+            await close()
+
+    def stats(self):
+        """Counters for the /health endpoint"""
+        return {
+            'backend': self.backend,
+            'window': self.window,
+            'ttl_seconds': self.ttl,
+            'hits': self.hits,
+            'misses': self.misses
+        }
+
+def create_session_store(backend=SESSION_BACKEND):
+    """The session store configured by SESSION_BACKEND"""
+    if backend == 'memory':
+        return MemorySessionStore()
+    if backend == 'sqlite':
+        return SQLiteSessionStore()
+    if backend == 'redis':
+        try:
+            import redis.asyncio as redis_asyncio
+        except ImportError:
+            raise ImportError("SESSION_BACKEND=redis needs the redis package (pip install redis)")
+        return RedisSessionStore(redis_asyncio.from_url(SESSION_REDIS_URL))
+    raise ValueError(f"Unknown SESSION_BACKEND '{backend}' (expected 'memory', 'sqlite' or 'redis')")
+
+# Process-wide store used by the API server
+session_store = create_session_store()
@@ -3,9 +3,11 @@ import json
 from dotenv import load_dotenv
 from pinecone import Pinecone
 import openai
-from langdetect import detect
 import re
 from collections import deque
+from record_metadata import record_date_key
+from language_detection import detect_language
+from intent_router import is_latest_query, is_basic_followup_query as is_followup_query
 
 # Load environment variables
 load_dotenv()
@@ -23,34 +25,6 @@ TOP_K = 5
 CONTEXT_RESULTS = 3  # Number of Pinecone results to pass to LLM
 MAX_HISTORY = 2      # Number of previous turns to include
 
-def is_latest_query(query):
-    LATEST_KEYWORDS = [
-        r"latest", r"most recent", r"newest", r"recent", r"last", r"current", r"today(?:'s)?", r"this week", r"fresh", r"updated", r"up-to-date", r"just published", r"just released", r"recently issued", r"recently published", r"recently released"
-    ]
-    pattern = re.compile(r"|".join(LATEST_KEYWORDS), re.IGNORECASE)
-    return bool(pattern.search(query))
-
-def is_followup_query(query, prev_user_query):
-    pronouns = ["it", "that", "this", "one", "which", "above", "them", "those", "these"]
-    q_lower = query.lower().strip()
-    if not prev_user_query:
-        return False
-    if len(q_lower.split()) <= 6 and any(p in q_lower for p in pronouns):
-        return True
-    question_words = ["which", "what", "where", "who", "when", "how"]
-    if any(q_lower.startswith(w) for w in question_words) and len(q_lower.split()) > 6:
-        return False
-    return False
-
-def detect_language(text):
-    try:
-        lang = detect(text)
-        if lang == 'mr':
-            return 'mr'
-        return 'en'
-    except Exception:
-        return 'en'
-
 def embed_query(text):
     # This function should use the same embedding model as Pinecone index (Gemini or OpenAI). If Pinecone index was built with Gemini, keep using Gemini for embeddings.
     # For now, we assume Gemini embeddings are still used for search.
@@ -160,10 +134,7 @@ def main():
         results = index.query(vector=query_emb, top_k=TOP_K, include_metadata=True)
         docs = results.get('matches', [])
         if is_latest_query(user_input):
-            def parse_date_safe(meta):
-                d = meta.get('metadata', {})
-                return d.get('date') or d.get('display_date') or ''
-            docs = sorted(docs, key=parse_date_safe, reverse=True)
+            docs = sorted(docs, key=lambda doc: record_date_key(doc.get('metadata', {})), reverse=True)
         context_docs = docs[:CONTEXT_RESULTS]
         pinecone_context = format_pinecone_results(context_docs) if context_docs else "No relevant information found."
         chat_history = list(history)
@@ -3,9 +3,12 @@ import json
 from dotenv import load_dotenv
 from pinecone import Pinecone
 import openai
-from langdetect import detect
 import re
 from collections import deque
+from openai_client import get_openai_client
+from record_metadata import record_date_key
+from language_detection import detect_language
+from intent_router import is_latest_query, is_basic_followup_query as is_followup_query
 
 # Load environment variables
 load_dotenv()
@@ -27,46 +30,11 @@ MAX_HISTORY = 2      # Number of previous turns to include
 EMBEDDING_MODEL = 'text-embedding-3-small'  # or 'text-embedding-3-large'
 LLM_MODEL = 'gpt-4o'  # or 'gpt-4o-mini' for cost optimization
 
-# Keywords for 'recent/latest' intent
-def is_latest_query(query):
-    LATEST_KEYWORDS = [
-        r"latest", r"most recent", r"newest", r"recent", r"last", r"current", r"today(?:'s)?", r"this week", r"fresh", r"updated", r"up-to-date", r"just published", r"just released", r"recently issued", r"recently published", r"recently released"
-    ]
-    pattern = re.compile(r"|".join(LATEST_KEYWORDS), re.IGNORECASE)
-    return bool(pattern.search(query))
-
-def is_followup_query(query, prev_user_query):
-    pronouns = ["it", "that", "this", "one", "which", "above", "them", "those", "these"]
-    q_lower = query.lower().strip()
-    # If no previous user query, can't be a follow-up
-    if not prev_user_query:
-        return False
-    # If query is very short and contains a pronoun, likely a follow-up
-    if len(q_lower.split()) <= 6 and any(p in q_lower for p in pronouns):
-        return True
-    # If query is a full question (starts with 'which', 'what', etc.) and is long enough, treat as standalone
-    question_words = ["which", "what", "where", "who", "when", "how"]
-    if any(q_lower.startswith(w) for w in question_words) and len(q_lower.split()) > 6:
-        return False
-    # Default: not a follow-up
-    return False
-
-# Helper: Detect language
-def detect_language(text):
-    try:
-        lang = detect(text)
-        if lang == 'mr':
-            return 'mr'
-        return 'en'
-    except Exception:
-        return 'en'
-
 # Helper: Embed query using OpenAI
 def embed_query(text):
     """Embed query using OpenAI embeddings for consistency with indexed data"""
     try:
-        from openai import OpenAI
-        client = OpenAI(api_key=OPENAI_API_KEY)
+        client = get_openai_client()
         response = client.embeddings.create(
             model=EMBEDDING_MODEL,
             input=text,
@@ -157,8 +125,7 @@ Please provide a comprehensive answer based on the available information."""
 def generate_response(prompt):
     """Generate response using OpenAI GPT model"""
     try:
-        from openai import OpenAI
-        client = OpenAI(api_key=OPENAI_API_KEY)
+        client = get_openai_client()
         response = client.chat.completions.create(
             model=LLM_MODEL,
             messages=[
@@ -252,10 +219,7 @@ def main():
             
             # If 'recent/latest' intent, sort by date
             if is_latest_query(user_input):
-                def parse_date_safe(meta):
-                    d = meta.get('metadata', {})
-                    return d.get('date') or d.get('display_date') or ''
-                docs = sorted(docs, key=parse_date_safe, reverse=True)
+                docs = sorted(docs, key=lambda doc: record_date_key(doc.get('metadata', {})), reverse=True)
             
             # Use top N results for context
             context_docs = docs[:CONTEXT_RESULTS]
@@ -1,143 +1,220 @@
 import os
 import json
+import time
 from dotenv import load_dotenv
 from pinecone import Pinecone
-import openai
-from langdetect import detect
 import re
 from collections import deque
-from datetime import datetime
 from urllib.parse import urlparse
+from openai_client import get_openai_client, get_async_openai_client
+from embedding_cache import embedding_cache
+from local_index import LocalVectorIndex, AsyncLocalVectorIndex
+from record_metadata import record_date_key
+from language_detection import detect_language
+from intent_router import classify_query
+from query_analysis import get_vocabulary, QUERY_FILTERS, FILTERED_TOP_K, FILTERED_CONTEXT_RESULTS
+from context_packer import pack_context, count_tokens, context_stats
+from bm25_index import get_bm25_index, reciprocal_rank_fusion, BM25_TOP_K, HYBRID_CONTEXT_RESULTS
 
 # Load environment variables
 load_dotenv()
 PINECONE_API_KEY = os.getenv('PINECONE_API_KEY')
 PINECONE_INDEX = os.getenv('PINECONE_INDEX', 'pmc-bot-index')
+PINECONE_HOST = os.getenv('PINECONE_HOST')  # Optional: skips host lookup, required for the async index
 OPENAI_API_KEY = os.getenv('OPENAI_API_KEY')
+# Retriever backend: 'pinecone' (default) or 'local' (in-process index built by embed_and_upsert_openai.py)
+RETRIEVER_BACKEND = os.getenv('RETRIEVER_BACKEND', 'pinecone').lower()
+LOCAL_INDEX_DIR = os.getenv('LOCAL_INDEX_DIR', os.path.join(os.path.dirname(__file__), '..', 'data', 'local_index'))
 
-# Initialize Pinecone and OpenAI
-pc = Pinecone(api_key=PINECONE_API_KEY)
-index = pc.Index(PINECONE_INDEX)
-openai.api_key = OPENAI_API_KEY
+# Initialize the retriever (OpenAI uses the shared pooled client from openai_client)
+if RETRIEVER_BACKEND == 'local':
+    pc = None
+    index = LocalVectorIndex.load(LOCAL_INDEX_DIR)
+elif RETRIEVER_BACKEND == 'pinecone':
+    pc = Pinecone(api_key=PINECONE_API_KEY)
+    index = pc.Index(PINECONE_INDEX, host=PINECONE_HOST) if PINECONE_HOST else pc.Index(PINECONE_INDEX)
+else:
+    raise ValueError(f"Unknown RETRIEVER_BACKEND '{RETRIEVER_BACKEND}' (expected 'pinecone' or 'local')")
+_async_index = None
 
 # Settings
 TOP_K = 15  # Increased for better search
 CONTEXT_RESULTS = 8 # Increased for better context
 MAX_HISTORY = 5
+# "Latest <record type>" queries search only the LATEST_CANDIDATES newest records of that type;
+# without a local record catalog, Pinecone is searched in date windows (days back from today)
+LATEST_CANDIDATES = int(os.getenv('LATEST_CANDIDATES', str(TOP_K)))
+LATEST_WINDOW_DAYS = sorted(int(d) for d in os.getenv('LATEST_WINDOW_DAYS', '30,90,365').split(',') if d.strip())
 
 # Use the same embedding model as used for indexing
 EMBEDDING_MODEL = 'text-embedding-3-small'
 LLM_MODEL = 'gpt-4o'
 
-def is_latest_query(query):
-    """Enhanced latest query detection"""
-    LATEST_KEYWORDS = [
-        r"latest", r"most recent", r"newest", r"recent", r"last", r"current", 
-        r"today(?:'s)?", r"this week", r"fresh", r"updated", r"up-to-date", 
-        r"just published", r"just released", r"recently issued", r"recently published", 
-        r"recently released", r"latest circular", r"recent circular", r"new circular"
-    ]
-    pattern = re.compile(r"|".join(LATEST_KEYWORDS), re.IGNORECASE)
-    return bool(pattern.search(query))
-
-def is_followup_query(query, prev_user_query):
-    """Enhanced follow-up detection"""
-    pronouns = ["it", "that", "this", "one", "which", "above", "them", "those", "these"]
-    q_lower = query.lower().strip()
-    
-    if not prev_user_query:
-        return False
-    
-    # Check for pronouns in short queries
-    if len(q_lower.split()) <= 6 and any(p in q_lower for p in pronouns):
-        return True
-    
-    # Check for references to previous content
-    reference_patterns = [
-        r"from above",
-        r"from the list", 
-        r"from those",
-        r"which one",
-        r"nearest to me",
-        r"closest to me",
-        r"near me",
-        r"nearby",
-        r"the one",
-        r"that one",
-        r"this one"
-    ]
-    
-    for pattern in reference_patterns:
-        if re.search(pattern, q_lower):
-            return True
-    
-    # Check for specific follow-up patterns
-    followup_patterns = [
-        r"what is the date",
-        r"when was it",
-        r"where is it",
-        r"who issued it",
-        r"which department",
-        r"what about",
-        r"tell me more",
-        r"give me details",
-        r"what else",
-        r"any other",
-        r"is there more",
-        r"which one",
-        r"from above",
-        r"from the list",
-        r"from those",
-        r"nearest to me",
-        r"closest to me",
-        r"near me",
-        r"nearby"
-    ]
-    
-    for pattern in followup_patterns:
-        if re.search(pattern, q_lower):
-            return True
-    
-    # Check for question words with context-dependent queries
-    question_words = ["which", "what", "where", "who", "when", "how"]
-    if any(q_lower.startswith(w) for w in question_words):
-        # If it's a short question, likely a follow-up
-        if len(q_lower.split()) <= 4:
-            return True
-        # If it's longer but contains context-dependent words
-        context_words = ["date", "time", "location", "department", "ward", "circular", "notice", 
-                        "place", "places", "nearest", "closest", "near", "nearby", "distance", 
-                        "area", "region", "zone", "above", "list", "those", "one"]
-        if any(word in q_lower for word in context_words):
-            return True
-    
-    return False
-
-def detect_language(text):
-    """Language detection"""
-    try:
-        lang = detect(text)
-        if lang == 'mr':
-            return 'mr'
-        return 'en'
-    except Exception:
-        return 'en'
-
 def embed_query(text):
-    """Embed query using OpenAI embeddings"""
+    """Embed query using OpenAI embeddings (served from the embedding cache when possible)"""
+    cached = embedding_cache.get(text, EMBEDDING_MODEL)
+    if cached is not None:
+        return cached.tolist()
     try:
-        from openai import OpenAI
-        client = OpenAI(api_key=OPENAI_API_KEY)
+        client = get_openai_client()
         response = client.embeddings.create(
             model=EMBEDDING_MODEL,
             input=text,
             encoding_format='float'
         )
-        return response.data[0].embedding
+        embedding = response.data[0].embedding
+        embedding_cache.put(text, EMBEDDING_MODEL, embedding)
+        return embedding
     except Exception as e:
         print(f"Embedding error: {e}")
         return None
 
+async def aembed_query(text):
+    """Async variant of embed_query for the API server"""
+    cached = embedding_cache.get(text, EMBEDDING_MODEL)
+    if cached is not None:
+        return cached.tolist()
+    try:
+        client = get_async_openai_client()
+        response = await client.embeddings.create(
+            model=EMBEDDING_MODEL,
+            input=text,
+            encoding_format='float'
+        )
+        embedding = response.data[0].embedding
+        embedding_cache.put(text, EMBEDDING_MODEL, embedding)
+        return embedding
+    except Exception as e:
+        print(f"Embedding error: {e}")
+        return None
+
+def get_async_index():
+    """Return the shared asyncio index for the configured backend, resolving the Pinecone host once"""
+    global _async_index
+    if _async_index is None:
+        if RETRIEVER_BACKEND == 'local':
+            _async_index = AsyncLocalVectorIndex(index)
+        else:
+            host = PINECONE_HOST or pc.describe_index(PINECONE_INDEX).host
+            _async_index = pc.IndexAsyncio(host=host)
+    return _async_index
+
+async def close_async_index():
+    """Close the asyncio index (call from the server's shutdown hook)"""
+    global _async_index
+    if _async_index is not None:
+        await _async_index.close()
+        _async_index = None
+
+def latest_search_plan(record_type, now=None):
+    """Query options to try, in order, for the latest records of a type.
+
+    The local index searches the newest LATEST_CANDIDATES records of the type
+    through its date index. Pinecone is asked for the type on or after the
+    date of the LATEST_CANDIDATES-th newest such record, read from the keyword
+    index's copy of the records; without it, within each LATEST_WINDOW_DAYS
+    window. Both fall back to the type alone and then to no filter.
+    """
+    type_filter = {'record_type': {'$eq': record_type}}
+    if RETRIEVER_BACKEND == 'local':
+        return [{'filter': type_filter, 'newest': LATEST_CANDIDATES}, {'filter': None}]
+    catalog = get_bm25_index()
+    cutoff = catalog.dates.newest_cutoff(LATEST_CANDIDATES, type_filter) if catalog is not None else None
+    if cutoff is not None:
+        cutoffs = [cutoff]
+    else:
+        now = time.time() if now is None else now
+        cutoffs = [int(now - days * 86400) for days in LATEST_WINDOW_DAYS]
+    windows = [{**type_filter, 'date_epoch': {'$gte': c}} for c in cutoffs]
+    return [{'filter': f} for f in windows] + [{'filter': type_filter}, {'filter': None}]
+
+def get_query_vocabulary():
+    """Metadata vocabulary of the keyword index's records (or the local index's), None without either"""
+    if not QUERY_FILTERS:
+        return None
+    catalog = get_bm25_index()
+    if catalog is None and RETRIEVER_BACKEND == 'local':
+        catalog = index
+    return get_vocabulary(catalog.metadata) if catalog is not None else None
+
+def analyze_query(query_text, intent):
+    """Metadata filter for the record types, departments and wards a query names, or None.
+
+    Latest queries for a record type have their own plan (latest_search_plan).
+    """
+    if intent.latest and intent.record_type is not None:
+        return None
+    vocabulary = get_query_vocabulary()
+    return vocabulary.query_filter(query_text, intent.ward) if vocabulary is not None else None
+
+def search_plan(intent, query_filter=None):
+    """(query options to try in order, matches a step needs to be used), or None for a plain top-k.
+
+    A query-analysis filter is searched with FILTERED_TOP_K and is used when it
+    fills FILTERED_CONTEXT_RESULTS; only otherwise is the unfiltered top-k queried.
+    """
+    if intent.latest and intent.record_type is not None:
+        return latest_search_plan(intent.record_type), CONTEXT_RESULTS
+    if query_filter is not None:
+        return [{'filter': query_filter, 'top_k': FILTERED_TOP_K}, {'filter': None}], FILTERED_CONTEXT_RESULTS
+    return None
+
+def search_index(query_emb, intent, query_filter=None):
+    """Vector matches for a query and the metadata filter they were restricted to (or None).
+
+    Latest queries that name a record type (intent from classify_query) are
+    pre-filtered by type and date instead of re-sorting the plain top-k,
+    which often misses the newest records. Other queries are restricted to
+    query_filter (from analyze_query) when enough records match it.
+    """
+    planned = search_plan(intent, query_filter)
+    if planned is None:
+        return index.query(vector=query_emb, top_k=TOP_K, include_metadata=True).get('matches', []), None
+    plan, needed = planned
+    for options in plan:
+        matches = index.query(vector=query_emb, include_metadata=True, **{'top_k': TOP_K, **options}).get('matches', [])
+        if len(matches) >= needed or options is plan[-1]:
+            return matches, options['filter']
+
+async def asearch_index(query_emb, intent, query_filter=None):
+    """Async search_index on the shared asyncio index.
+
+    The plan's steps run one at a time, like search_index: a step is only
+    queried when the previous one came back short, so most chats send a
+    single query to the vector store.
+    """
+    async_index = get_async_index()
+    planned = search_plan(intent, query_filter)
+    if planned is None:
+        results = await async_index.query(vector=query_emb, top_k=TOP_K, include_metadata=True)
+        return results.get('matches', []), None
+    plan, needed = planned
+    for options in plan:
+        results = await async_index.query(vector=query_emb, include_metadata=True, **{'top_k': TOP_K, **options})
+        matches = results.get('matches', [])
+        if len(matches) >= needed or options is plan[-1]:
+            return matches, options['filter']
+
+def hybrid_rank(query_text, docs, search_filter=None, query_filter=None):
+    """Fuse vector matches with BM25 keyword matches by reciprocal rank.
+
+    Returns (ranked docs, number of them to use as context). Exact lookups
+    (circular numbers, wards, phone numbers) rank well in at least one list,
+    so fewer fused records are needed; without a keyword index the vector
+    results and CONTEXT_RESULTS are used unchanged. search_filter, the
+    filter the vector search used, restricts the keyword matches the same way;
+    when it is the query-analysis filter, every record already matches what
+    the query names and FILTERED_CONTEXT_RESULTS are enough.
+    """
+    context_results = CONTEXT_RESULTS
+    bm25 = get_bm25_index()
+    if bm25 is not None:
+        docs = reciprocal_rank_fusion([docs, bm25.search(query_text, BM25_TOP_K, filter=search_filter)])
+        context_results = HYBRID_CONTEXT_RESULTS
+    if query_filter is not None and search_filter is query_filter:
+        context_results = min(context_results, FILTERED_CONTEXT_RESULTS)
+    return docs, context_results
+
 def validate_url(url):
     """Validate and fix URLs"""
     if not url:
@@ -161,61 +238,46 @@ def validate_url(url):
     
     return None
 
-def format_pinecone_results(docs):
-    """Enhanced formatting with URL validation"""
-    formatted = []
-    for i, doc in enumerate(docs, 1):
-        meta = doc.get('metadata', {})
-        title = meta.get('title', '')
-        description = meta.get('description', '')
-        date = meta.get('date', meta.get('display_date', ''))
-        department = meta.get('department', '')
-        ward_name = meta.get('ward_name', '')
-        record_type = meta.get('record_type', '')
-        
-        # Get and validate link
-        link = meta.get('pdf_url') or meta.get('external_link') or meta.get('url')
-        valid_link = validate_url(link)
-        
-        s = f"Record {i}:\n"
-        if title:
-            s += f"Title: {title}\n"
-        if description:
-            s += f"Description: {description}\n"
-        if date:
-            s += f"Date: {date}\n"
-        if department:
-            s += f"Department: {department}\n"
-        if ward_name:
-            s += f"Ward: {ward_name}\n"
-        if record_type and record_type != 'other':
-            s += f"Type: {record_type}\n"
-        if valid_link:
-            s += f"Link: {valid_link}\n"
-        formatted.append(s.strip())
-    return '\n---\n'.join(formatted)
-
-def parse_date_safe(date_str):
-    """Enhanced date parsing that returns consistent string format for sorting"""
-    if not date_str:
-        return ''
+def format_record(i, doc, max_description_chars=None):
+    """One record as the prompt shows it (description cut to max_description_chars if given)"""
+    meta = doc.get('metadata', {})
+    title = meta.get('title', '')
+    description = meta.get('description', '')
+    date = meta.get('date', meta.get('display_date', ''))
+    department = meta.get('department', '')
+    ward_name = meta.get('ward_name', '')
+    record_type = meta.get('record_type', '')
+    if max_description_chars is not None and len(description) > max_description_chars:
+        description = description[:max_description_chars].rstrip() + '...' if max_description_chars else ''
     
-    # Try to parse various date formats
-    date_formats = [
-        '%d %B %Y', '%d %b %Y', '%Y-%m-%d', '%d/%m/%Y', '%m/%d/%Y',
-        '%d-%m-%Y', '%Y/%m/%d', '%B %d, %Y', '%b %d, %Y'
-    ]
+    # Get and validate link
+    link = meta.get('pdf_url') or meta.get('external_link') or meta.get('url')
+    valid_link = validate_url(link)
     
-    for fmt in date_formats:
-        try:
-            parsed_date = datetime.strptime(date_str, fmt)
-            # Return in YYYY-MM-DD format for consistent string sorting
-            return parsed_date.strftime('%Y-%m-%d')
-        except:
-            continue
-    
-    # If no format matches, return the original string for sorting
-    return date_str
+    s = f"Record {i}:\n"
+    if title:
+        s += f"Title: {title}\n"
+    if description:
+        s += f"Description: {description}\n"
+    if date:
+        s += f"Date: {date}\n"
+    if department:
+        s += f"Department: {department}\n"
+    if ward_name:
+        s += f"Ward: {ward_name}\n"
+    if record_type and record_type != 'other':
+        s += f"Type: {record_type}\n"
+    if valid_link:
+        s += f"Link: {valid_link}\n"
+    return s.strip()
+
+def format_pinecone_results(docs):
+    """Enhanced formatting with URL validation"""
+    return '\n---\n'.join(format_record(i, doc) for i, doc in enumerate(docs, 1))
+
+def pack_records(docs, context_results):
+    """The most relevant distinct records that fit CONTEXT_TOKEN_BUDGET (at most context_results)"""
+    return pack_context(docs, format_record, context_results)
 
 def build_llm_prompt(user_query, pinecone_context, chat_history, lang):
     """Enhanced prompt building"""
@@ -270,15 +332,16 @@ Please provide a comprehensive answer based on the available information."""
     
     return prompt
 
+SYSTEM_PROMPT = "You are a helpful assistant for Pune Municipal Corporation (PMC) information."
+
 def generate_response(prompt):
     """Generate response using OpenAI GPT"""
     try:
-        from openai import OpenAI
-        client = OpenAI(api_key=OPENAI_API_KEY)
+        client = get_openai_client()
         response = client.chat.completions.create(
             model=LLM_MODEL,
             messages=[
-                {"role": "system", "content": "You are a helpful assistant for Pune Municipal Corporation (PMC) information."},
+                {"role": "system", "content": SYSTEM_PROMPT},
                 {"role": "user", "content": prompt}
             ],
             max_tokens=1000,
@@ -326,32 +389,32 @@ def main():
             
             # Follow-up handling
             prev_user_query = chat_history[-1]['user'] if chat_history else None
+            intent = classify_query(user_input, prev_user_query)
             query_for_search = user_input
-            if is_followup_query(user_input, prev_user_query):
+            if intent.followup:
                 query_for_search = f"{user_input.strip()} (context: {prev_user_query})"
             
-            # Embed and search Pinecone
+            # Embed and search the index
             query_emb = embed_query(query_for_search)
             if not query_emb:
                 print("Error: Could not embed query. Please try again.")
                 continue
             
-            results = index.query(vector=query_emb, top_k=TOP_K, include_metadata=True)
-            docs = results.get('matches', [])
+            query_filter = analyze_query(query_for_search, intent)
+            matches, search_filter = search_index(query_emb, intent, query_filter)
+            docs, context_results = hybrid_rank(query_for_search, matches, search_filter, query_filter)
             
             # Enhanced sorting for latest queries
-            if is_latest_query(user_input):
-                def safe_date_sort(doc):
-                    date_str = doc.metadata.get('date', doc.metadata.get('display_date', ''))
-                    return parse_date_safe(date_str)
-                docs = sorted(docs, key=safe_date_sort, reverse=True)
-            
-            # Use top N results for context
-            context_docs = docs[:CONTEXT_RESULTS]
-            pinecone_context = format_pinecone_results(context_docs) if context_docs else "No relevant information found."
+            if intent.latest:
+                docs = sorted(docs, key=lambda doc: record_date_key(doc.metadata), reverse=True)
             
+            # Top N distinct results that fit the context token budget
+            packed = pack_records(docs, context_results)
+            pinecone_context = packed.text or "No relevant information found."
+
             # Build prompt and generate response
             prompt = build_llm_prompt(user_input, pinecone_context, list(chat_history), lang)
+            context_stats.record(packed, count_tokens(SYSTEM_PROMPT) + count_tokens(prompt))
             answer = generate_response(prompt)
             
             # Clean up the response
@@ -16,10 +16,15 @@ import sys
 sys.path.append(os.path.join(os.path.dirname(__file__), 'chatbot'))
 
 # Import the improved chatbot API
-from chatbot_api_improved import app as chatbot_app
+from chatbot_api_improved import app as chatbot_app, lifespan as chatbot_lifespan
+from embedding_cache import embedding_cache
+from language_detection import language_detector
+from answer_cache import answer_cache
+from session_store import session_store
+from context_packer import context_stats
 
-# Create main app
-app = FastAPI(title="PMC Chatbot (Improved)", version="2.0.0")
+# Create main app (mounted sub-apps don't run their own lifespan, so reuse it here)
+app = FastAPI(title="PMC Chatbot (Improved)", version="2.0.0", lifespan=chatbot_lifespan)
 
 # Add CORS middleware
 app.add_middleware(
@@ -44,7 +49,16 @@ async def read_index():
 @app.get("/health")
 async def health_check():
     """Health check endpoint"""
-    return {"status": "healthy", "service": "PMC Chatbot (Improved)", "version": "2.0.0"}
+    return {
+        "status": "healthy",
+        "service": "PMC Chatbot (Improved)",
+        "version": "2.0.0",
+        "embedding_cache": embedding_cache.stats(),
+        "answer_cache": answer_cache.stats(),
+        "sessions": session_store.stats(),
+        "language_detection": language_detector.stats(),
+        "context_packing": context_stats.stats()
+    }
 
 if __name__ == "__main__":
     print("🚀 Starting PMC Chatbot Server (Improved)...")
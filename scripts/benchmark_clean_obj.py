@@ -0,0 +1,166 @@
+#!/usr/bin/env python3
+"""
+Parity check and benchmark: recursive vs single-pass LinkProcessor.clean_obj.
+
+The previous clean_obj (kept verbatim below) cleaned every child twice, once
+in the filter and once for the value, so a node at depth d was visited 2^d
+times. The check:
+
+  * compares both versions on every crawled item in data/ and on generated
+    nested payloads (exit status 1 on any difference)
+  * times both on the largest captured payloads, reporting node visits
+  * times both on a chain of nested objects of growing depth, where the
+    recursive version doubles per level and the iterative one stays linear
+  * cleans a payload nested far beyond the recursion limit
+
+Usage:
+    python scripts/benchmark_clean_obj.py
+    python scripts/benchmark_clean_obj.py --data-dir data --largest 20 --max-depth 22
+"""
+
+import argparse
+import json
+import os
+import random
+import sys
+import time
+
+from enhanced_extract_pmc_data import LinkProcessor
+
+class LegacyCleaner:
+    """clean_obj before the single-pass version, counting visits"""
+
+    def __init__(self):
+        self.visits = 0
+
+    def clean_obj(self, obj):
+        """Recursive cleaner for null/empty values"""
+        self.visits += 1
+        if isinstance(obj, dict):
+            return {k: self.clean_obj(v) for k, v in obj.items() 
+                   if v not in [None, '', [], {}] and self.clean_obj(v) not in [None, '', [], {}]}
+        elif isinstance(obj, list):
+            return [self.clean_obj(v) for v in obj 
+                   if v not in [None, '', [], {}] and self.clean_obj(v) not in [None, '', [], {}]]
+        else:
+            return obj
+
+def count_nodes(obj):
+    stack, nodes = [obj], 0
+    while stack:
+        value = stack.pop()
+        nodes += 1
+        if isinstance(value, dict):
+            stack.extend(value.values())
+        elif isinstance(value, list):
+            stack.extend(value)
+    return nodes
+
+def max_depth(obj):
+    stack, deepest = [(obj, 0)], 0
+    while stack:
+        value, depth = stack.pop()
+        deepest = max(deepest, depth)
+        children = value.values() if isinstance(value, dict) else value if isinstance(value, list) else ()
+        stack.extend((child, depth + 1) for child in children)
+    return deepest
+
+def load_raw_items(data_dir):
+    items = []
+    if not os.path.isdir(data_dir):
+        return items
+    for fname in sorted(os.listdir(data_dir)):
+        if not (fname.startswith('pmc_data_') and fname.endswith('.jsonl')):
+            continue
+        with open(os.path.join(data_dir, fname), 'r', encoding='utf-8') as f:
+            for line in f:
+                try:
+                    entry = json.loads(line)
+                except ValueError:
+                    continue
+                if isinstance(entry, dict) and 'raw' in entry:
+                    items.append(entry['raw'])
+    return items
+
+def random_value(rng, depth=0):
+    kind = rng.random()
+    if depth < 6 and kind < 0.25:
+        return {f'k{i}': random_value(rng, depth + 1) for i in range(rng.randint(0, 4))}
+    if depth < 6 and kind < 0.4:
+        return [random_value(rng, depth + 1) for _ in range(rng.randint(0, 4))]
+    return rng.choice([None, '', [], {}, 0, False, 'text', 'मालमत्ता', 3.5, [None], {'a': ''}, [[{}]]])
+
+def nested_chain(depth):
+    """{'data': {'data': ... {'title': 'x', 'empty': ''} ...}} with siblings at every level"""
+    obj = {'title': 'leaf', 'empty': '', 'none': None}
+    for level in range(depth):
+        obj = {'level': level, 'data': obj, 'notes': '', 'attachments': []}
+    return obj
+
+def timed(fn, objs, repeat=1):
+    best = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        for obj in objs:
+            fn(obj)
+        elapsed = time.perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+    return best
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark recursive vs single-pass clean_obj')
+    parser.add_argument('--data-dir', default='data')
+    parser.add_argument('--largest', type=int, default=20, help='Captured payloads to time')
+    parser.add_argument('--max-depth', type=int, default=20, help='Deepest chain for the recursive version')
+    parser.add_argument('--repeat', type=int, default=3)
+    args = parser.parse_args()
+
+    processor = LinkProcessor('en')
+    crawled = load_raw_items(args.data_dir)
+    rng = random.Random(0)
+    generated = [random_value(rng) for _ in range(20000)]
+
+    mismatches = 0
+    for obj in crawled + generated + [nested_chain(d) for d in range(12)]:
+        old = LegacyCleaner().clean_obj(obj)
+        new = processor.clean_obj(obj)
+        # Compare serialized so key order counts as well
+        if json.dumps(old, ensure_ascii=False) != json.dumps(new, ensure_ascii=False):
+            mismatches += 1
+            if mismatches <= 10:
+                print(f'MISMATCH {json.dumps(obj)[:100]}\n  recursive: {old}\n  iterative: {new}')
+    print(f'{len(crawled)} crawled items, {len(generated)} generated objects, {mismatches} mismatches')
+
+    if crawled:
+        largest = sorted(crawled, key=lambda o: len(json.dumps(o, ensure_ascii=False)), reverse=True)
+        largest = largest[:args.largest]
+        print('-' * 84)
+        print(f'Largest {len(largest)} captured payloads: {sum(map(count_nodes, largest))} nodes, '
+              f'max depth {max(map(max_depth, largest))}')
+        legacy = LegacyCleaner()
+        for obj in largest:
+            legacy.clean_obj(obj)
+        old_time = timed(LegacyCleaner().clean_obj, largest, args.repeat)
+        new_time = timed(processor.clean_obj, largest, args.repeat)
+        print(f'recursive  {old_time * 1000:9.2f} ms | {legacy.visits} visits')
+        print(f'iterative  {new_time * 1000:9.2f} ms | {sum(map(count_nodes, largest))} visits')
+        print(f'Speedup: {old_time / new_time:.1f}x')
+
+    print('-' * 84)
+    print(f'{"depth":>5} {"nodes":>6} {"recursive visits":>17} {"recursive ms":>13} {"iterative ms":>13}')
+    for depth in range(4, args.max_depth + 1, 4):
+        obj = nested_chain(depth)
+        legacy = LegacyCleaner()
+        old_time = timed(legacy.clean_obj, [obj])
+        new_time = timed(processor.clean_obj, [obj], args.repeat)
+        print(f'{depth:>5} {count_nodes(obj):>6} {legacy.visits:>17} {old_time * 1000:>13.2f} {new_time * 1000:>13.3f}')
+
+    deep = nested_chain(sys.getrecursionlimit() * 5)
+    start = time.perf_counter()
+    cleaned = processor.clean_obj(deep)
+    print(f'Depth {max_depth(cleaned)} payload cleaned iteratively in {(time.perf_counter() - start) * 1000:.1f} ms '
+          f'(recursion limit {sys.getrecursionlimit()})')
+    return 1 if mismatches else 0
+
+if __name__ == '__main__':
+    sys.exit(main())
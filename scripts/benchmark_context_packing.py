@@ -0,0 +1,170 @@
+#!/usr/bin/env python3
+"""
+Prompt size with and without token-budgeted context packing (chatbot/context_packer.py).
+
+Builds a temporary local index over the normalized records (hashed
+bag-of-words embeddings, as in evaluate_query_filters.py, so no API calls)
+and runs generated queries through the chat retrieval path of
+terminal_chatbot_openai_improved: analyze_query, search_index, hybrid_rank.
+The records each query retrieves go into the context two ways:
+
+    unpacked   the first context_results records, formatted whole (the previous behaviour)
+    packed     pack_records(): distinct records within CONTEXT_TOKEN_BUDGET
+
+on two versions of the corpus:
+
+    normalized    the records as normalize_pmc_data.py writes them
+    long          the full content as the description (cut to 1000 characters
+                  by filter_metadata, like pages with long descriptions), and a
+                  share of records republished under a new id with a revised
+                  title (--republished)
+
+and reports the mean / p95 / max context tokens, the tokens saved, the
+duplicates skipped, the records truncated and the packing time per request,
+for each budget in --budgets. Tokens are counted with context_packer's
+counter; when tiktoken's encoding could be downloaded, the approximate
+count is also compared with it.
+
+Skipped duplicates are replaced by the next distinct record, so a budget
+above the unpacked size can use more tokens than the unpacked context.
+
+Exits with status 1 if a packed context exceeds its budget with more than
+one record.
+
+Usage:
+    python scripts/benchmark_context_packing.py
+    python scripts/benchmark_context_packing.py --data data/pmc_data_normalized.jsonl --budgets 800,1200,2000
+"""
+
+import argparse
+import json
+import os
+import random
+import sys
+import tempfile
+import time
+
+sys.path.append(os.path.join(os.path.dirname(__file__), '..', 'chatbot'))
+import bm25_index
+from context_packer import pack_context, token_counter, approximate_token_count, CONTEXT_TOKEN_BUDGET
+from intent_router import classify_query
+from evaluate_query_filters import build_index, hashed_embedding, generate_queries
+
+def long_corpus(records, republished, seed=0):
+    """Records with their full content as description, and a share of them republished under a new id"""
+    rng = random.Random(seed)
+    out = []
+    for rec in records:
+        rec = dict(rec)
+        if isinstance(rec.get('full_content'), str) and rec['full_content'].strip():
+            rec['description'] = rec['full_content']
+        out.append(rec)
+        if rec.get('id') and rng.random() < republished:
+            out.append({**rec, 'id': rec['id'] + '-republished', 'title': f"{rec.get('title') or ''} (Revised)"})
+    return out
+
+def percentile(values, pct):
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(round(pct / 100.0 * (len(ordered) - 1))))]
+
+def retrieve(chat, queries):
+    """(docs, context_results) of each query, as the chat endpoint retrieves them"""
+    retrieved = []
+    for query in queries:
+        intent = classify_query(query)
+        query_filter = chat.analyze_query(query, intent)
+        matches, search_filter = chat.search_index(hashed_embedding(query), intent, query_filter)
+        retrieved.append(chat.hybrid_rank(query, matches, search_filter, query_filter))
+    return retrieved
+
+def run_corpus(label, records, data_file, n_queries, budgets):
+    """Report lines for one corpus; returns (failures, packed context texts)"""
+    with tempfile.TemporaryDirectory() as tmp:
+        if data_file is None:
+            data_file = os.path.join(tmp, 'records.jsonl')
+            with open(data_file, 'w', encoding='utf-8') as f:
+                f.writelines(json.dumps(rec, ensure_ascii=False) + '\n' for rec in records)
+        index_dir = os.path.join(tmp, 'index')
+        build_index(records, index_dir)
+        os.environ.update({'RETRIEVER_BACKEND': 'local', 'LOCAL_INDEX_DIR': index_dir})
+        bm25_index.BM25_DATA_FILE = data_file
+        bm25_index._bm25_index, bm25_index._bm25_loaded = None, False
+        stdout, sys.stdout = sys.stdout, open(os.devnull, 'w')
+        sys.modules.pop('terminal_chatbot_openai_improved', None)
+        import terminal_chatbot_openai_improved as chat
+        vocabulary = chat.get_query_vocabulary()
+        sys.stdout = stdout
+
+        queries = [query for query, _ in generate_queries(records, vocabulary, n_queries)]
+        retrieved = retrieve(chat, queries)
+
+    unpacked = [token_counter.count(chat.format_pinecone_results(docs[:n])) for docs, n in retrieved]
+    print(f'{label}: {len(records)} records, {len(queries)} queries')
+    print(f'  {"unpacked":<14} {sum(unpacked) / len(unpacked):7.1f} mean | {percentile(unpacked, 95):5d} p95 | '
+          f'{max(unpacked):5d} max tokens')
+    failures, texts = 0, []
+    for budget in budgets:
+        tokens, saved, duplicates, truncated = [], 0, 0, 0
+        start = time.perf_counter()
+        packs = [pack_context(docs, chat.format_record, n, budget=budget) for docs, n in retrieved]
+        elapsed = time.perf_counter() - start
+        for packed in packs:
+            tokens.append(packed.tokens)
+            saved += packed.saved_tokens
+            duplicates += packed.duplicates
+            truncated += packed.truncated
+            if packed.tokens > budget and len(packed.docs) > 1:
+                failures += 1
+                print(f'  OVER BUDGET {packed.tokens} > {budget} with {len(packed.docs)} records')
+            texts.append(packed.text)
+        n = len(packs)
+        print(f'  {"budget " + str(budget):<14} {sum(tokens) / n:7.1f} mean | {percentile(tokens, 95):5d} p95 | '
+              f'{max(tokens):5d} max tokens | saved {saved / max(sum(unpacked), 1):6.1%} | '
+              f'{duplicates / n:4.2f} duplicates, {truncated / n:4.2f} truncated per request | '
+              f'{elapsed / n * 1000:5.2f} ms')
+    return failures, texts
+
+def compare_tokenizers(texts):
+    """Approximate count vs tiktoken's, when its encoding can be loaded"""
+    if not token_counter.name.startswith('tiktoken'):
+        print(f'Tokenizer: {token_counter.name} (tiktoken encoding could not be loaded, approximation not compared)')
+        return
+    encoding = token_counter._encoding
+    errors = []
+    for text in texts:
+        if text:
+            exact = len(encoding.encode(text, disallowed_special=()))
+            errors.append((approximate_token_count(text) - exact) / exact)
+    mean_abs = sum(abs(e) for e in errors) / len(errors)
+    print(f'Tokenizer: {token_counter.name}; approximate count error on {len(errors)} contexts: '
+          f'mean |err| {mean_abs:.1%}, bias {sum(errors) / len(errors):+.1%}')
+
+def main():
+    parser = argparse.ArgumentParser(description='Prompt size with and without context packing')
+    parser.add_argument('--data', default='data/pmc_data_normalized.jsonl')
+    parser.add_argument('--queries', type=int, default=300)
+    parser.add_argument('--budgets', default=f'600,{CONTEXT_TOKEN_BUDGET},2000')
+    parser.add_argument('--republished', type=float, default=0.1,
+                        help='share of records copied under a new id in the long corpus')
+    args = parser.parse_args()
+    budgets = [int(b) for b in args.budgets.split(',') if b.strip()]
+
+    if not os.path.exists(args.data):
+        print(f'{args.data} not found; run scripts/normalize_pmc_data.py first or pass --data')
+        return 1
+    with open(args.data, 'r', encoding='utf-8') as f:
+        records = [json.loads(line) for line in f if line.strip()]
+
+    token_counter.warm_up()
+    print('-' * 100)
+    failures, texts = run_corpus('normalized', records, args.data, args.queries, budgets)
+    print('-' * 100)
+    more_failures, more_texts = run_corpus('long', long_corpus(records, args.republished), None, args.queries, budgets)
+    print('-' * 100)
+    compare_tokenizers(texts + more_texts)
+    failures += more_failures
+    print('OK' if not failures else 'FAILED')
+    return 1 if failures else 0
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,116 @@
+#!/usr/bin/env python3
+"""
+Benchmark: serial per-chunk ingestion vs the batched, concurrent pipeline.
+
+Generates synthetic PMC-like records and ingests them against the local
+stub server (OpenAI embeddings + Pinecone upserts, each with artificial
+latency) twice:
+
+  * serial   - one embeddings request per chunk and a blocking upsert every
+               BATCH_SIZE vectors, as embed_and_upsert_openai.py did before
+  * pipeline - embedding_pipeline.run_pipeline (token-budgeted batches,
+               concurrent requests, overlapped upserts)
+
+and reports chunks/s plus the projected time for the full corpus.
+
+Usage:
+    python scripts/benchmark_embedding_ingest.py --records 400
+    python scripts/benchmark_embedding_ingest.py --records 2000 --fail-rate 0.1
+"""
+
+import argparse
+import os
+import random
+import sys
+import time
+
+from stub_api_server import start_stub_server_process
+from embedding_pipeline import run_pipeline
+
+sys.path.append(os.path.join(os.path.dirname(__file__), '..', 'chatbot'))
+
+EMBEDDING_MODEL = 'text-embedding-3-small'
+UPSERT_BATCH_SIZE = 10
+WORDS = ('property tax ward office circular notice tender building permission water supply '
+         'garbage collection birth certificate मालमत्ता कर प्रभाग कार्यालय परिपत्रक').split()
+
+def synthetic_items(n_records, seed=0):
+    rng = random.Random(seed)
+    for i in range(n_records):
+        text = ' '.join(rng.choice(WORDS) for _ in range(rng.randint(40, 600)))
+        yield {
+            'id': f'bench-{i}',
+            'text': text,
+            'metadata': {'title': f'Benchmark record {i}', 'record_type': 'circular'},
+            'record_id': f'bench-{i}',
+            'total_chunks': 1
+        }
+
+def run_serial(items, index, client):
+    batch = []
+    for item in items:
+        response = client.embeddings.create(model=EMBEDDING_MODEL, input=item['text'], encoding_format='float')
+        batch.append({'id': item['id'], 'values': response.data[0].embedding, 'metadata': item['metadata']})
+        if len(batch) >= UPSERT_BATCH_SIZE:
+            index.upsert(vectors=batch)
+            batch = []
+    if batch:
+        index.upsert(vectors=batch)
+
+def report(label, n_chunks, elapsed, corpus_size):
+    rate = n_chunks / elapsed
+    print(f'{label:<10} {n_chunks} chunks in {elapsed:7.2f} s | {rate:8.1f} chunks/s | '
+          f'projected {corpus_size} chunks: {corpus_size / rate / 60:7.1f} min')
+    return rate
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark serial vs batched concurrent embedding ingestion')
+    parser.add_argument('--records', type=int, default=400)
+    parser.add_argument('--serial-records', type=int, default=100, help='Records for the (slow) serial run')
+    parser.add_argument('--corpus-size', type=int, default=20000, help='Chunk count used for the projection')
+    parser.add_argument('--embed-latency-ms', type=float, default=250, help='Stub latency per embeddings request')
+    parser.add_argument('--item-latency-ms', type=float, default=2, help='Extra stub latency per embedding input')
+    parser.add_argument('--upsert-latency-ms', type=float, default=80, help='Stub latency per upsert')
+    parser.add_argument('--fail-rate', type=float, default=0.0, help='Fraction of embedding requests rejected with 429')
+    parser.add_argument('--concurrency', type=int, default=8)
+    args = parser.parse_args()
+
+    stub = start_stub_server_process(
+        dim=256,
+        route_latency={
+            '/embeddings': args.embed_latency_ms / 1000.0,
+            '/vectors/upsert': args.upsert_latency_ms / 1000.0,
+        },
+        item_latency=args.item_latency_ms / 1000.0,
+        fail_rate=args.fail_rate
+    )
+    os.environ['OPENAI_BASE_URL'] = stub.base_url
+    os.environ.setdefault('OPENAI_API_KEY', 'stub-key')
+
+    from pinecone import Pinecone
+    from openai_client import get_openai_client
+
+    client = get_openai_client()
+    index = Pinecone(api_key='stub-key').Index(host=stub.host_url)
+
+    print(f'Stub latency: embed {args.embed_latency_ms} ms + {args.item_latency_ms} ms/input, '
+          f'upsert {args.upsert_latency_ms} ms, 429 rate {args.fail_rate}')
+    print('-' * 96)
+
+    start = time.perf_counter()
+    run_serial(synthetic_items(args.serial_records), index, client.with_options(max_retries=10))
+    serial_rate = report('serial', args.serial_records, time.perf_counter() - start, args.corpus_size)
+
+    start = time.perf_counter()
+    stats = run_pipeline(synthetic_items(args.records), index, client, EMBEDDING_MODEL,
+                         upsert_batch_size=UPSERT_BATCH_SIZE, embed_concurrency=args.concurrency)
+    pipeline_rate = report('pipeline', stats['vectors'], time.perf_counter() - start, args.corpus_size)
+    print(f'{"":<10} {stats["embed_requests"]} embedding requests, {stats["retries"]} retries, '
+          f'{stats["failed"]} failed chunks')
+
+    print('-' * 96)
+    print(f'Throughput: {pipeline_rate / serial_rate:.1f}x the serial loop')
+    stub.shutdown()
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,159 @@
+#!/usr/bin/env python3
+"""
+Accuracy and latency of query language detection on a labelled query set.
+
+Compares the previous detect_language (langdetect on every query, kept
+verbatim below) with language_detection.LanguageDetector using each
+fallback model, on English, Devanagari Marathi, romanized Marathi and
+mixed-script queries of the kind citizens ask the chatbot. Reports:
+
+    accuracy   per query group
+    unstable   queries whose answer changes between runs (langdetect is
+               randomized unless seeded)
+    cold       the first call in the process (langdetect loads its profiles)
+    uncached   mean time per query with the LRU cache disabled
+    cached     mean time per query on a warm cache
+
+Exits with status 1 if the default detector is less accurate than the
+legacy one.
+
+Usage:
+    python scripts/benchmark_language_detection.py
+    python scripts/benchmark_language_detection.py --repeat 50
+"""
+
+import argparse
+import os
+import sys
+import time
+
+sys.path.append(os.path.join(os.path.dirname(__file__), '..', 'chatbot'))
+from language_detection import LanguageDetector
+
+LABELLED_QUERIES = {
+    'english': ('en', [
+        'What is the property tax due date?',
+        'latest circular',
+        'hospital near Kothrud',
+        'Aundh',
+        'DP plan',
+        'Show me the latest tenders from the roads department',
+        'Which ward office handles water supply complaints in Hadapsar?',
+        'How do I apply for a birth certificate?',
+        'contact number of Ghole Road ward office',
+        'List of PMC schools in Warje',
+        'garbage collection timings',
+        'new notices this week',
+        'Where can I pay water bill online',
+        'What are the timings of Sambhaji park?',
+        'Who is the ward officer of Bibwewadi',
+        'trade license renewal documents',
+        'nearest fire station to Shivajinagar',
+        'recent press releases',
+        'and the date?',
+        'which one is closest?',
+    ]),
+    'devanagari marathi': ('mr', [
+        'मालमत्ता कर कसा भरायचा?',
+        'नवीन परिपत्रक',
+        'कोथरूड वॉर्ड ऑफिस चा नंबर',
+        'पाणीपुरवठा कधी बंद आहे?',
+        'जन्म दाखला कसा मिळवायचा?',
+        'सर्वात नवीन निविदा दाखवा',
+        'हडपसर मधील रुग्णालये',
+        'क्षेत्रीय कार्यालयाचा पत्ता काय आहे?',
+        'कचरा संकलनाची वेळ',
+        'शाळांची यादी',
+        'आजच्या बातम्या',
+        'अग्निशमन केंद्र जवळ कुठे आहे',
+    ]),
+    'romanized marathi': ('mr', [
+        'property tax kasa bharaycha',
+        'Kothrud ward office cha number kay aahe',
+        'pani puravatha band aahe ka',
+        'janma dakhla kasa milvaycha',
+        'navin paripatrak kuthe aahe',
+        'mala trade license pahije',
+        'Hadapsar madhe hospital kuthe aahe',
+        'kachra gadi kadhi yeil',
+        'ward office chi vel kay aahe',
+        'shala chi yadi dya',
+    ]),
+    'mixed script': ('mr', [
+        'PMC चे contact number',
+        'property tax कसा भरायचा',
+        'latest circular कुठे आहे',
+        'Kothrud ward office चा पत्ता',
+    ]),
+}
+
+def legacy_detect_language(text):
+    """detect_language before the script check (langdetect on every query)."""
+    from langdetect import detect
+    try:
+        lang = detect(text)
+        if lang == 'mr':
+            return 'mr'
+        return 'en'
+    except Exception:
+        return 'en'
+
+def labelled():
+    return [(query, lang, group) for group, (lang, queries) in LABELLED_QUERIES.items() for query in queries]
+
+def evaluate(label, detect, queries, repeat, cached=None):
+    start = time.perf_counter()
+    detect(queries[0][0])
+    cold = time.perf_counter() - start
+
+    runs = [[detect(query) for query, _, _ in queries] for _ in range(3)]
+    unstable = sum(1 for answers in zip(*runs) if len(set(answers)) > 1)
+    correct = {}
+    for (query, lang, group), answer in zip(queries, runs[0]):
+        hits, total = correct.get(group, (0, 0))
+        correct[group] = (hits + (answer == lang), total + 1)
+
+    start = time.perf_counter()
+    for _ in range(repeat):
+        for query, _, _ in queries:
+            detect(query)
+    uncached = (time.perf_counter() - start) / (repeat * len(queries))
+
+    line = f'{label:<24} cold {cold * 1000:7.2f} ms | uncached {uncached * 1e6:8.1f} us'
+    if cached is not None:
+        for query, _, _ in queries:
+            cached(query)
+        start = time.perf_counter()
+        for _ in range(repeat):
+            for query, _, _ in queries:
+                cached(query)
+        line += f' | cached {(time.perf_counter() - start) / (repeat * len(queries)) * 1e6:6.2f} us'
+    print(line)
+    accuracy = ' | '.join(f'{group} {hits}/{total}' for group, (hits, total) in correct.items())
+    total_correct = sum(hits for hits, _ in correct.values())
+    print(f'{"":<24} {accuracy} | unstable {unstable}')
+    return total_correct
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark query language detection on labelled queries')
+    parser.add_argument('--repeat', type=int, default=20, help='Passes over the query set per timing')
+    args = parser.parse_args()
+
+    queries = labelled()
+    print(f'{len(queries)} labelled queries')
+    print('-' * 72)
+    # The default detector runs first so its cold start does not include langdetect's profile loading
+    lexicon = LanguageDetector(model='lexicon', cache_size=0)
+    lexicon_cached = LanguageDetector(model='lexicon')
+    new_correct = evaluate('script + lexicon', lexicon.detect, queries, args.repeat, lexicon_cached.detect)
+    legacy_correct = evaluate('legacy langdetect', legacy_detect_language, queries, args.repeat)
+    seeded = LanguageDetector(model='langdetect', cache_size=0)
+    seeded_cached = LanguageDetector(model='langdetect')
+    evaluate('script + langdetect', seeded.detect, queries, args.repeat, seeded_cached.detect)
+    print('-' * 72)
+    print(f'Accuracy: legacy {legacy_correct}/{len(queries)}, script + lexicon {new_correct}/{len(queries)}')
+    print(f'Default detector decisions: {lexicon.stats()}')
+    return 1 if new_correct < legacy_correct else 0
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,77 @@
+#!/usr/bin/env python3
+"""
+Benchmark: per-call OpenAI client vs the shared pooled client.
+
+Runs embedding requests against the local stub server twice - once
+building a new ``OpenAI`` client for every call (the old behaviour) and
+once through ``openai_client.get_openai_client()`` - and reports the
+per-request latency of each.
+
+Usage:
+    python scripts/benchmark_openai_client.py --requests 200 --latency-ms 5
+"""
+
+import argparse
+import os
+import statistics
+import sys
+import time
+
+from stub_api_server import start_stub_server
+
+sys.path.append(os.path.join(os.path.dirname(__file__), '..', 'chatbot'))
+
+EMBEDDING_MODEL = 'text-embedding-3-small'
+
+def percentile(values, pct):
+    ordered = sorted(values)
+    k = min(len(ordered) - 1, int(round(pct / 100.0 * (len(ordered) - 1))))
+    return ordered[k]
+
+def run(label, make_client, n_requests):
+    """Time n embedding calls, obtaining the client via make_client() each time"""
+    latencies = []
+    for i in range(n_requests):
+        start = time.perf_counter()
+        client = make_client()
+        client.embeddings.create(model=EMBEDDING_MODEL, input=f'property tax due date {i}', encoding_format='float')
+        latencies.append((time.perf_counter() - start) * 1000)
+    print(f'{label:<22} mean {statistics.mean(latencies):7.2f} ms | '
+          f'p50 {percentile(latencies, 50):7.2f} ms | p99 {percentile(latencies, 99):7.2f} ms')
+    return latencies
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark pooled vs per-call OpenAI clients')
+    parser.add_argument('--requests', type=int, default=200)
+    parser.add_argument('--latency-ms', type=float, default=0.0, help='Stub server latency per request')
+    parser.add_argument('--dim', type=int, default=1536)
+    args = parser.parse_args()
+
+    server = start_stub_server(latency=args.latency_ms / 1000.0, dim=args.dim)
+    os.environ['OPENAI_BASE_URL'] = server.base_url
+    os.environ.setdefault('OPENAI_API_KEY', 'stub-key')
+
+    from openai import OpenAI
+    from openai_client import get_openai_client, close_openai_client
+
+    print(f'Stub server: {server.base_url} ({args.requests} requests, {args.latency_ms} ms latency)')
+    print('-' * 78)
+
+    def per_call_client():
+        return OpenAI(api_key=os.environ['OPENAI_API_KEY'])
+
+    # Warm up imports and the stub before timing
+    get_openai_client().embeddings.create(model=EMBEDDING_MODEL, input='warm up')
+
+    before = run('per-call client', per_call_client, args.requests)
+    after = run('shared pooled client', get_openai_client, args.requests)
+
+    print('-' * 78)
+    print(f'Mean latency reduction: {statistics.mean(before) - statistics.mean(after):.2f} ms per request '
+          f'({statistics.mean(before) / statistics.mean(after):.1f}x faster)')
+
+    close_openai_client()
+    server.shutdown()
+
+if __name__ == '__main__':
+    main()
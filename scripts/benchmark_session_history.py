@@ -0,0 +1,202 @@
+#!/usr/bin/env python3
+"""
+Benchmark server-side sessions against clients resending their chat history.
+
+1. Checks each session backend (memory, sqlite, and redis through a local
+   in-process stand-in for a Redis server) keeps only SESSION_WINDOW turns,
+   expires idle sessions and, for memory, evicts the least recently used
+   sessions; then times a turn (get_history + add_turn) on each.
+2. Times ChatRequest parsing of the request body at growing conversation
+   lengths, for the old client (whole history with every message) and the
+   session client (session_id only).
+3. Drives a conversation through the real chatbot_api_improved app against
+   the local OpenAI/Pinecone stub, both ways, and checks the session window
+   matches the tail of the resent history.
+
+Exits with status 1 if a check fails.
+
+Usage:
+    python scripts/benchmark_session_history.py
+    python scripts/benchmark_session_history.py --turns 200 --answer-chars 1500
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import sys
+import tempfile
+import time
+
+import httpx
+
+from stub_api_server import start_stub_server_process
+
+sys.path.append(os.path.join(os.path.dirname(__file__), '..', 'chatbot'))
+from session_store import MemorySessionStore, SQLiteSessionStore, RedisSessionStore
+
+class LocalRedisStandIn:
+    """The subset of redis.asyncio.Redis the session store uses, kept in a dict"""
+
+    def __init__(self):
+        self._data = {}  # key -> (value, expires_at)
+
+    async def get(self, key):
+        entry = self._data.get(key)
+        if entry is None or entry[1] < time.monotonic():
+            self._data.pop(key, None)
+            return None
+        return entry[0]
+
+    async def set(self, key, value, ex=None):
+        self._data[key] = (value, time.monotonic() + ex if ex else float('inf'))
+
+async def check_store(label, make_store, window):
+    """Window and expiry checks for one backend; returns a list of failures"""
+    failures = []
+    store = make_store(ttl=60)
+    for i in range(5):
+        await store.add_turn('s1', f'question {i}', f'answer {i}')
+    history = await store.get_history('s1')
+    expected = [{'user': f'question {i}', 'bot': f'answer {i}'} for i in range(5)][-window:]
+    if history != expected:
+        failures.append(f'{label}: window {history!r} != {expected!r}')
+    if await store.get_history('unknown') != []:
+        failures.append(f'{label}: unknown session has history')
+    await store.close()
+
+    store = make_store(ttl=1)
+    await store.add_turn('s2', 'q', 'a')
+    await asyncio.sleep(1.1)
+    if await store.get_history('s2') != []:
+        failures.append(f'{label}: session did not expire')
+    await store.close()
+    return failures
+
+async def time_store(store, n_turns, answer):
+    start = time.perf_counter()
+    for i in range(n_turns):
+        session_id = f'session-{i % 500}'
+        await store.get_history(session_id)
+        await store.add_turn(session_id, f'question {i}', answer)
+    return (time.perf_counter() - start) / n_turns
+
+def request_bodies(turns, answer):
+    """(old client body, session client body) of the message after `turns` turns"""
+    history = [{'user': f'Question number {i} about property tax in my ward?', 'bot': answer} for i in range(turns)]
+    old = json.dumps({'user_input': 'And the due date?', 'history': history, 'session_id': 'a' * 36})
+    new = json.dumps({'user_input': 'And the due date?', 'session_id': 'a' * 36})
+    return old.encode('utf-8'), new.encode('utf-8')
+
+async def converse(app, turns, resend_history):
+    """Hold a conversation with the app; returns (session_id, resent history, per-turn body bytes, seconds)"""
+    transport = httpx.ASGITransport(app=app)
+    history, sizes = [], []
+    session_id = None
+    async with httpx.AsyncClient(transport=transport, base_url='http://app') as client:
+        start = time.perf_counter()
+        for i in range(turns):
+            payload = {'user_input': f'Question {i}: which ward office handles water supply complaint {i}?',
+                       'session_id': session_id}
+            if resend_history:
+                payload['history'] = history
+            body = json.dumps(payload).encode('utf-8')
+            sizes.append(len(body))
+            resp = await client.post('/chat', content=body, headers={'Content-Type': 'application/json'})
+            data = resp.json()
+            session_id = data['session_id']
+            history.append({'user': payload['user_input'], 'bot': data['answer']})
+        elapsed = time.perf_counter() - start
+    return session_id, history, sizes, elapsed
+
+async def run_conversations(api, turns):
+    """Both conversations on one event loop (the shared API clients are bound to it)"""
+    try:
+        return {label: await converse(api.app, turns, resend)
+                for label, resend in [('resent history', True), ('session id', False)]}
+    finally:
+        await api.close_async_index()
+        await api.close_async_openai_client()
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark server-side sessions against resent chat history')
+    parser.add_argument('--turns', type=int, default=100, help='Conversation length')
+    parser.add_argument('--answer-chars', type=int, default=1200, help='Answer size for the parse benchmark')
+    parser.add_argument('--store-turns', type=int, default=5000, help='Turns timed per session backend')
+    args = parser.parse_args()
+
+    stub = start_stub_server_process(dim=256)
+    os.environ.update({
+        'OPENAI_BASE_URL': stub.base_url,
+        'OPENAI_API_KEY': 'stub-key',
+        'PINECONE_API_KEY': 'stub-key',
+        'PINECONE_HOST': stub.host_url,
+        'HYBRID_RETRIEVAL': '0',
+        'ANSWER_CACHE_SIZE': '0',
+    })
+    # The chat pipeline logs every prompt; keep the report readable
+    stdout, sys.stdout = sys.stdout, open(os.devnull, 'w')
+    import chatbot_api_improved as api
+    from session_store import session_store, SESSION_WINDOW
+    sys.stdout = stdout
+
+    failures = []
+    answer = 'Ward office details: ' + 'x' * max(0, args.answer_chars - 21)
+    with tempfile.TemporaryDirectory() as tmp:
+        backends = [
+            ('memory', lambda ttl: MemorySessionStore(window=SESSION_WINDOW, ttl=ttl, max_sessions=1000)),
+            ('sqlite', lambda ttl: SQLiteSessionStore(os.path.join(tmp, f'sessions-{ttl}.sqlite3'),
+                                                      window=SESSION_WINDOW, ttl=ttl)),
+            ('redis stand-in', lambda ttl: RedisSessionStore(LocalRedisStandIn(), window=SESSION_WINDOW, ttl=ttl)),
+        ]
+        print(f'Session backends (window {SESSION_WINDOW} turns):')
+        for label, make_store in backends:
+            failures += asyncio.run(check_store(label, make_store, SESSION_WINDOW))
+            store = make_store(ttl=60)
+            per_turn = asyncio.run(time_store(store, args.store_turns, answer))
+            asyncio.run(store.close())
+            print(f'  {label:<15} {per_turn * 1e6:8.1f} us per turn (get_history + add_turn)')
+
+    lru = MemorySessionStore(window=SESSION_WINDOW, ttl=60, max_sessions=3)
+    for i in range(5):
+        asyncio.run(lru.add_turn(f's{i}', 'q', 'a'))
+    if asyncio.run(lru.get_history('s0')) or not asyncio.run(lru.get_history('s4')):
+        failures.append('memory: least recently used sessions were not evicted')
+
+    print('-' * 72)
+    print(f'Request body and ChatRequest parse time by conversation length ({args.answer_chars}-char answers):')
+    for turns in [1, 10, 50, 200]:
+        old, new = request_bodies(turns, answer)
+        cells = []
+        for label, body in [('resent history', old), ('session id', new)]:
+            reps = max(20, 2000 // max(1, turns))
+            start = time.perf_counter()
+            for _ in range(reps):
+                api.ChatRequest.model_validate_json(body)
+            cells.append(f'{label} {len(body) / 1024:8.1f} KB {(time.perf_counter() - start) / reps * 1e6:8.1f} us')
+        print(f'  {turns:>4} turns: ' + ' | '.join(cells))
+
+    print('-' * 72)
+    print(f'{args.turns}-turn conversation through /chat (stub OpenAI/Pinecone, no latency):')
+    sys.stdout = open(os.devnull, 'w')
+    try:
+        results = asyncio.run(run_conversations(api, args.turns))
+    finally:
+        sys.stdout = stdout
+    for label, (session_id, history, sizes, elapsed) in results.items():
+        print(f'  {label:<15} last body {sizes[-1] / 1024:7.1f} KB | total sent {sum(sizes) / 1024:8.1f} KB | '
+              f'{elapsed / args.turns * 1000:6.2f} ms/turn')
+    session_id, history, _, _ = results['session id']
+    stored = asyncio.run(session_store.get_history(session_id))
+    if stored != history[-SESSION_WINDOW:]:
+        failures.append(f'session window {stored!r} != last {SESSION_WINDOW} turns')
+
+    stub.shutdown()
+    print('-' * 72)
+    for failure in failures:
+        print(f'FAIL {failure}')
+    print('OK' if not failures else f'{len(failures)} checks failed')
+    return 1 if failures else 0
+
+if __name__ == '__main__':
+    sys.exit(main())
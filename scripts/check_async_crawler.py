@@ -0,0 +1,137 @@
+#!/usr/bin/env python3
+"""
+Check and benchmark the async crawler mode of enhanced_extract_pmc_data.py.
+
+Starts the local crawler fixture server (injected latency, 404/410/500/503,
+403, 429-then-OK, invalid JSON, stalled responses, repeated URLs, two host
+names), crawls the same link list with the serial LinkProcessor and with
+crawl_async, and verifies that:
+
+  * every URL lands in the same success/failed/broken/duplicate list, in
+    the same order, and the streamed JSONL output is identical
+  * no host ever sees more than --per-host concurrent requests
+  * a --max-requests budget caps the requests sent and reports the links
+    it could not reach as failed
+
+Exit status is 1 if any check fails. Both crawls are timed.
+
+Usage:
+    python scripts/check_async_crawler.py
+    python scripts/check_async_crawler.py --links 400 --latency-ms 80 --per-host 4
+"""
+
+import argparse
+import asyncio
+import io
+import random
+import sys
+import time
+
+import enhanced_extract_pmc_data as extractor
+from enhanced_extract_pmc_data import LinkProcessor
+from crawler_fixture_server import start_fixture_server
+
+# Relative weights of the fixture paths in the generated link list
+KIND_WEIGHTS = {
+    'items': 60, 'page': 10, 'missing': 6, 'gone': 2, 'error': 4, 'unavailable': 2,
+    'forbidden': 3, 'flaky': 5, 'badjson': 3, 'stall': 1,
+}
+
+def build_links(port, n_links, seed=0, kind_weights=KIND_WEIGHTS):
+    """A shuffled link list over two host names, with some URLs repeated"""
+    rng = random.Random(seed)
+    kinds = list(kind_weights)
+    weights = [kind_weights[k] for k in kinds]
+    links = []
+    for i in range(n_links):
+        host = '127.0.0.1' if i % 3 else 'localhost'
+        links.append(f'http://{host}:{port}/{rng.choices(kinds, weights)[0]}/{i}')
+    # Repeated URLs exercise duplicate detection
+    links += rng.sample(links, max(1, n_links // 10))
+    rng.shuffle(links)
+    return links
+
+def categories(processor):
+    return {
+        'success': processor.success_links,
+        'failed': processor.failed_links,
+        'broken': processor.broken_links,
+        'duplicate': processor.duplicate_links,
+    }
+
+def main():
+    parser = argparse.ArgumentParser(description='Check and benchmark the async PMC crawler')
+    parser.add_argument('--links', type=int, default=200)
+    parser.add_argument('--latency-ms', type=float, default=40, help='Fixture latency per request')
+    parser.add_argument('--jitter-ms', type=float, default=40, help='Extra random fixture latency')
+    parser.add_argument('--timeout', type=float, default=1.0, help='Client timeout (stalled paths exceed it)')
+    parser.add_argument('--concurrency', type=int, default=32)
+    parser.add_argument('--per-host', type=int, default=8)
+    args = parser.parse_args()
+
+    server = start_fixture_server(latency=args.latency_ms / 1000.0, jitter=args.jitter_ms / 1000.0,
+                                  stall=args.timeout * 1.5)
+    extractor.FETCH_TIMEOUT = args.timeout
+    links = build_links(server.port, args.links)
+    print(f'{len(links)} links, fixture latency {args.latency_ms}+{args.jitter_ms} ms, timeout {args.timeout} s')
+    print('-' * 72)
+    failures = 0
+
+    serial = LinkProcessor('en')
+    serial.out = io.StringIO()
+    start = time.perf_counter()
+    for url in links:
+        serial.process_single_url(url)
+    serial_time = time.perf_counter() - start
+    serial_requests = server.request_count
+    print(f'serial  {serial_time:7.2f} s | {serial_requests} requests')
+
+    server.reset()
+    concurrent = LinkProcessor('en')
+    concurrent.out = io.StringIO()
+    start = time.perf_counter()
+    budget = asyncio.run(concurrent.crawl_async(links, concurrency=args.concurrency, per_host=args.per_host,
+                                                timeout=args.timeout))
+    async_time = time.perf_counter() - start
+    print(f'async   {async_time:7.2f} s | {budget.used} requests | '
+          f'peak per host {dict(server.peak_in_flight)}')
+    print(f'Speedup: {serial_time / async_time:.1f}x')
+    print('-' * 72)
+
+    print('Categories: ' + ', '.join(f'{name}={len(urls)}' for name, urls in categories(serial).items()))
+    for name, urls in categories(serial).items():
+        if categories(concurrent)[name] != urls:
+            failures += 1
+            print(f'FAIL {name} links differ between serial and async')
+    if serial.out.getvalue() != concurrent.out.getvalue():
+        failures += 1
+        print('FAIL extracted output differs between serial and async')
+    if budget.used != server.request_count:
+        failures += 1
+        print(f'FAIL budget counted {budget.used} requests, server saw {server.request_count}')
+    if max(server.peak_in_flight.values()) > args.per_host:
+        failures += 1
+        print(f'FAIL per-host limit {args.per_host} exceeded: {dict(server.peak_in_flight)}')
+
+    # A budget below the link count leaves the tail of the list unfetched
+    server.reset()
+    limit = len(links) // 2
+    budgeted = LinkProcessor('en')
+    budget = asyncio.run(budgeted.crawl_async(links, concurrency=args.concurrency, per_host=args.per_host,
+                                              max_requests=limit, timeout=args.timeout))
+    handled = sum(len(urls) for urls in categories(budgeted).values())
+    print(f'budget  {limit} requests allowed, {server.request_count} sent, '
+          f'{len(budgeted.failed_links)} failed of {handled} links')
+    if server.request_count > limit or budget.used > limit:
+        failures += 1
+        print('FAIL request budget exceeded')
+    if handled != len(links) or len(budgeted.failed_links) < len(links) - limit:
+        failures += 1
+        print('FAIL links beyond the budget were not reported as failed')
+
+    server.shutdown()
+    print('OK' if not failures else f'{failures} check(s) failed')
+    return 1 if failures else 0
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,112 @@
+#!/usr/bin/env python3
+"""
+Check and benchmark the crawler's conditional-request cache.
+
+Runs LinkProcessor.process_links against the local crawler fixture server
+(ETag/Last-Modified on /items/ paths, validator-less /page/ paths, broken
+links and repeated URLs) in a scratch directory:
+
+  1. full crawl without the cache (reference output)
+  2. cold crawl with an empty cache
+  3. warm crawl: /items/ answer 304, /page/ return identical bodies
+  4. a fraction of the payloads change; warm crawl vs a full crawl
+
+Every cached crawl must write exactly the same JSONL and link lists as the
+uncached crawl of the same server state, and the unchanged re-crawl must
+move at most MAX_WARM_BYTES_RATIO of a full crawl's response bytes (exit
+status 1 otherwise). Reports the time, response bytes and reused outputs of
+each crawl. On the fixture the saving is in bytes and parsing: wall time is
+dominated by the per-request latency, which conditional requests still pay.
+
+Usage:
+    python scripts/check_crawl_cache.py
+    python scripts/check_crawl_cache.py --links 500 --items-per-page 40 --sync
+"""
+
+import argparse
+import contextlib
+import io
+import os
+import sys
+import tempfile
+import time
+
+from enhanced_extract_pmc_data import LinkProcessor
+from http_cache import HttpCache
+from crawler_fixture_server import start_fixture_server
+from check_async_crawler import build_links
+
+KIND_WEIGHTS = {'items': 70, 'page': 20, 'missing': 5, 'error': 3, 'badjson': 2}
+CATEGORY_FILES = ['success_links_en.txt', 'failed_links_en.txt', 'broken_links_en.txt', 'duplicate_links_en.txt']
+# An unchanged re-crawl may move at most this share of a full crawl's response bytes
+MAX_WARM_BYTES_RATIO = 0.1
+
+def crawl(server, cache, use_async, label):
+    """One process_links run; returns (outputs, seconds, response bytes)"""
+    server.reset()
+    processor = LinkProcessor('en', cache)
+    start = time.perf_counter()
+    with contextlib.redirect_stdout(io.StringIO()), contextlib.redirect_stderr(io.StringIO()):
+        processor.process_links('links.txt', 'out.jsonl', use_async=use_async)
+    elapsed = time.perf_counter() - start
+    outputs = {}
+    for name in ['out.jsonl'] + CATEGORY_FILES:
+        with open(name, 'rb') as f:
+            outputs[name] = f.read()
+    print(f'{label:<22} {elapsed:7.2f} s | {server.request_count:5d} requests | '
+          f'{server.bytes_sent / 1e6:7.2f} MB | {server.not_modified_count:5d} x 304 | '
+          f'{len(processor.reused_urls):5d} reused')
+    return outputs, elapsed, server.bytes_sent
+
+def compare(label, expected, actual):
+    diffs = [name for name in expected if expected[name] != actual[name]]
+    for name in diffs:
+        print(f'FAIL {label}: {name} differs from the uncached crawl')
+    return len(diffs)
+
+def main():
+    parser = argparse.ArgumentParser(description='Check and benchmark the crawler HTTP cache')
+    parser.add_argument('--links', type=int, default=300)
+    parser.add_argument('--items-per-page', type=int, default=20)
+    parser.add_argument('--latency-ms', type=float, default=20)
+    parser.add_argument('--sync', action='store_true', help='Use the serial crawler instead of --async')
+    args = parser.parse_args()
+
+    fixture = start_fixture_server(latency=args.latency_ms / 1000.0, items_per_page=args.items_per_page)
+    use_async = not args.sync
+    failures = 0
+    with tempfile.TemporaryDirectory() as tmp:
+        os.chdir(tmp)
+        with open('links.txt', 'w', encoding='utf-8') as f:
+            f.write('\n'.join(build_links(fixture.port, args.links, kind_weights=KIND_WEIGHTS)) + '\n')
+        cache = HttpCache(os.path.join(tmp, 'http_cache.sqlite3'))
+        print(f'{args.links} links, {args.items_per_page} items per payload, '
+              f'{"async" if use_async else "serial"} crawler')
+        print('-' * 88)
+
+        full, full_time, full_bytes = crawl(fixture, None, use_async, 'full (no cache)')
+        cold, _, _ = crawl(fixture, cache, use_async, 'cold cache')
+        failures += compare('cold cache', full, cold)
+        warm, warm_time, warm_bytes = crawl(fixture, cache, use_async, 'warm cache')
+        failures += compare('warm cache', full, warm)
+
+        fixture.server.generation = 1
+        full, _, _ = crawl(fixture, None, use_async, 'changed, full')
+        changed, _, _ = crawl(fixture, cache, use_async, 'changed, warm cache')
+        failures += compare('changed', full, changed)
+        print('-' * 88)
+        bytes_ratio = warm_bytes / full_bytes if full_bytes else 1.0
+        print(f'Unchanged re-crawl: {bytes_ratio * 100:.1f}% of a full crawl\'s bytes, '
+              f'{warm_time / full_time * 100:.0f}% of its time')
+        if bytes_ratio > MAX_WARM_BYTES_RATIO:
+            print(f'FAIL warm cache: moved {warm_bytes / 1e6:.2f} MB, more than '
+                  f'{MAX_WARM_BYTES_RATIO:.0%} of the full crawl\'s {full_bytes / 1e6:.2f} MB')
+            failures += 1
+        cache.close()
+        os.chdir('/')
+    fixture.shutdown()
+    print('OK' if not failures else f'{failures} check(s) failed')
+    return 1 if failures else 0
+
+if __name__ == '__main__':
+    sys.exit(main())
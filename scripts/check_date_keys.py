@@ -0,0 +1,108 @@
+#!/usr/bin/env python3
+"""
+Parity check and benchmark for the precomputed record date keys.
+
+Compares the previous query-time parse_date_safe (kept verbatim below)
+with record_metadata.record_date_key on the metadata of every normalized
+record, both on the stored date_iso (normalized records) and on metadata
+without it (vectors ingested before date_iso existed, which go through the
+memoized parser). ISO timestamps now sort by their date part (the old key
+was the raw string); any other record whose sort key differs is reported
+(exit status 1). Then times the newest-first sort of TOP_K matches the way
+the chat modules run it for a "latest" query.
+
+Usage:
+    python scripts/check_date_keys.py
+    python scripts/check_date_keys.py --data data/pmc_data_normalized.jsonl --sorts 20000
+"""
+
+import argparse
+import json
+import os
+import random
+import sys
+import time
+from datetime import datetime
+
+sys.path.append(os.path.join(os.path.dirname(__file__), '..', 'chatbot'))
+from record_metadata import filter_metadata, record_date_key, record_date_fields
+
+TOP_K = 15
+
+def legacy_parse_date_safe(date_str):
+    """parse_date_safe before dates were precomputed."""
+    if not date_str:
+        return ''
+
+    # Try to parse various date formats
+    date_formats = [
+        '%d %B %Y', '%d %b %Y', '%Y-%m-%d', '%d/%m/%Y', '%m/%d/%Y',
+        '%d-%m-%Y', '%Y/%m/%d', '%B %d, %Y', '%b %d, %Y'
+    ]
+
+    for fmt in date_formats:
+        try:
+            parsed_date = datetime.strptime(date_str, fmt)
+            # Return in YYYY-MM-DD format for consistent string sorting
+            return parsed_date.strftime('%Y-%m-%d')
+        except:
+            continue
+
+    # If no format matches, return the original string for sorting
+    return date_str
+
+def legacy_key(meta):
+    return legacy_parse_date_safe(meta.get('date', meta.get('display_date', '')))
+
+def main():
+    parser = argparse.ArgumentParser(description='Check and benchmark precomputed record date keys')
+    parser.add_argument('--data', default='data/pmc_data_normalized.jsonl')
+    parser.add_argument('--sorts', type=int, default=5000, help='Simulated latest-query sorts')
+    args = parser.parse_args()
+
+    if not os.path.exists(args.data):
+        print(f'{args.data} not found; run scripts/normalize_pmc_data.py first or pass --data')
+        return 1
+    with open(args.data, 'r', encoding='utf-8') as f:
+        records = [json.loads(line) for line in f if line.strip()]
+    # Records from normalize_pmc_data.py carry date_iso; older files get it here, as ingestion would
+    stored = [filter_metadata({**rec, **record_date_fields(rec)}) for rec in records]
+    legacy_meta = [{k: v for k, v in meta.items() if k not in ('date_iso', 'date_epoch')} for meta in stored]
+
+    mismatches = 0
+    timestamps = 0
+    for label, metas in [('stored date_iso', stored), ('parsed on demand', legacy_meta)]:
+        for meta in metas:
+            old, new = legacy_key(meta), record_date_key(meta)
+            if old != new and isinstance(old, str) and old[:10] == new:
+                timestamps += 1
+            elif old != new:
+                mismatches += 1
+                if mismatches <= 10:
+                    print(f'MISMATCH ({label}) {meta.get("date")!r}: legacy={old!r} new={new!r}')
+    dated = sum(1 for meta in stored if meta.get('date_iso'))
+    print(f'{len(stored)} records ({dated} with a parseable date), {mismatches} mismatches, '
+          f'{timestamps} timestamp keys reduced to their date')
+
+    rng = random.Random(0)
+    batches = [rng.sample(range(len(stored)), min(TOP_K, len(stored))) for _ in range(args.sorts)]
+
+    def run(metas, key):
+        start = time.perf_counter()
+        for batch in batches:
+            sorted((metas[i] for i in batch), key=key, reverse=True)
+        return time.perf_counter() - start
+
+    print('-' * 72)
+    timings = {}
+    for label, metas, key in [('legacy parse_date_safe', stored, legacy_key),
+                              ('date_iso lookup', stored, record_date_key),
+                              ('memoized parse', legacy_meta, record_date_key)]:
+        timings[label] = elapsed = run(metas, key)
+        print(f'{label:<24} {elapsed * 1000:9.1f} ms | {elapsed / args.sorts * 1e6:8.1f} us/sort of {TOP_K}')
+    print(f'Speedup: {timings["legacy parse_date_safe"] / timings["date_iso lookup"]:.1f}x with date_iso, '
+          f'{timings["legacy parse_date_safe"] / timings["memoized parse"]:.1f}x memoized')
+    return 1 if mismatches else 0
+
+if __name__ == '__main__':
+    sys.exit(main())
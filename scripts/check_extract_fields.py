@@ -0,0 +1,120 @@
+#!/usr/bin/env python3
+"""
+Parity check and benchmark for the streaming LinkProcessor.extract_fields.
+
+Compares the pattern extraction that walks an object's strings with the
+previous version, which serialized the whole cleaned object with
+json.dumps and ran PDF_PATTERN/PHONE_PATTERN/MAP_PATTERN over the text
+(kept verbatim below). Inputs are the crawled items in data/ (their "raw"
+objects) plus randomly generated nested objects full of escapes, numbers,
+phone numbers, PDF and map links. Exits with status 1 on any difference,
+then times both.
+
+Usage:
+    python scripts/check_extract_fields.py
+    python scripts/check_extract_fields.py --data-dir data --fuzz 20000
+"""
+
+import argparse
+import json
+import os
+import random
+import sys
+import time
+
+from enhanced_extract_pmc_data import LinkProcessor, PDF_PATTERN, PHONE_PATTERN, MAP_PATTERN
+
+def legacy_extract_fields(processor, obj):
+    """extract_fields before pattern extraction walked the strings."""
+    cleaned = processor.clean_obj(obj)
+    text = json.dumps(cleaned, ensure_ascii=False)
+    pdfs = list(set(PDF_PATTERN.findall(text)))
+    phones = list(set(PHONE_PATTERN.findall(text)))
+    maps = list(set(MAP_PATTERN.findall(text)))
+    
+    return {
+        'pdf_links': pdfs,
+        'phone_numbers': phones,
+        'map_links': maps,
+        'raw': cleaned
+    }
+
+FRAGMENTS = [
+    'https://www.pmc.gov.in/sites/default/files/notice.pdf', 'http://pmc.gov.in/a b.pdf', 'file.pdf',
+    'https://maps.google.com/?q=pune', 'https://goo.gl/maps/x1', 'https://www.google.com/maps/place/x',
+    '9876543210', '+91 9876543210', '+91-8765432109', '07654321098', '020-25501000', '1234567890',
+    'मालमत्ता कर', 'ward office', '"quoted"', 'back\\slash', '\n', '\t', '\r\n', ' ', ' ',
+    '\x01', ' ', '', '.pdf', 'http://', '\\n', '"', ',', ':', '}', ']', 'https://x.com/y.pdf"z',
+]
+
+def random_string(rng):
+    return ''.join(rng.choice(FRAGMENTS) for _ in range(rng.randint(0, 6)))
+
+def random_value(rng, depth=0):
+    kind = rng.random()
+    if depth < 4 and kind < 0.2:
+        return {random_string(rng) or 'k': random_value(rng, depth + 1) for _ in range(rng.randint(0, 4))}
+    if depth < 4 and kind < 0.35:
+        return [random_value(rng, depth + 1) for _ in range(rng.randint(0, 4))]
+    if kind < 0.45:
+        return rng.choice([9876543210, 8765432109, 42, -7, 0, 3.5, 1e16, 98765432.1, True, False, None])
+    return random_string(rng)
+
+def load_raw_items(data_dir):
+    items = []
+    if not os.path.isdir(data_dir):
+        return items
+    for fname in sorted(os.listdir(data_dir)):
+        if not (fname.startswith('pmc_data_') and fname.endswith('.jsonl')):
+            continue
+        with open(os.path.join(data_dir, fname), 'r', encoding='utf-8') as f:
+            for line in f:
+                try:
+                    entry = json.loads(line)
+                except ValueError:
+                    continue
+                if isinstance(entry, dict) and 'raw' in entry:
+                    items.append(entry['raw'])
+    return items
+
+def main():
+    parser = argparse.ArgumentParser(description='Check and benchmark the streaming extract_fields')
+    parser.add_argument('--data-dir', default='data')
+    parser.add_argument('--fuzz', type=int, default=20000, help='Random objects to compare')
+    parser.add_argument('--repeat', type=int, default=3)
+    args = parser.parse_args()
+
+    processor = LinkProcessor('en')
+    crawled = load_raw_items(args.data_dir)
+    rng = random.Random(0)
+    fuzzed = [random_value(rng) for _ in range(args.fuzz)]
+
+    mismatches = 0
+    for obj in crawled + fuzzed:
+        old = legacy_extract_fields(processor, obj)
+        new = processor.extract_fields(obj)
+        if old != new:
+            mismatches += 1
+            if mismatches <= 10:
+                print(f'MISMATCH {json.dumps(obj, ensure_ascii=False)[:100]}\n  legacy: {old}\n  new:    {new}')
+    print(f'{len(crawled)} crawled items, {len(fuzzed)} random objects, {mismatches} mismatches')
+
+    if crawled:
+        print('-' * 72)
+        timings = {}
+        for label, fn in [('json.dumps', lambda obj: legacy_extract_fields(processor, obj)),
+                          ('string walk', processor.extract_fields)]:
+            best = min(_timed(fn, crawled) for _ in range(args.repeat))
+            timings[label] = best
+            print(f'{label:<12} {best * 1000:9.1f} ms | {best / len(crawled) * 1e6:8.1f} us/item')
+        print(f'Ratio: {timings["json.dumps"] / timings["string walk"]:.2f}x')
+    return 1 if mismatches else 0
+
+def _timed(fn, items):
+    start = time.perf_counter()
+    for obj in items:
+        fn(obj)
+    return time.perf_counter() - start
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,109 @@
+#!/usr/bin/env python3
+"""
+Parity check and benchmark for the fast clean_html_text path.
+
+Collects every value that extract_all_text_content passes to
+clean_html_text (summary items and the content/body/text/details/
+information fields) from the crawled input files, compares the fast
+implementation with the previous BeautifulSoup-per-field version (exit
+status 1 on any difference), then times both.
+
+Usage:
+    python scripts/check_html_cleaner.py
+    python scripts/check_html_cleaner.py --data-dir data --repeat 3
+"""
+
+import argparse
+import html
+import re
+import sys
+import time
+import warnings
+
+from bs4 import BeautifulSoup
+
+from normalize_pmc_data import clean_html_text
+from check_type_classifier import load_nodes, missing_input
+
+def legacy_clean_html_text(text):
+    """clean_html_text before the fast path."""
+    if not text:
+        return ""
+
+    # Decode HTML entities
+    text = html.unescape(text)
+
+    # Remove HTML tags
+    soup = BeautifulSoup(text, 'html.parser')
+    text = soup.get_text(separator=' ', strip=True)
+
+    # Clean up whitespace
+    text = re.sub(r'\s+', ' ', text)
+    text = text.strip()
+
+    return text
+
+def html_fields(node):
+    """The strings extract_all_text_content cleans for a node"""
+    summary = node.get('summary')
+    if summary:
+        for item in summary if isinstance(summary, list) else [summary]:
+            yield item
+    for field in ['content', 'body', 'text', 'details', 'information']:
+        value = node.get(field)
+        if value and isinstance(value, str):
+            yield value
+
+def clean(fn, text):
+    """Call a cleaner, folding exceptions into the result so they are compared too"""
+    try:
+        return fn(text)
+    except Exception as e:
+        return f'<{type(e).__name__}>'
+
+def main():
+    parser = argparse.ArgumentParser(description='Check and benchmark the fast clean_html_text')
+    parser.add_argument('--data-dir', default='data')
+    parser.add_argument('--repeat', type=int, default=3)
+    args = parser.parse_args()
+
+    # BeautifulSoup warns about strings that look like URLs or file names
+    warnings.filterwarnings('ignore', module='bs4')
+
+    missing = missing_input(args.data_dir)
+    if missing:
+        print(f'{missing}; run scripts/enhanced_extract_pmc_data.py first or pass --data-dir')
+        return 1
+    texts = [text for node, _ in load_nodes(args.data_dir) for text in html_fields(node)]
+    if not texts:
+        print(f'No HTML fields found in {args.data_dir}')
+        return 1
+
+    mismatches = 0
+    for text in texts:
+        old = clean(legacy_clean_html_text, text)
+        new = clean(clean_html_text, text)
+        if old != new:
+            mismatches += 1
+            if mismatches <= 10:
+                print(f'MISMATCH {text[:80]!r}:\n  legacy: {old[:120]!r}\n  fast:   {new[:120]!r}')
+    markup_free = sum(1 for text in texts if '<' not in html.unescape(text) and '&' not in html.unescape(text))
+    print(f'{len(texts)} fields ({markup_free} without markup), {mismatches} mismatches')
+
+    print('-' * 72)
+    timings = {}
+    for label, fn in [('beautifulsoup', legacy_clean_html_text), ('fast', clean_html_text)]:
+        best = min(_timed(fn, texts) for _ in range(args.repeat))
+        timings[label] = best
+        print(f'{label:<14} {best * 1000:9.1f} ms | {best / len(texts) * 1e6:8.1f} us/field')
+    print(f'Speedup: {timings["beautifulsoup"] / timings["fast"]:.1f}x')
+    return 1 if mismatches else 0
+
+def _timed(fn, texts):
+    start = time.perf_counter()
+    for text in texts:
+        clean(fn, text)
+    return time.perf_counter() - start
+
+if __name__ == '__main__':
+    sys.exit(main())
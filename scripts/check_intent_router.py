@@ -0,0 +1,291 @@
+#!/usr/bin/env python3
+"""
+Golden checks and microbenchmark for the shared intent router.
+
+The previous intent functions are kept verbatim below: is_latest_query,
+is_followup_query and latest_record_type from
+terminal_chatbot_openai_improved.py, and the shorter is_followup_query
+that terminal_chatbot_openai.py, terminal_chatbot_gpt4o.py and
+terminal_chatbot_v2.py shared. Every query in the golden set (and every
+pairing of it with a previous question) must get the same answer from
+intent_router, except the listed LATEST_DIFFERENCES: latest keywords are
+matched as whole words, and "new" counts when a record type follows it.
+A few hand-written expectations cover the ward hint.
+Then times the old per-call functions against classify_query.
+
+Exits with status 1 if a check fails.
+
+Usage:
+    python scripts/check_intent_router.py
+    python scripts/check_intent_router.py --repeat 2000
+"""
+
+import argparse
+import os
+import re
+import sys
+import time
+
+sys.path.append(os.path.join(os.path.dirname(__file__), '..', 'chatbot'))
+from intent_router import (
+    classify_query, is_latest_query, is_followup_query, is_basic_followup_query, latest_record_type, QueryIntent
+)
+
+GOLDEN_QUERIES = [
+    'What is the property tax due date?', 'latest circular', 'Show me the latest circulars',
+    'recent news about roads', 'newest tenders', 'last date for water bill payment',
+    "today's notices", 'any updates this week?', 'up-to-date list of hospitals',
+    'recently issued notification on hoardings', 'just published committee decision',
+    'new circular on plastic ban', 'current projects in Hadapsar', 'fresh schemes for women',
+    'which one?', 'and that one', 'what about Kothrud?', 'tell me more', 'give me details',
+    'where is it', 'who issued it', 'which department handles this', 'when was it published',
+    'what is the date', 'from the list above which is nearest to me', 'any other hospitals nearby',
+    'is there more', 'what else', 'which ward', 'how far is the nearest crematorium',
+    'where are the places mentioned', 'who is the ward officer of Bibwewadi',
+    'How do I apply for a birth certificate?', 'garbage collection timings in Warje',
+    'contact number of Ghole Road ward office', 'gardens near me', 'crematorium near Kothrud',
+    'garden rules', 'press release about the budget', 'latest press note',
+    'latest resolution of the standing committee', 'latest events and projects',
+    'newest policy on street vendors', 'recent awards won by PMC', 'latest news and circulars',
+    'मालमत्ता कर कसा भरायचा?', 'नवीन परिपत्रक', 'ताज्या बातम्या', 'latest परिपत्रक',
+    'latest योजना', 'कोथरूड वॉर्ड ऑफिस चा नंबर', 'PMC चे contact number',
+    'Which one is closest to Aundh', 'plastic', 'Lastly, the notification', 'currently open gardens',
+    'this', 'them', 'those ones please', 'these are the circulars I want', 'it', '', '   ',
+    'WHAT IS THE DATE', 'Tell Me More about it', 'Latest Circular From Electrical Department',
+    'The One near Yerwada', 'sinhagad road hospital', 'nagar road ward office address',
+    'Baner garden timings', 'Dhanori water supply', 'kalasgaon', 'Warjeroad',
+    'new circular', 'any new circular?', 'any new notices from the garden department?',
+    'renew circular', 'news about the new bridge', 'what was recently announced', 'the last circular',
+    'plastic ban rules', 'current water cut schedule',
+]
+PREVIOUS_QUERIES = [None, '', 'list of gardens in Kothrud']
+# Where is_latest_query deliberately differs from the legacy substring match: keywords are whole
+# words ("last" is not in "plastic"), and "new" counts before a record type in English and Marathi
+LATEST_DIFFERENCES = {
+    'plastic': False,
+    'plastic ban rules': False,
+    'Lastly, the notification': False,
+    'currently open gardens': False,
+    'renew circular': False,
+    'any new notices from the garden department?': True,
+    'नवीन परिपत्रक': True,
+}
+
+# --- Previous code, verbatim ---
+
+def legacy_is_latest_query(query):
+    """Enhanced latest query detection"""
+    LATEST_KEYWORDS = [
+        r"latest", r"most recent", r"newest", r"recent", r"last", r"current",
+        r"today(?:'s)?", r"this week", r"fresh", r"updated", r"up-to-date",
+        r"just published", r"just released", r"recently issued", r"recently published",
+        r"recently released", r"latest circular", r"recent circular", r"new circular"
+    ]
+    pattern = re.compile(r"|".join(LATEST_KEYWORDS), re.IGNORECASE)
+    return bool(pattern.search(query))
+
+# record_type asked for by a latest query, checked in this order
+LEGACY_LATEST_RECORD_TYPES = [
+    ('circular', ['circular', 'notice', 'notification', 'परिपत्रक', 'सूचना']),
+    ('news', ['news', 'press note', 'press release', 'बातमी', 'बातम्या']),
+    ('committee_decision', ['committee decision', 'resolution', 'ठराव']),
+    ('event', ['event', 'कार्यक्रम']),
+    ('project', ['project', 'प्रकल्प']),
+    ('scheme', ['scheme', 'योजना']),
+    ('policy', ['policy', 'धोरण']),
+    ('award', ['award', 'पुरस्कार']),
+]
+_LEGACY_LATEST_RECORD_TYPE_PATTERNS = [
+    (record_type, re.compile(r'(?<!\w)(?:' + '|'.join(map(re.escape, words)) + ')', re.IGNORECASE))
+    for record_type, words in LEGACY_LATEST_RECORD_TYPES
+]
+
+def legacy_latest_record_type(query):
+    """The record_type a latest query names ('latest circulars' -> 'circular'), or None"""
+    for record_type, pattern in _LEGACY_LATEST_RECORD_TYPE_PATTERNS:
+        if pattern.search(query):
+            return record_type
+    return None
+
+def legacy_is_followup_query(query, prev_user_query):
+    """Enhanced follow-up detection"""
+    pronouns = ["it", "that", "this", "one", "which", "above", "them", "those", "these"]
+    q_lower = query.lower().strip()
+
+    if not prev_user_query:
+        return False
+
+    # Check for pronouns in short queries
+    if len(q_lower.split()) <= 6 and any(p in q_lower for p in pronouns):
+        return True
+
+    # Check for references to previous content
+    reference_patterns = [
+        r"from above",
+        r"from the list",
+        r"from those",
+        r"which one",
+        r"nearest to me",
+        r"closest to me",
+        r"near me",
+        r"nearby",
+        r"the one",
+        r"that one",
+        r"this one"
+    ]
+
+    for pattern in reference_patterns:
+        if re.search(pattern, q_lower):
+            return True
+
+    # Check for specific follow-up patterns
+    followup_patterns = [
+        r"what is the date",
+        r"when was it",
+        r"where is it",
+        r"who issued it",
+        r"which department",
+        r"what about",
+        r"tell me more",
+        r"give me details",
+        r"what else",
+        r"any other",
+        r"is there more",
+        r"which one",
+        r"from above",
+        r"from the list",
+        r"from those",
+        r"nearest to me",
+        r"closest to me",
+        r"near me",
+        r"nearby"
+    ]
+
+    for pattern in followup_patterns:
+        if re.search(pattern, q_lower):
+            return True
+
+    # Check for question words with context-dependent queries
+    question_words = ["which", "what", "where", "who", "when", "how"]
+    if any(q_lower.startswith(w) for w in question_words):
+        # If it's a short question, likely a follow-up
+        if len(q_lower.split()) <= 4:
+            return True
+        # If it's longer but contains context-dependent words
+        context_words = ["date", "time", "location", "department", "ward", "circular", "notice",
+                        "place", "places", "nearest", "closest", "near", "nearby", "distance",
+                        "area", "region", "zone", "above", "list", "those", "one"]
+        if any(word in q_lower for word in context_words):
+            return True
+
+    return False
+
+def legacy_basic_is_followup_query(query, prev_user_query):
+    pronouns = ["it", "that", "this", "one", "which", "above", "them", "those", "these"]
+    q_lower = query.lower().strip()
+    # If no previous user query, can't be a follow-up
+    if not prev_user_query:
+        return False
+    # If query is very short and contains a pronoun, likely a follow-up
+    if len(q_lower.split()) <= 6 and any(p in q_lower for p in pronouns):
+        return True
+    # If query is a full question (starts with 'which', 'what', etc.) and is long enough, treat as standalone
+    question_words = ["which", "what", "where", "who", "when", "how"]
+    if any(q_lower.startswith(w) for w in question_words) and len(q_lower.split()) > 6:
+        return False
+    # Default: not a follow-up
+    return False
+
+# --- Checks ---
+
+EXPECTED_INTENTS = {
+    ('latest circular', None): QueryIntent(latest=True, record_type='circular'),
+    ('new circular', None): QueryIntent(latest=True, record_type='circular'),
+    ('any new circular?', None): QueryIntent(latest=True, record_type='circular'),
+    ('latest news and circulars', None): QueryIntent(latest=True, record_type='circular'),
+    ('crematorium near Kothrud', None): QueryIntent(ward='Kothrud-Bawdhan'),
+    ('which one is closest to Aundh', 'hospitals list'): QueryIntent(followup=True, ward='Aundh-Baner'),
+    ('nagar road ward office address', None): QueryIntent(ward='Nagar Road-Vadgaonsheri'),
+    ('कोथरूड वॉर्ड ऑफिस चा नंबर', None): QueryIntent(ward='Kothrud-Bawdhan'),
+    ('kalasgaon', None): QueryIntent(),
+    ('Warjeroad', None): QueryIntent(),
+    ('ताज्या बातम्या', None): QueryIntent(record_type='news'),
+}
+
+def golden_failures():
+    failures = []
+    checked = 0
+    for query in GOLDEN_QUERIES:
+        legacy_latest = LATEST_DIFFERENCES.get(query, legacy_is_latest_query(query))
+        checks = [('is_latest_query', legacy_latest, is_latest_query(query)),
+                  ('latest_record_type', legacy_latest_record_type(query), latest_record_type(query))]
+        for prev in PREVIOUS_QUERIES:
+            checks += [
+                (f'is_followup_query prev={prev!r}',
+                 legacy_is_followup_query(query, prev), is_followup_query(query, prev)),
+                (f'is_basic_followup_query prev={prev!r}',
+                 legacy_basic_is_followup_query(query, prev), is_basic_followup_query(query, prev)),
+            ]
+            intent = classify_query(query, prev)
+            checks += [(f'classify_query.followup prev={prev!r}', legacy_is_followup_query(query, prev),
+                        intent.followup)]
+        intent = classify_query(query)
+        checks += [('classify_query.latest', legacy_latest, intent.latest),
+                   ('classify_query.record_type', legacy_latest_record_type(query), intent.record_type)]
+        for label, old, new in checks:
+            checked += 1
+            if old != new:
+                failures.append(f'{label} {query!r}: legacy={old!r} new={new!r}')
+    for query, expected in LATEST_DIFFERENCES.items():
+        # Each listed difference must still be one
+        checked += 1
+        if legacy_is_latest_query(query) == expected:
+            failures.append(f'LATEST_DIFFERENCES {query!r}: legacy already gives {expected!r}')
+    for (query, prev), expected in EXPECTED_INTENTS.items():
+        checked += 1
+        intent = classify_query(query, prev)
+        if intent != expected:
+            failures.append(f'classify_query {query!r}: {intent!r} != {expected!r}')
+    return checked, failures
+
+def main():
+    parser = argparse.ArgumentParser(description='Check the intent router against the previous intent functions')
+    parser.add_argument('--repeat', type=int, default=500, help='Passes over the golden queries per timing')
+    args = parser.parse_args()
+
+    checked, failures = golden_failures()
+    print(f'{checked} golden checks on {len(GOLDEN_QUERIES)} queries, {len(failures)} failures')
+    for failure in failures[:20]:
+        print(f'FAIL {failure}')
+
+    prev = PREVIOUS_QUERIES[-1]
+
+    def legacy_pipeline(query):
+        # What the improved chat pipeline ran per query before the router
+        legacy_is_followup_query(query, prev)
+        if legacy_is_latest_query(query):
+            legacy_latest_record_type(query)
+
+    def timed(fn):
+        start = time.perf_counter()
+        for _ in range(args.repeat):
+            for query in GOLDEN_QUERIES:
+                fn(query)
+        return (time.perf_counter() - start) / (args.repeat * len(GOLDEN_QUERIES))
+
+    print('-' * 72)
+    rows = [
+        ('is_latest_query', timed(legacy_is_latest_query), timed(is_latest_query)),
+        ('is_followup_query', timed(lambda q: legacy_is_followup_query(q, prev)),
+         timed(lambda q: is_followup_query(q, prev))),
+        ('latest_record_type', timed(legacy_latest_record_type), timed(latest_record_type)),
+        ('pipeline', timed(legacy_pipeline), timed(lambda q: classify_query(q, prev))),
+    ]
+    for label, old, new in rows:
+        print(f'{label:<20} legacy {old * 1e6:7.2f} us | router {new * 1e6:7.2f} us | {old / new:5.1f}x')
+    print('(pipeline: legacy follow-up + latest + record type vs classify_query, which also reads the ward)')
+    print('OK' if not failures else f'{len(failures)} checks failed')
+    return 1 if failures else 0
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,144 @@
+#!/usr/bin/env python3
+"""
+Check that "latest <type>" queries retrieve the newest records of that type.
+
+Writes a temporary local index over the normalized records with random
+unit embeddings (so similarity carries no date signal, as for a generic
+"latest circulars" question), then for each record type asked for by
+intent_router.LATEST_RECORD_TYPES compares:
+
+    post-sort     the previous pipeline: plain top-k, re-sorted by date
+    date index    search_index on the local backend (newest records of the type)
+    cutoff        search_index with the Pinecone plan: type + date_epoch on or after
+                  the cutoff read from the keyword index's records
+    date windows  the Pinecone plan without the keyword index (date windows back
+                  from today, so results depend on how recent the data is)
+
+The Pinecone plans run against the local index's metadata filters. Reports
+how many of the truly newest records of the type (by date_epoch) reach the
+context, and the latency of each strategy. Exits with status 1 if the date
+index or cutoff strategy misses any of them.
+
+Usage:
+    python scripts/check_latest_retrieval.py
+    python scripts/check_latest_retrieval.py --data data/pmc_data_normalized.jsonl --repeat 20
+"""
+
+import argparse
+import json
+import os
+import sys
+import tempfile
+import time
+
+import numpy as np
+
+sys.path.append(os.path.join(os.path.dirname(__file__), '..', 'chatbot'))
+from local_index import LocalIndexWriter
+from record_metadata import filter_metadata, record_date_epoch, record_date_key
+from intent_router import classify_query, LATEST_RECORD_TYPES
+
+DIM = 64
+
+def build_index(records, path, seed=0):
+    """Write a local index of the records with random embeddings"""
+    rng = np.random.default_rng(seed)
+    writer = LocalIndexWriter(path)
+    writer.upsert([
+        {'id': rec['id'], 'values': rng.standard_normal(DIM).astype(np.float32), 'metadata': filter_metadata(rec)}
+        for rec in records if rec.get('id')
+    ])
+    writer.save()
+
+def newest_ids(records, record_type, n):
+    """IDs of records of a type dated on or after the n-th newest one (ties count)"""
+    dated = sorted(
+        ((record_date_epoch(rec), rec['id']) for rec in records
+         if rec.get('record_type') == record_type and rec.get('id') and record_date_epoch(rec) is not None),
+        reverse=True
+    )
+    if not dated:
+        return set(), 0
+    cutoff = dated[min(n, len(dated)) - 1][0]
+    return {rec_id for epoch, rec_id in dated if epoch >= cutoff}, min(n, len(dated))
+
+def main():
+    parser = argparse.ArgumentParser(description='Check latest-query retrieval against the true newest records')
+    parser.add_argument('--data', default='data/pmc_data_normalized.jsonl')
+    parser.add_argument('--repeat', type=int, default=10)
+    args = parser.parse_args()
+
+    if not os.path.exists(args.data):
+        print(f'{args.data} not found; run scripts/normalize_pmc_data.py first or pass --data')
+        return 1
+    with open(args.data, 'r', encoding='utf-8') as f:
+        records = [json.loads(line) for line in f if line.strip()]
+
+    with tempfile.TemporaryDirectory() as tmp:
+        build_index(records, tmp)
+        os.environ['RETRIEVER_BACKEND'] = 'local'
+        os.environ['LOCAL_INDEX_DIR'] = tmp
+        os.environ['BM25_DATA_FILE'] = args.data
+        import terminal_chatbot_openai_improved as chat
+        chat.get_bm25_index()
+
+        def post_sort(query_emb, query):
+            matches = chat.index.query(vector=query_emb, top_k=chat.TOP_K, include_metadata=True)['matches']
+            return sorted(matches, key=lambda d: record_date_key(d.metadata), reverse=True)
+
+        def date_index(query_emb, query):
+            return sort_by_date(chat.search_index(query_emb, classify_query(query))[0])
+
+        def cutoff(query_emb, query):
+            chat.RETRIEVER_BACKEND = 'pinecone'
+            try:
+                return sort_by_date(chat.search_index(query_emb, classify_query(query))[0])
+            finally:
+                chat.RETRIEVER_BACKEND = 'local'
+
+        def date_windows(query_emb, query):
+            get_bm25_index = chat.get_bm25_index
+            chat.get_bm25_index = lambda: None
+            try:
+                return cutoff(query_emb, query)
+            finally:
+                chat.get_bm25_index = get_bm25_index
+
+        def sort_by_date(matches):
+            return sorted(matches, key=lambda d: record_date_epoch(d.metadata) or 0, reverse=True)
+
+        strategies = [('post-sort', post_sort), ('date index', date_index), ('cutoff', cutoff),
+                      ('date windows', date_windows)]
+        rng = np.random.default_rng(1)
+        n_context = chat.CONTEXT_RESULTS
+        failures = 0
+        totals = {label: [0, 0.0] for label, _ in strategies}
+        expected_total = 0
+        print(f'{len(chat.index)} rows, {len(chat.index.dates)} dated; newest {n_context} per type')
+        for record_type, words in LATEST_RECORD_TYPES:
+            truth, expected = newest_ids(records, record_type, n_context)
+            if not expected:
+                continue
+            query = f'latest {words[0]}'
+            query_emb = rng.standard_normal(DIM).tolist()
+            cells = []
+            for label, fn in strategies:
+                start = time.perf_counter()
+                for _ in range(args.repeat):
+                    context = fn(query_emb, query)[:n_context]
+                elapsed = (time.perf_counter() - start) / args.repeat
+                found = sum(1 for d in context if d.metadata.get('id', d.id) in truth)
+                totals[label][0] += found
+                totals[label][1] += elapsed
+                cells.append(f'{label} {found}/{expected} {elapsed * 1000:5.2f} ms')
+                if label in ('date index', 'cutoff') and found < expected:
+                    failures += 1
+            expected_total += expected
+            print(f'{record_type:<19} ' + ' | '.join(cells))
+        print('-' * 72)
+        for label, (found, elapsed) in totals.items():
+            print(f'{label:<13} {found}/{expected_total} newest records in context, {elapsed * 1000:7.2f} ms total')
+    return 1 if failures else 0
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,231 @@
+#!/usr/bin/env python3
+"""
+Parity check and microbenchmark for the compiled map_to_main_type.
+
+Runs the previous loop-based implementation (kept verbatim below) and the
+compiled classifier over every node in the crawled input files, reports
+any record where they disagree (exit status 1), then times both the way
+extract_from_node calls them.
+
+The overall speedup depends on the shape of the corpus, so the timings
+are also broken down by the step that resolves each record:
+
+    type field   an explicit record_type / content_type: the same dict lookup in both
+    title        a RAW_TYPE_TO_MAIN_TYPE key or keyword in the title
+    source url   a RAW_TYPE_TO_MAIN_TYPE key in the source URL
+    content      the keyword fallback on the record's text
+    no match     nothing matched ('other'): every scan runs to the end
+
+The compiled version gains on the last three, where the legacy code has
+scanned every key against the title (and URL) and, for the content steps,
+rebuilt the record text. A type field or a title match costs about the
+same in both (the legacy loop stops at the first key it finds), so a
+corpus whose records mostly resolve there shows little overall speedup.
+On the 14.5k-node synthetic crawl (16% type field, 40% title, 35% source
+url, 9% content or no match) it is about 2.7x.
+
+Usage:
+    python scripts/check_type_classifier.py
+    python scripts/check_type_classifier.py --data-dir data --repeat 3
+"""
+
+import argparse
+import json
+import os
+import sys
+import time
+
+from normalize_pmc_data import (
+    RAW_TYPE_TO_MAIN_TYPE, RAW_TYPE_CLASSIFIER, KEYWORD_CLASSIFIER, extract_all_text_content,
+    map_to_main_type, list_input_files, iter_entry_nodes
+)
+
+def legacy_map_to_main_type(record, source_url=None):
+    """map_to_main_type before the compiled classifier."""
+    # Try to use explicit record_type/content_type/content_type_name
+    for key in ['record_type', 'content_type', 'content_type_name', 'type']:
+        val = record.get(key)
+        if val and val in RAW_TYPE_TO_MAIN_TYPE:
+            return RAW_TYPE_TO_MAIN_TYPE[val]
+
+    # Try to use title/section with more comprehensive matching
+    title = record.get('title', '')
+    title_lower = title.lower()
+
+    # Check for exact matches first
+    for raw, main in RAW_TYPE_TO_MAIN_TYPE.items():
+        if raw.lower() in title_lower:
+            return main
+
+    # Check for partial matches and keywords
+    keywords_mapping = {
+        'circular': ['circular', 'notice', 'order', 'notification'],
+        'department': ['department', 'contact', 'officer', 'directory'],
+        'project': ['project', 'development', 'infrastructure', 'construction'],
+        'event': ['event', 'competition', 'exhibition', 'program', 'campaign'],
+        'news': ['news', 'update', 'press', 'announcement'],
+        'hospital': ['hospital', 'medical', 'health', 'clinic', 'blood bank'],
+        'school': ['school', 'education', 'academy', 'college'],
+        'service': ['service', 'online', 'application', 'portal', 'digital'],
+        'tax': ['tax', 'property tax', 'revenue', 'payment', 'bill'],
+        'utility': ['water', 'electricity', 'supply', 'utility'],
+        'waste': ['waste', 'garbage', 'sanitation', 'cleaning', 'plastic'],
+        'transport': ['transport', 'traffic', 'bus', 'parking'],
+        'construction': ['building', 'construction', 'permit', 'license'],
+    }
+
+    for main_type, keywords in keywords_mapping.items():
+        for keyword in keywords:
+            if keyword in title_lower:
+                return main_type
+
+    # Try to use source_url
+    if source_url:
+        url_lower = source_url.lower()
+        for raw, main in RAW_TYPE_TO_MAIN_TYPE.items():
+            if raw.lower() in url_lower:
+                return main
+
+    # Fallback based on content analysis
+    all_text = extract_all_text_content(record).lower()
+    for main_type, keywords in keywords_mapping.items():
+        for keyword in keywords:
+            if keyword in all_text:
+                return main_type
+
+    return 'other'
+
+def missing_input(data_dir):
+    """Why data_dir has no crawler output to check, or None"""
+    if not os.path.isdir(data_dir):
+        return f'{data_dir} does not exist'
+    if not list_input_files(data_dir):
+        return f'No crawler output (*.jsonl) in {data_dir}'
+    return None
+
+def load_nodes(data_dir):
+    """(node, source_url) pairs for every titled node in the input files"""
+    samples = []
+    for fname in list_input_files(data_dir):
+        with open(os.path.join(data_dir, fname), 'r', encoding='utf-8') as f:
+            for line in f:
+                try:
+                    entry = json.loads(line)
+                    source_url = entry.get('source_url') if isinstance(entry, dict) else None
+                    nodes = iter_entry_nodes(entry)
+                except Exception:
+                    continue
+                for node in nodes:
+                    if isinstance(node, dict) and (node.get('title') or node.get('name') or node.get('subject')):
+                        samples.append((node, source_url))
+    return samples
+
+STEPS = ['type field', 'title', 'source url', 'content', 'no match']
+
+def resolving_step(record, source_url, content):
+    """The step of map_to_main_type that decides a record's type"""
+    for key in ['record_type', 'content_type', 'content_type_name', 'type']:
+        val = record.get(key)
+        if val and val in RAW_TYPE_TO_MAIN_TYPE:
+            return 'type field'
+    title_lower = str(record.get('title', '')).lower()
+    if RAW_TYPE_CLASSIFIER.classify(title_lower) or KEYWORD_CLASSIFIER.classify(title_lower):
+        return 'title'
+    if source_url and RAW_TYPE_CLASSIFIER.classify(source_url.lower()):
+        return 'source url'
+    return 'content' if KEYWORD_CLASSIFIER.classify(content.lower()) else 'no match'
+
+def classify(fn, node, source_url, *args):
+    """Call a classifier, folding exceptions into the result so they are compared too"""
+    try:
+        return fn(node, source_url, *args)
+    except Exception as e:
+        return f'<{type(e).__name__}>'
+
+def main():
+    parser = argparse.ArgumentParser(description='Check and benchmark the compiled map_to_main_type')
+    parser.add_argument('--data-dir', default='data')
+    parser.add_argument('--repeat', type=int, default=3)
+    args = parser.parse_args()
+
+    missing = missing_input(args.data_dir)
+    if missing:
+        print(f'{missing}; run scripts/enhanced_extract_pmc_data.py first or pass --data-dir')
+        return 1
+    samples = load_nodes(args.data_dir)
+    if not samples:
+        print(f'No input records found in {args.data_dir}')
+        return 1
+    contents = [extract_all_text_content(node) for node, _ in samples]
+
+    mismatches = 0
+    type_counts = {}
+    for (node, source_url), content in zip(samples, contents):
+        old = classify(legacy_map_to_main_type, node, source_url)
+        new = classify(map_to_main_type, node, source_url, content)
+        type_counts[new] = type_counts.get(new, 0) + 1
+        if old != new:
+            mismatches += 1
+            if mismatches <= 10:
+                print(f'MISMATCH {node.get("title")!r} ({source_url}): legacy={old} compiled={new}')
+    print(f'{len(samples)} records, {mismatches} mismatches')
+    print('Types: ' + ', '.join(f'{t}={n}' for t, n in sorted(type_counts.items(), key=lambda x: -x[1])))
+
+    # extract_from_node already has full_content, which the compiled version reuses
+    def run_legacy(samples=samples):
+        for node, source_url in samples:
+            classify(legacy_map_to_main_type, node, source_url)
+
+    def run_compiled(samples=samples, contents=contents):
+        for (node, source_url), content in zip(samples, contents):
+            classify(map_to_main_type, node, source_url, content)
+
+    # The per-field scan alone: RAW_TYPE_TO_MAIN_TYPE keys against every title
+    titles = [str(node.get('title', '')).lower() for node, _ in samples]
+
+    def run_legacy_title_scan():
+        for title_lower in titles:
+            for raw, main in RAW_TYPE_TO_MAIN_TYPE.items():
+                if raw.lower() in title_lower:
+                    break
+
+    def run_compiled_title_scan():
+        for title_lower in titles:
+            RAW_TYPE_CLASSIFIER.classify(title_lower)
+
+    print('-' * 72)
+    timings = {}
+    for label, fn in [('legacy', run_legacy), ('compiled', run_compiled),
+                      ('legacy title scan', run_legacy_title_scan),
+                      ('compiled title scan', run_compiled_title_scan)]:
+        best = min(_timed(fn) for _ in range(args.repeat))
+        timings[label] = best
+        print(f'{label:<22} {best * 1000:9.1f} ms | {best / len(samples) * 1e6:8.1f} us/record')
+    print(f'Speedup: {timings["legacy"] / timings["compiled"]:.1f}x as called from extract_from_node, '
+          f'{timings["legacy title scan"] / timings["compiled title scan"]:.1f}x for one field scan')
+
+    print('-' * 72)
+    by_step = {step: ([], []) for step in STEPS}
+    for (node, source_url), content in zip(samples, contents):
+        step_samples, step_contents = by_step[resolving_step(node, source_url, content)]
+        step_samples.append((node, source_url))
+        step_contents.append(content)
+    print('By resolving step (legacy vs compiled, per record):')
+    for step in STEPS:
+        step_samples, step_contents = by_step[step]
+        if not step_samples:
+            continue
+        legacy = min(_timed(lambda: run_legacy(step_samples)) for _ in range(args.repeat)) / len(step_samples)
+        compiled = min(_timed(lambda: run_compiled(step_samples, step_contents))
+                       for _ in range(args.repeat)) / len(step_samples)
+        print(f'  {step:<11} {len(step_samples):6d} records ({len(step_samples) / len(samples):5.1%}) | '
+              f'legacy {legacy * 1e6:7.1f} us | compiled {compiled * 1e6:7.1f} us | {legacy / compiled:5.1f}x')
+    return 1 if mismatches else 0
+
+def _timed(fn):
+    start = time.perf_counter()
+    fn()
+    return time.perf_counter() - start
+
+if __name__ == '__main__':
+    sys.exit(main())
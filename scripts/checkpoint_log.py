@@ -0,0 +1,119 @@
+"""
+Append-only checkpoint journal for embedding ingestion.
+
+Replaces rewriting the whole ``embedding_progress.json`` after every upsert
+batch (O(n^2) I/O over a run). Each batch appends one row per completed
+record to a SQLite table in WAL mode, so a commit costs O(batch) no matter
+how large the corpus is. Resuming replays the log into a dict with a single
+query. Superseded rows (records re-processed after an edit) are compacted
+away when they start to dominate the log.
+
+The legacy JSON progress file is imported automatically the first time a
+journal is opened next to it. Each row also stores the record's chunk
+count, so vectors of chunks a re-processed record no longer has can be
+deleted; journals written before the column existed are migrated in place.
+"""
+
+import json
+import os
+import sqlite3
+
+# Compact once the log holds this many times more rows than live records
+COMPACT_RATIO = 2.0
+COMPACT_MIN_ROWS = 10000
+
+class CheckpointLog:
+    """Journal of processed records (record id -> content hash, chunk count) and the vector count"""
+
+    def __init__(self, path, legacy_progress_file=None):
+        self.path = path
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self._conn = sqlite3.connect(path)
+        self._conn.execute('PRAGMA journal_mode=WAL')
+        self._conn.execute('PRAGMA synchronous=NORMAL')
+        self._conn.execute(
+            'CREATE TABLE IF NOT EXISTS checkpoints ('
+            ' seq INTEGER PRIMARY KEY AUTOINCREMENT,'
+            ' record_id TEXT NOT NULL,'
+            ' content_hash TEXT,'
+            ' chunks INTEGER)'
+        )
+        columns = {row[1] for row in self._conn.execute('PRAGMA table_info(checkpoints)')}
+        if 'chunks' not in columns:
+            self._conn.execute('ALTER TABLE checkpoints ADD COLUMN chunks INTEGER')
+        self._conn.execute('CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value TEXT)')
+        self._conn.commit()
+        if legacy_progress_file and self._get_meta('legacy_imported') is None:
+            self._import_legacy(legacy_progress_file)
+
+    def _get_meta(self, key, default=None):
+        row = self._conn.execute('SELECT value FROM meta WHERE key = ?', (key,)).fetchone()
+        return row[0] if row else default
+
+    def _import_legacy(self, progress_file):
+        """One-time import of embedding_progress.json"""
+        progress = {}
+        if os.path.exists(progress_file):
+            try:
+                with open(progress_file, 'r') as f:
+                    progress = json.load(f)
+            except (OSError, ValueError) as e:
+                print(f'Could not import {progress_file}: {e}')
+        hashes = progress.get('record_hashes', {})
+        rows = [(record_id, hashes.get(record_id)) for record_id in progress.get('processed_records', [])]
+        with self._conn:
+            self._conn.executemany('INSERT INTO checkpoints (record_id, content_hash) VALUES (?, ?)', rows)
+            self._conn.execute(
+                'INSERT OR REPLACE INTO meta (key, value) VALUES (?, ?)',
+                ('total_embeddings', str(progress.get('total_embeddings', 0)))
+            )
+            self._conn.execute("INSERT OR REPLACE INTO meta (key, value) VALUES ('legacy_imported', '1')")
+        if rows:
+            print(f'Imported {len(rows)} processed records from {progress_file}')
+
+    @property
+    def total_embeddings(self):
+        return int(self._get_meta('total_embeddings', 0))
+
+    def load(self):
+        """Replay the log: {record_id: content_hash} for every processed record"""
+        # Later rows supersede earlier ones for the same record
+        return dict(self._conn.execute('SELECT record_id, content_hash FROM checkpoints ORDER BY seq'))
+
+    def chunk_counts(self):
+        """{record_id: chunk count} for processed records whose count was recorded"""
+        counts = dict(self._conn.execute('SELECT record_id, chunks FROM checkpoints ORDER BY seq'))
+        return {record_id: n for record_id, n in counts.items() if n is not None}
+
+    def append(self, records, n_vectors, chunk_counts=None):
+        """Durably record a batch: records maps record id -> content hash, chunk_counts id -> chunks"""
+        chunk_counts = chunk_counts or {}
+        with self._conn:
+            self._conn.executemany(
+                'INSERT INTO checkpoints (record_id, content_hash, chunks) VALUES (?, ?, ?)',
+                [(record_id, content_hash, chunk_counts.get(record_id)) for record_id, content_hash in records.items()]
+            )
+            self._conn.execute(
+                "INSERT INTO meta (key, value) VALUES ('total_embeddings', ?) "
+                "ON CONFLICT(key) DO UPDATE SET value = CAST(value AS INTEGER) + excluded.value",
+                (n_vectors,)
+            )
+
+    def compact(self, force=False):
+        """Drop superseded rows once they dominate the log; return True if compacted"""
+        rows, live = self._conn.execute(
+            'SELECT COUNT(*), COUNT(DISTINCT record_id) FROM checkpoints'
+        ).fetchone()
+        if not force and (rows < COMPACT_MIN_ROWS or rows < live * COMPACT_RATIO):
+            return False
+        with self._conn:
+            self._conn.execute(
+                'DELETE FROM checkpoints WHERE seq NOT IN (SELECT MAX(seq) FROM checkpoints GROUP BY record_id)'
+            )
+        self._conn.execute('PRAGMA wal_checkpoint(TRUNCATE)')
+        return True
+
+    def close(self):
+        self._conn.close()
@@ -46,11 +46,12 @@ def clear_index():
         print(f"✅ Successfully cleared index!")
         print(f"Remaining vectors: {new_total}")
         
-        # Also delete progress file if it exists
-        progress_file = 'embedding_progress.json'
-        if os.path.exists(progress_file):
-            os.remove(progress_file)
-            print(f"✅ Deleted progress file: {progress_file}")
+        # Also delete the progress files (legacy JSON and checkpoint journal) if they exist
+        for progress_file in ['embedding_progress.json', 'embedding_checkpoints.sqlite3',
+                              'embedding_checkpoints.sqlite3-wal', 'embedding_checkpoints.sqlite3-shm']:
+            if os.path.exists(progress_file):
+                os.remove(progress_file)
+                print(f"✅ Deleted progress file: {progress_file}")
         
     except Exception as e:
         print(f"❌ Error clearing index: {e}")
@@ -0,0 +1,202 @@
+#!/usr/bin/env python3
+"""
+Local HTTP fixture server for exercising enhanced_extract_pmc_data.py.
+
+Serves PMC-API-like JSON under paths whose first segment selects the
+behaviour, so a link list can mix outcomes deterministically:
+
+    /items/<n>        {"data": [...]} payload (the common PMC shape)
+    /page/<n>         single JSON object
+    /missing/<n>      404        /gone/<n>         410
+    /error/<n>        500        /unavailable/<n>  503
+    /forbidden/<n>    403 (retried, then failed)
+    /flaky/<n>        429 with Retry-After: 0 for the first FLAKY_FAILURES
+                      requests to that path, then a normal payload
+    /badjson/<n>      200 with a body that is not JSON
+    /stall/<n>        answers only after stall seconds (client timeouts)
+
+/items/ responses carry an ETag and Last-Modified and answer conditional
+requests with 304; /page/ responses carry no validators. Bumping the
+server's generation edits every CHANGE_EVERY-th /items/ payload.
+
+Every response waits latency seconds plus up to jitter seconds. The
+server records total requests, requests per path, response body bytes,
+304s sent and the peak number of concurrent requests per Host header.
+
+Usage:
+    python scripts/crawler_fixture_server.py --port 8200 --latency-ms 50
+"""
+
+import argparse
+import asyncio
+import hashlib
+import json
+import random
+import threading
+from collections import defaultdict
+
+from aiohttp import web
+
+FLAKY_FAILURES = 2
+CHANGE_EVERY = 4
+LAST_MODIFIED = 'Mon, 01 Jan 2024 00:00:00 GMT'
+BROKEN_STATUS = {'missing': 404, 'gone': 410, 'error': 500, 'unavailable': 503}
+
+def fixture_payload(kind, n, generation=0, items_per_page=None):
+    """Deterministic PMC-like payload for a path"""
+    rng = random.Random(f'{kind}/{n}')
+    items = []
+    for i in range(items_per_page or rng.randint(1, 4)):
+        items.append({
+            'id': n * 10 + i,
+            'title': f'Circular {n}-{i} regarding ward office {rng.randint(1, 15)}',
+            'description': f'Contact 98{rng.randint(10000000, 99999999)} or see '
+                           f'https://www.pmc.gov.in/sites/default/files/circular_{n}_{i}.pdf',
+            'location': {'map': f'https://maps.google.com/?q=pune+{n}', 'ward': None},
+            'attachments': [],
+            'notes': '',
+            'details': {'published': f'{rng.randint(1, 28):02d}/0{rng.randint(1, 9)}/2024', 'extra': {}}
+        })
+    if generation and kind == 'items' and n % CHANGE_EVERY == 0:
+        items[0]['revision'] = generation
+    if kind == 'page':
+        return items[0]
+    return {'data': items, 'status': 'ok'}
+
+class CrawlerFixtureServer:
+    """aiohttp server answering fixture paths with canned PMC-like responses"""
+
+    def __init__(self, host='127.0.0.1', port=0, latency=0.0, jitter=0.0, stall=30.0, items_per_page=None):
+        self.host = host
+        self.port = port
+        self.latency = latency
+        self.jitter = jitter
+        self.stall = stall
+        self.items_per_page = items_per_page
+        self.generation = 0
+        self._runner = None
+        self.reset()
+
+    @property
+    def base_url(self):
+        return f'http://{self.host}:{self.port}'
+
+    def reset(self):
+        """Clear the request counters (and the flaky paths' failure state)"""
+        self.request_count = 0
+        self.bytes_sent = 0
+        self.not_modified_count = 0
+        self.path_counts = defaultdict(int)
+        self.in_flight = defaultdict(int)
+        self.peak_in_flight = defaultdict(int)
+
+    async def start(self):
+        app = web.Application()
+        app.router.add_route('GET', '/{kind}/{n}', self._handle)
+        # Cancel handlers when the client gives up, so timed-out requests leave the in-flight count
+        self._runner = web.AppRunner(app, access_log=None, handler_cancellation=True)
+        await self._runner.setup()
+        await web.TCPSite(self._runner, self.host, self.port, backlog=1024).start()
+        self.port = self._runner.addresses[0][1]
+
+    async def close(self):
+        await self._runner.cleanup()
+
+    async def _handle(self, request):
+        kind = request.match_info['kind']
+        n = int(request.match_info['n']) if request.match_info['n'].isdigit() else 0
+        host = request.headers.get('Host', '')
+        self.request_count += 1
+        self.path_counts[request.path] += 1
+        self.in_flight[host] += 1
+        self.peak_in_flight[host] = max(self.peak_in_flight[host], self.in_flight[host])
+        try:
+            delay = self.latency + random.uniform(0, self.jitter)
+            if kind == 'stall':
+                delay = self.stall
+            if delay:
+                await asyncio.sleep(delay)
+            response = self.respond(kind, n, request)
+            self.bytes_sent += len(response.body or b'')
+            return response
+        finally:
+            self.in_flight[host] -= 1
+
+    def respond(self, kind, n, request):
+        """Build the response for a path"""
+        if kind in BROKEN_STATUS:
+            return web.json_response({'error': kind}, status=BROKEN_STATUS[kind])
+        if kind == 'forbidden':
+            return web.json_response({'error': 'forbidden'}, status=403)
+        if kind == 'flaky' and self.path_counts[request.path] <= FLAKY_FAILURES:
+            return web.json_response({'error': 'rate limited'}, status=429, headers={'Retry-After': '0'})
+        if kind == 'badjson':
+            return web.Response(text='<html>Service temporarily moved</html>', content_type='application/json')
+        if kind in ('items', 'page', 'flaky', 'stall'):
+            body = json.dumps(fixture_payload(kind, n, self.generation, self.items_per_page), ensure_ascii=False)
+            if kind != 'items':
+                return web.Response(text=body, content_type='application/json')
+            etag = '"%s"' % hashlib.sha256(body.encode('utf-8')).hexdigest()[:16]
+            headers = {'ETag': etag, 'Last-Modified': LAST_MODIFIED}
+            if request.headers.get('If-None-Match') == etag:
+                self.not_modified_count += 1
+                return web.Response(status=304, headers=headers)
+            return web.Response(text=body, content_type='application/json', headers=headers)
+        return web.json_response({'error': f'unknown path {request.path}'}, status=404)
+
+class _ThreadedFixture:
+    """The fixture server running on its own event loop in a daemon thread"""
+
+    def __init__(self, server):
+        self.server = server
+        self.loop = asyncio.new_event_loop()
+        started = threading.Event()
+
+        def run():
+            asyncio.set_event_loop(self.loop)
+            self.loop.run_until_complete(server.start())
+            started.set()
+            self.loop.run_forever()
+
+        self.thread = threading.Thread(target=run, daemon=True)
+        self.thread.start()
+        started.wait()
+
+    def __getattr__(self, name):
+        return getattr(self.server, name)
+
+    def shutdown(self):
+        asyncio.run_coroutine_threadsafe(self.server.close(), self.loop).result()
+        self.loop.call_soon_threadsafe(self.loop.stop)
+        self.thread.join()
+        self.loop.close()
+
+def start_fixture_server(host='127.0.0.1', port=0, latency=0.0, jitter=0.0, stall=30.0, items_per_page=None):
+    """Start the fixture server on a background thread and return it"""
+    return _ThreadedFixture(CrawlerFixtureServer(host, port, latency=latency, jitter=jitter, stall=stall,
+                                                 items_per_page=items_per_page))
+
+def main():
+    parser = argparse.ArgumentParser(description='Local HTTP fixture server for the PMC crawler')
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8200)
+    parser.add_argument('--latency-ms', type=float, default=0.0, help='Artificial latency per request')
+    parser.add_argument('--jitter-ms', type=float, default=0.0, help='Extra random latency per request')
+    parser.add_argument('--stall-s', type=float, default=30.0, help='Delay of the /stall/ paths')
+    args = parser.parse_args()
+
+    server = CrawlerFixtureServer(args.host, args.port, latency=args.latency_ms / 1000.0,
+                                  jitter=args.jitter_ms / 1000.0, stall=args.stall_s)
+
+    async def serve():
+        await server.start()
+        print(f'Crawler fixture server listening on {server.base_url}')
+        await asyncio.Event().wait()
+
+    try:
+        asyncio.run(serve())
+    except KeyboardInterrupt:
+        print('\nStopping fixture server')
+
+if __name__ == '__main__':
+    main()
@@ -1,34 +1,51 @@
 import os
+import sys
 import json
 from tqdm import tqdm
 from dotenv import load_dotenv
 from pinecone import Pinecone
-import openai
 import hashlib
 from langchain.text_splitter import RecursiveCharacterTextSplitter
 
+# Shared modules (pooled OpenAI client) live in the chatbot directory
+sys.path.append(os.path.join(os.path.dirname(__file__), '..', 'chatbot'))
+from openai_client import get_openai_client
+from local_index import LocalIndexWriter
+from record_metadata import filter_metadata, extract_text_for_embedding
+from embedding_pipeline import run_pipeline
+from embedding_store import EmbeddingStore, content_key
+from checkpoint_log import CheckpointLog
+
 # Load environment variables
 load_dotenv()
 PINECONE_API_KEY = os.getenv('PINECONE_API_KEY')
 PINECONE_ENV = os.getenv('PINECONE_ENV')
 PINECONE_INDEX = os.getenv('PINECONE_INDEX', 'pmc-bot-index')
 OPENAI_API_KEY = os.getenv('OPENAI_API_KEY')
+# 'pinecone' (default) upserts to Pinecone; 'local' writes the in-process index used by the chatbot
+RETRIEVER_BACKEND = os.getenv('RETRIEVER_BACKEND', 'pinecone').lower()
+LOCAL_INDEX_DIR = os.getenv('LOCAL_INDEX_DIR', 'data/local_index')
 
 # File path
 DATA_FILE = 'data/pmc_data_normalized.jsonl'
 BATCH_SIZE = 10  # Reduced to avoid Pinecone API limits
 CHUNK_SIZE = 2000
 CHUNK_OVERLAP = 200
-PROGRESS_FILE = 'embedding_progress.json'  # Track progress
+# Track progress (separately per backend, so building one doesn't skip records for the other)
+# in an append-only checkpoint journal; the legacy JSON progress file is imported on first use
+PROGRESS_FILE = 'embedding_progress_local.json' if RETRIEVER_BACKEND == 'local' else 'embedding_progress.json'
+CHECKPOINT_FILE = 'embedding_checkpoints_local.sqlite3' if RETRIEVER_BACKEND == 'local' else 'embedding_checkpoints.sqlite3'
 
-# Initialize Pinecone
-pc = Pinecone(api_key=PINECONE_API_KEY)
-index = pc.Index(PINECONE_INDEX)
+# Initialize the vector store; the local writer has the same upsert() interface as a Pinecone index
+if RETRIEVER_BACKEND == 'local':
+    index = LocalIndexWriter(LOCAL_INDEX_DIR)
+else:
+    pc = Pinecone(api_key=PINECONE_API_KEY)
+    index = pc.Index(PINECONE_INDEX)
 
-# Initialize OpenAI
+# OpenAI calls go through the shared pooled client
 if not OPENAI_API_KEY:
     raise ValueError('OPENAI_API_KEY not set in .env')
-openai.api_key = OPENAI_API_KEY
 
 # Use text-embedding-3-small for cost-performance balance
 # Switch to text-embedding-3-large for maximum accuracy
@@ -37,8 +54,7 @@ EMBEDDING_MODEL = 'text-embedding-3-small'
 def embed_text(text):
     """OpenAI embedding API with error handling and retries"""
     try:
-        from openai import OpenAI
-        client = OpenAI(api_key=OPENAI_API_KEY)
+        client = get_openai_client()
         response = client.embeddings.create(
             model=EMBEDDING_MODEL,
             input=text,
@@ -58,102 +74,66 @@ def chunk_text(text):
     )
     return splitter.split_text(text)
 
-def filter_metadata(meta):
-    """Filter metadata to only include essential fields within Pinecone limits"""
-    # Only keep essential metadata fields to stay within 40KB limit
-    essential_fields = {
-        'id', 'title', 'description', 'date', 'display_date', 
-        'department', 'ward_name', 'record_type', 'lang',
-        'pdf_url', 'external_link', 'url', 'chunk_id', 'total_chunks',
-        'embedding_model'
-    }
-    
-    filtered = {}
-    for k, v in meta.items():
-        if k in essential_fields:
-            if isinstance(v, str) and len(v) > 1000:  # Truncate long strings
-                filtered[k] = v[:1000] + "..."
-            elif isinstance(v, (str, int, float, bool)):
-                filtered[k] = v
-            elif isinstance(v, list) and all(isinstance(i, str) for i in v):
-                # Truncate list items if too long
-                filtered[k] = [item[:500] + "..." if len(item) > 500 else item for item in v[:5]]
-    
-    return filtered
+def record_chunks(rec):
+    """The texts a record is embedded as (none if it has no meaningful text)"""
+    # Use enhanced text extraction
+    text = extract_text_for_embedding(rec)
+    
+    # Skip if no meaningful text
+    if not text or len(text.strip()) < 10:
+        return []
+    
+    # Chunk if too large (OpenAI has 8192 token limit)
+    if len(text) > 30000:
+        return chunk_text(text)
+    return [text]
 
-def extract_text_for_embedding(rec):
-    """Enhanced text extraction optimized for OpenAI embeddings"""
-    text_parts = []
-    
-    # Use the enhanced full_content if available
-    if rec.get('full_content'):
-        text_parts.append(rec['full_content'])
-    else:
-        # Fallback to original method with improvements
-        title = rec.get('title', '')
-        if title:
-            text_parts.append(f"Title: {title}")
-        
-        description = rec.get('description')
-        if description:
-            text_parts.append(f"Description: {description}")
-        
-        # Add other important fields
-        long_desc = rec.get('long_description')
-        if long_desc:
-            text_parts.append(f"Details: {long_desc}")
-        
-        summary = rec.get('summary')
-        if summary:
-            if isinstance(summary, list):
-                for item in summary:
-                    text_parts.append(f"Summary: {item}")
-            else:
-                text_parts.append(f"Summary: {summary}")
-    
-    # Add department and ward information for better context
-    department = rec.get('department')
-    if department:
-        text_parts.append(f"Department: {department}")
-    
-    ward_name = rec.get('ward_name')
-    if ward_name:
-        text_parts.append(f"Ward: {ward_name}")
-    
-    # Add record type for better categorization
-    record_type = rec.get('record_type')
-    if record_type and record_type != 'other':
-        text_parts.append(f"Type: {record_type}")
-    
-    # Add contact information if available
-    contact = rec.get('contact')
-    if contact:
-        text_parts.append(f"Contact: {contact}")
-    
-    return "\n".join(text_parts)
+def chunk_ids(record_id, n_chunks):
+    """Vector IDs of a record embedded as n_chunks chunks"""
+    if n_chunks == 1:
+        return [record_id]
+    return [f"{record_id}_chunk{i+1}" for i in range(n_chunks)]
 
-def load_progress():
-    """Load progress from file"""
-    if os.path.exists(PROGRESS_FILE):
-        try:
-            with open(PROGRESS_FILE, 'r') as f:
-                return json.load(f)
-        except:
-            pass
-    return {'processed_records': set(), 'total_embeddings': 0}
+def iter_embedding_items(records):
+    """Yield one embedding work item per chunk of each record"""
+    for rec in records:
+        chunks = record_chunks(rec)
+        ids = chunk_ids(rec['id'], len(chunks))
+        for i, chunk in enumerate(chunks):
+            chunk_id = ids[i]
+            meta = rec.copy()
+            meta['chunk_id'] = i+1
+            meta['total_chunks'] = len(chunks)
+            meta['embedding_model'] = EMBEDDING_MODEL
+            # Don't include full text in metadata to stay within limits
+            meta = filter_metadata(meta)
+            yield {
+                'id': chunk_id,
+                'text': chunk,
+                'metadata': meta,
+                'record_id': rec['id'],
+                'total_chunks': len(chunks)
+            }
 
-def save_progress(progress):
-    """Save progress to file"""
-    # Convert set to list for JSON serialization
-    progress['processed_records'] = list(progress['processed_records'])
-    with open(PROGRESS_FILE, 'w') as f:
-        json.dump(progress, f)
+def record_content_hash(rec):
+    """Hash of the text a record is embedded from, to detect edited records"""
+    return content_key(extract_text_for_embedding(rec), EMBEDDING_MODEL)
 
 def main():
     """Main function to embed and upsert PMC data"""
-    # Load progress
-    progress = load_progress()
-    processed_records = set(progress['processed_records'])
+    # Load progress: content hash and chunk count per processed record
+    checkpoints = CheckpointLog(CHECKPOINT_FILE, legacy_progress_file=PROGRESS_FILE)
+    try:
+        run(checkpoints)
+    finally:
+        checkpoints.compact()
+        checkpoints.close()
+
+def run(checkpoints):
+    """Embed and upsert new or changed records, checkpointing after each upsert batch"""
+    record_hashes = checkpoints.load()
+    chunk_counts = checkpoints.chunk_counts()
+    processed_records = set(record_hashes)
     
     records = []
     with open(DATA_FILE, 'r', encoding='utf-8') as f:
@@ -161,11 +141,34 @@ def main():
             rec = json.loads(line)
             records.append(rec)
     
-    # Filter out already processed records
-    unprocessed_records = [rec for rec in records if rec['id'] not in processed_records]
+    current_hashes = {rec['id']: record_content_hash(rec) for rec in records}
+    current_chunks = {rec['id']: len(record_chunks(rec)) for rec in records}
+    
+    # Records imported from the legacy progress file have no hash: they were processed
+    # with no change tracking at all, so take their current text as the processed one.
+    # Rows from before chunk counts were tracked get the current count the same way.
+    backfill = [
+        rec['id'] for rec in records
+        if rec['id'] in processed_records and (record_hashes[rec['id']] is None or (
+            rec['id'] not in chunk_counts and record_hashes[rec['id']] == current_hashes[rec['id']]))
+    ]
+    if backfill:
+        checkpoints.append({record_id: current_hashes[record_id] for record_id in backfill}, 0,
+                           {record_id: current_chunks[record_id] for record_id in backfill})
+        record_hashes.update((record_id, current_hashes[record_id]) for record_id in backfill)
+        chunk_counts.update((record_id, current_chunks[record_id]) for record_id in backfill)
+        print(f'Recorded content hashes and chunk counts for {len(backfill)} previously processed records')
+    
+    # Filter out already processed records whose text hasn't changed since
+    unprocessed_records = [
+        rec for rec in records
+        if rec['id'] not in processed_records or record_hashes.get(rec['id']) != current_hashes[rec['id']]
+    ]
+    changed = sum(1 for rec in unprocessed_records if rec['id'] in processed_records)
     
     print(f'Total records: {len(records)}')
     print(f'Already processed: {len(processed_records)}')
+    print(f'Changed since last run: {changed}')
     print(f'Remaining to process: {len(unprocessed_records)}')
     
     if len(unprocessed_records) == 0:
@@ -191,85 +194,62 @@ def main():
     
     print(f'\nUsing OpenAI embedding model: {EMBEDDING_MODEL}')
     
-    batch = []
-    total_embeddings = progress['total_embeddings']
-    
-    for rec in tqdm(unprocessed_records, desc='Embedding and upserting'):
-        # Use enhanced text extraction
-        text = extract_text_for_embedding(rec)
-        
-        # Skip if no meaningful text
-        if not text or len(text.strip()) < 10:
-            continue
-        
-        # Chunk if too large (OpenAI has 8192 token limit)
-        if len(text) > 30000:
-            chunks = chunk_text(text)
-        else:
-            chunks = [text]
-        
-        for i, chunk in enumerate(chunks):
-            chunk_id = f"{rec['id']}_chunk{i+1}" if len(chunks) > 1 else rec['id']
-            embedding = embed_text(chunk)
-            if embedding:
-                meta = rec.copy()
-                meta['chunk_id'] = i+1
-                meta['total_chunks'] = len(chunks)
-                meta['embedding_model'] = EMBEDDING_MODEL
-                # Don't include full text in metadata to stay within limits
-                meta = filter_metadata(meta)
-                batch.append({'id': chunk_id, 'values': embedding, 'metadata': meta})
-                total_embeddings += 1
-            
-            if len(batch) >= BATCH_SIZE:
-                try:
-                    index.upsert(vectors=batch)
-                    print(f"Successfully upserted batch of {len(batch)} vectors")
-                    # Mark record as processed
-                    processed_records.add(rec['id'])
-                    # Save progress periodically
-                    progress['processed_records'] = processed_records
-                    progress['total_embeddings'] = total_embeddings
-                    save_progress(progress)
-                except Exception as e:
-                    print(f"Error upserting batch: {e}")
-                    # Try upserting one by one if batch fails
-                    for vector in batch:
-                        try:
-                            index.upsert(vectors=[vector])
-                        except Exception as e2:
-                            print(f"Error upserting individual vector {vector['id']}: {e2}")
-                    # Mark record as processed even if some chunks failed
-                    processed_records.add(rec['id'])
-                    progress['processed_records'] = processed_records
-                    progress['total_embeddings'] = total_embeddings
-                    save_progress(progress)
-                batch = []
-    
-    if batch:
-        try:
-            index.upsert(vectors=batch)
-            print(f"Successfully upserted final batch of {len(batch)} vectors")
-        except Exception as e:
-            print(f"Error upserting final batch: {e}")
-            # Try upserting one by one if batch fails
-            for vector in batch:
-                try:
-                    index.upsert(vectors=[vector])
-                except Exception as e2:
-                    print(f"Error upserting individual vector {vector['id']}: {e2}")
-    
-    # Final progress save
-    progress['processed_records'] = processed_records
-    progress['total_embeddings'] = total_embeddings
-    save_progress(progress)
+    def delete_stale_chunks(record_ids):
+        """Delete the vectors of chunks that re-processed records no longer have"""
+        stale = []
+        for record_id in record_ids:
+            if record_id in chunk_counts:
+                current = set(chunk_ids(record_id, current_chunks[record_id]))
+                stale += [i for i in chunk_ids(record_id, chunk_counts[record_id]) if i not in current]
+        for start in range(0, len(stale), 1000):
+            index.delete(ids=stale[start:start + 1000])
+        return len(stale)
+    
+    # Changed records that no longer have any text to embed only lose their old vectors
+    emptied = [rec['id'] for rec in unprocessed_records if current_chunks[rec['id']] == 0]
+    if emptied:
+        deleted = delete_stale_chunks(emptied)
+        checkpoints.append({record_id: current_hashes[record_id] for record_id in emptied}, 0,
+                           {record_id: 0 for record_id in emptied})
+        processed_records.update(emptied)
+        print(f'Skipped {len(emptied)} records without text ({deleted} old vectors deleted)')
+    
+    def on_upserted(completed_records, n_vectors):
+        processed_records.update(completed_records)
+        # New vectors are in place; drop the old ones of chunks that no longer exist
+        delete_stale_chunks(completed_records)
+        # O(batch) append to the checkpoint journal
+        checkpoints.append({record_id: current_hashes[record_id] for record_id in completed_records}, n_vectors,
+                           {record_id: current_chunks[record_id] for record_id in completed_records})
+        chunk_counts.update((record_id, current_chunks[record_id]) for record_id in completed_records)
+    
+    # Chunks are packed into multi-input embedding requests that run concurrently,
+    # with upserts overlapping the next batches (see embedding_pipeline.py).
+    # Chunks whose text is already in the embedding store reuse the stored vector.
+    store = EmbeddingStore()
+    try:
+        with tqdm(desc='Embedding and upserting', unit='chunk') as bar:
+            stats = run_pipeline(
+                iter_embedding_items(unprocessed_records), index, get_openai_client(), EMBEDDING_MODEL,
+                upsert_batch_size=BATCH_SIZE, on_upserted=on_upserted, progress=bar, store=store
+            )
+    finally:
+        store.close()
+    print(f"Embedding requests: {stats['embed_requests']}, retries: {stats['retries']}, "
+          f"failed chunks: {stats['failed']}, reused from store: {stats['cached']}")
     
     print(f'\nEmbedding and upsert complete.')
-    print(f'Total embeddings created: {total_embeddings}')
+    print(f'Total embeddings created: {checkpoints.total_embeddings}')
     print(f'Records processed: {len(processed_records)}')
-    print(f'Index: {PINECONE_INDEX}')
+    print(f'Index: {LOCAL_INDEX_DIR if RETRIEVER_BACKEND == "local" else PINECONE_INDEX}')
     print(f'Model: {EMBEDDING_MODEL}')
-    print(f'Progress saved to: {PROGRESS_FILE}')
+    print(f'Progress saved to: {CHECKPOINT_FILE}')
 
 if __name__ == '__main__':
-    main() 
\ No newline at end of file
+    try:
+        main()
+    finally:
+        if RETRIEVER_BACKEND == 'local':
+            # Persist whatever was embedded, so an interrupted run can resume
+            index.save()
+            print(f'Local index written to {LOCAL_INDEX_DIR} ({len(index)} vectors)') 
\ No newline at end of file
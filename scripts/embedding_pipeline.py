@@ -0,0 +1,227 @@
+"""
+Batched, concurrent embedding and upsert engine for ingestion.
+
+Instead of one embeddings request per chunk, chunks are packed into
+requests up to a token budget, several requests are kept in flight at
+once, and upserts run on their own workers so they overlap with the next
+embedding batches. Rate-limit and transient errors are retried with
+exponential backoff and full jitter (honouring ``Retry-After``). With an
+``EmbeddingStore``, chunks whose text was embedded before skip the API.
+
+Configuration (environment variables):
+    EMBED_BATCH_TOKENS      estimated tokens per embeddings request (default 60000)
+    EMBED_BATCH_MAX_INPUTS  max inputs per embeddings request (default 512, API limit 2048)
+    EMBED_CONCURRENCY       embeddings requests in flight (default 8)
+    UPSERT_CONCURRENCY      upsert requests in flight (default 4)
+    EMBED_MAX_RETRIES       retries per embeddings request (default 6)
+"""
+
+import os
+import random
+import threading
+import time
+from collections import deque, defaultdict
+from concurrent.futures import ThreadPoolExecutor
+import openai
+from embedding_store import content_key, LOOKUP_CHUNK
+
+EMBED_BATCH_TOKENS = int(os.getenv('EMBED_BATCH_TOKENS', '60000'))
+EMBED_BATCH_MAX_INPUTS = int(os.getenv('EMBED_BATCH_MAX_INPUTS', '512'))
+EMBED_CONCURRENCY = int(os.getenv('EMBED_CONCURRENCY', '8'))
+UPSERT_CONCURRENCY = int(os.getenv('UPSERT_CONCURRENCY', '4'))
+EMBED_MAX_RETRIES = int(os.getenv('EMBED_MAX_RETRIES', '6'))
+BACKOFF_BASE = 1.0
+BACKOFF_CAP = 60.0
+
+RETRYABLE_ERRORS = (
+    openai.RateLimitError,
+    openai.APITimeoutError,
+    openai.APIConnectionError,
+    openai.InternalServerError,
+)
+
+def estimate_tokens(text):
+    """Cheap upper-leaning token estimate for batch packing.
+
+    English averages ~4 characters per token; Devanagari is close to one
+    token per character, so non-ASCII characters are counted one each.
+    """
+    n_ascii = len(text.encode('ascii', 'ignore'))
+    return n_ascii // 4 + (len(text) - n_ascii) + 1
+
+def pack_batches(items, max_tokens=EMBED_BATCH_TOKENS, max_inputs=EMBED_BATCH_MAX_INPUTS):
+    """Group items (dicts with a 'text' key) into batches within the token and input limits"""
+    batch = []
+    batch_tokens = 0
+    for item in items:
+        tokens = estimate_tokens(item['text'])
+        if batch and (batch_tokens + tokens > max_tokens or len(batch) >= max_inputs):
+            yield batch
+            batch = []
+            batch_tokens = 0
+        batch.append(item)
+        batch_tokens += tokens
+    if batch:
+        yield batch
+
+def _retry_after(error):
+    response = getattr(error, 'response', None)
+    if response is None:
+        return None
+    try:
+        return float(response.headers.get('retry-after'))
+    except (TypeError, ValueError):
+        return None
+
+def embed_batch(client, model, texts, max_retries=EMBED_MAX_RETRIES, on_retry=None):
+    """Embed a list of texts in one request, retrying transient failures with backoff.
+
+    on_retry(), if given, is called before each retry, on the calling worker thread.
+    """
+    for attempt in range(max_retries + 1):
+        try:
+            response = client.embeddings.create(model=model, input=texts, encoding_format='float')
+            ordered = sorted(response.data, key=lambda d: d.index)
+            return [d.embedding for d in ordered]
+        except RETRYABLE_ERRORS as e:
+            if attempt == max_retries:
+                raise
+            if on_retry is not None:
+                on_retry()
+            # Full jitter keeps concurrent workers from retrying in lockstep
+            delay = random.uniform(0, min(BACKOFF_CAP, BACKOFF_BASE * 2 ** attempt))
+            time.sleep(max(delay, _retry_after(e) or 0))
+
+def upsert_vectors(index, vectors):
+    """Upsert a batch, falling back to one-by-one; return the vectors that were stored"""
+    try:
+        index.upsert(vectors=vectors)
+        return vectors
+    except Exception as e:
+        print(f"Error upserting batch: {e}")
+    stored = []
+    for vector in vectors:
+        try:
+            index.upsert(vectors=[vector])
+            stored.append(vector)
+        except Exception as e2:
+            print(f"Error upserting individual vector {vector['id']}: {e2}")
+    return stored
+
+def run_pipeline(items, index, client, model, upsert_batch_size=10,
+                 embed_concurrency=EMBED_CONCURRENCY, upsert_concurrency=UPSERT_CONCURRENCY,
+                 batch_tokens=EMBED_BATCH_TOKENS, batch_max_inputs=EMBED_BATCH_MAX_INPUTS,
+                 on_upserted=None, progress=None, store=None):
+    """Embed and upsert items, overlapping embedding requests and upserts.
+
+    items are dicts with 'id', 'text', 'metadata', 'record_id' and 'total_chunks'.
+    on_upserted(completed_record_ids, n_vectors) is called from the calling
+    thread after each upsert batch; a record counts as completed once all of
+    its chunks are stored. progress, if given, is a tqdm-like object advanced
+    by the number of vectors embedded or reused. store, if given, is an
+    EmbeddingStore consulted before and filled after each embeddings request.
+    """
+    stats = {'vectors': 0, 'embed_requests': 0, 'retries': 0, 'failed': 0, 'cached': 0}
+    # Retries are counted on the embedding workers; everything else on this thread
+    retries_lock = threading.Lock()
+    # Retries are handled here with jittered backoff rather than by the SDK
+    client = client.with_options(max_retries=0)
+    stored_chunks = defaultdict(int)
+    embed_window = deque()
+    upsert_window = deque()
+    max_embed_window = embed_concurrency * 2
+    max_upsert_window = upsert_concurrency * 2
+
+    def count_retry():
+        with retries_lock:
+            stats['retries'] += 1
+
+    def drain_upserts(block):
+        while upsert_window and (block or upsert_window[0].done()):
+            stored = upsert_window.popleft().result()
+            completed = []
+            for vector in stored:
+                record_id = vector['record_id']
+                stored_chunks[record_id] += 1
+                if stored_chunks[record_id] == vector['total_chunks']:
+                    completed.append(record_id)
+                    del stored_chunks[record_id]
+            stats['vectors'] += len(stored)
+            if on_upserted:
+                on_upserted(completed, len(stored))
+            if block and len(upsert_window) < max_upsert_window:
+                break
+
+    def collect_embeddings():
+        batch, future = embed_window.popleft()
+        stats['embed_requests'] += 1
+        try:
+            embeddings = future.result()
+        except Exception as e:
+            print(f'Embedding error for {len(batch)} chunks (will retry on the next run): {e}')
+            stats['failed'] += len(batch)
+            return
+        if store is not None:
+            store.put_many(((item['key'], embedding) for item, embedding in zip(batch, embeddings)), model)
+        submit_upserts(batch, embeddings)
+
+    def submit_upserts(batch, embeddings):
+        if progress is not None:
+            progress.update(len(batch))
+        vectors = [
+            {'id': item['id'], 'values': embedding, 'metadata': item['metadata']}
+            for item, embedding in zip(batch, embeddings)
+        ]
+        for start in range(0, len(vectors), upsert_batch_size):
+            chunk = vectors[start:start + upsert_batch_size]
+            chunk_items = batch[start:start + upsert_batch_size]
+            upsert_window.append(upsert_pool.submit(_upsert_tagged, index, chunk, chunk_items))
+            if len(upsert_window) >= max_upsert_window:
+                drain_upserts(block=True)
+        drain_upserts(block=False)
+
+    def uncached(items):
+        """Pass through items that need embedding; upsert the rest from the store"""
+        if store is None:
+            yield from items
+            return
+        group = []
+        for item in items:
+            item['key'] = content_key(item['text'], model)
+            group.append(item)
+            if len(group) < LOOKUP_CHUNK:
+                continue
+            yield from split_group(group)
+            group = []
+        yield from split_group(group)
+
+    def split_group(group):
+        found = store.get_many(item['key'] for item in group)
+        hits = [item for item in group if item['key'] in found]
+        if hits:
+            stats['cached'] += len(hits)
+            submit_upserts(hits, [found[item['key']] for item in hits])
+        for item in group:
+            if item['key'] not in found:
+                yield item
+
+    with ThreadPoolExecutor(embed_concurrency) as embed_pool, ThreadPoolExecutor(upsert_concurrency) as upsert_pool:
+        for batch in pack_batches(uncached(items), batch_tokens, batch_max_inputs):
+            texts = [item['text'] for item in batch]
+            embed_window.append((batch, embed_pool.submit(embed_batch, client, model, texts, EMBED_MAX_RETRIES, count_retry)))
+            # Bound the work in flight; results are consumed in submission order
+            while len(embed_window) >= max_embed_window or (embed_window and embed_window[0][1].done()):
+                collect_embeddings()
+        while embed_window:
+            collect_embeddings()
+        while upsert_window:
+            drain_upserts(block=True)
+    return stats
+
+def _upsert_tagged(index, vectors, items):
+    """Upsert vectors and return them tagged with their record for progress tracking"""
+    stored_ids = {vector['id'] for vector in upsert_vectors(index, vectors)}
+    return [
+        {'id': item['id'], 'record_id': item['record_id'], 'total_chunks': item['total_chunks']}
+        for item in items if item['id'] in stored_ids
+    ]
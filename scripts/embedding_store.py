@@ -0,0 +1,75 @@
+"""
+Persistent content-addressed embedding cache for ingestion.
+
+Vectors are keyed by a SHA-256 of (embedding model, chunk text), so
+re-ingesting the corpus only sends new or edited text to the embeddings
+API; unchanged chunks reuse their stored vectors. The store is a single
+SQLite file (WAL mode) holding float32 blobs.
+
+Configuration (environment variables):
+    EMBEDDING_STORE_PATH   SQLite file (default data/embedding_store.sqlite3)
+"""
+
+import hashlib
+import os
+import sqlite3
+import numpy as np
+
+EMBEDDING_STORE_PATH = os.getenv('EMBEDDING_STORE_PATH', 'data/embedding_store.sqlite3')
+# Stay under SQLite's bound-parameter limit in IN (...) lookups
+LOOKUP_CHUNK = 500
+
+def content_key(text, model):
+    """Stable cache key for a text embedded with a given model"""
+    return hashlib.sha256(f'{model}\0{text}'.encode('utf-8')).hexdigest()
+
+class EmbeddingStore:
+    """SQLite-backed map of content key -> float32 embedding"""
+
+    def __init__(self, path=EMBEDDING_STORE_PATH):
+        self.path = path
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self._conn = sqlite3.connect(path)
+        self._conn.execute('PRAGMA journal_mode=WAL')
+        self._conn.execute('PRAGMA synchronous=NORMAL')
+        self._conn.execute(
+            'CREATE TABLE IF NOT EXISTS embeddings ('
+            ' key TEXT PRIMARY KEY,'
+            ' model TEXT NOT NULL,'
+            ' dim INTEGER NOT NULL,'
+            ' vector BLOB NOT NULL)'
+        )
+        self._conn.commit()
+
+    def __len__(self):
+        return self._conn.execute('SELECT COUNT(*) FROM embeddings').fetchone()[0]
+
+    def get_many(self, keys):
+        """Return {key: embedding list} for the keys that are stored"""
+        found = {}
+        keys = list(keys)
+        for start in range(0, len(keys), LOOKUP_CHUNK):
+            chunk = keys[start:start + LOOKUP_CHUNK]
+            placeholders = ','.join('?' * len(chunk))
+            rows = self._conn.execute(
+                f'SELECT key, vector FROM embeddings WHERE key IN ({placeholders})', chunk
+            )
+            for key, blob in rows:
+                found[key] = np.frombuffer(blob, dtype=np.float32).tolist()
+        return found
+
+    def put_many(self, entries, model):
+        """Store (key, embedding) pairs in one transaction"""
+        rows = []
+        for key, embedding in entries:
+            vector = np.asarray(embedding, dtype=np.float32)
+            rows.append((key, model, vector.shape[0], vector.tobytes()))
+        with self._conn:
+            self._conn.executemany(
+                'INSERT OR REPLACE INTO embeddings (key, model, dim, vector) VALUES (?, ?, ?, ?)', rows
+            )
+
+    def close(self):
+        self._conn.close()
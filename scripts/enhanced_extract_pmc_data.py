@@ -1,12 +1,19 @@
 import os
 import re
 import json
+import time
+import random
+import asyncio
+import argparse
 import requests
 from tqdm import tqdm
 import urllib3
 import hashlib
 from urllib.parse import urlparse
-from collections import defaultdict
+from collections import defaultdict, deque
+from json.encoder import encode_basestring
+
+from http_cache import HttpCache, body_hash, conditional_headers
 
 # Suppress only the single InsecureRequestWarning from urllib3 needed.
 urllib3.disable_warnings(urllib3.exceptions.InsecureRequestWarning)
@@ -19,36 +26,128 @@ MR_LINKS = 'mr_links'
 OUT_ENG = 'data/pmc_data_en.jsonl'
 OUT_MR = 'data/pmc_data_mr.jsonl'
 
+# Crawler settings
+FETCH_TIMEOUT = 15
+MAX_RETRIES = 3
+BACKOFF_BASE = 0.5
+BACKOFF_CAP = 10.0
+BROKEN_STATUS_CODES = (404, 410, 500, 502, 503, 504)
+
+# Async crawler defaults: total in-flight requests, per-host limit and how
+# far ahead of the slowest pending URL fetches may run
+ASYNC_CONCURRENCY = 32
+ASYNC_PER_HOST = 8
+ASYNC_WINDOW_FACTOR = 4
+
+# Values clean_obj drops
+EMPTY_VALUES = [None, '', [], {}]
+
 # Regex patterns for extraction
 PDF_PATTERN = re.compile(r'https?://[^\s]+\.pdf')
 PHONE_PATTERN = re.compile(r'\b(\+91[-\s]?)?[0]?[6789]\d{9}\b')
 MAP_PATTERN = re.compile(r'https?://(goo\.gl|maps\.google\.com|www\.google\.com/maps)[^\s]*')
 
+def backoff_delay(attempt, retry_after=None):
+    """Full-jitter exponential backoff before retrying, honouring Retry-After"""
+    delay = random.uniform(0, min(BACKOFF_CAP, BACKOFF_BASE * 2 ** attempt))
+    try:
+        return max(delay, min(BACKOFF_CAP, float(retry_after)))
+    except (TypeError, ValueError):
+        return delay
+
+class RequestBudget:
+    """Global cap on HTTP requests (retries included) for one crawl; None means unlimited"""
+
+    def __init__(self, max_requests=None):
+        self.remaining = max_requests
+        self.used = 0
+
+    def take(self):
+        if self.remaining is not None:
+            if self.remaining <= 0:
+                return False
+            self.remaining -= 1
+        self.used += 1
+        return True
+
 class LinkProcessor:
-    def __init__(self, lang):
+    def __init__(self, lang, cache=None):
         self.lang = lang
+        self.cache = cache
+        # Validators of the responses cached by earlier runs
+        self.cache_entries = cache.validators(lang) if cache is not None else {}
+        self.reused_urls = set()
         self.success_links = []
         self.failed_links = []
         self.broken_links = []
         self.duplicate_links = []
         self.processed_content_hashes = set()
-        self.url_content_map = defaultdict(list)
+        # JSONL stream each successful URL's items are written to as soon as it completes
+        self.out = None
         
     def clean_obj(self, obj):
-        """Recursive cleaner for null/empty values"""
-        if isinstance(obj, dict):
-            return {k: self.clean_obj(v) for k, v in obj.items() 
-                   if v not in [None, '', [], {}] and self.clean_obj(v) not in [None, '', [], {}]}
-        elif isinstance(obj, list):
-            return [self.clean_obj(v) for v in obj 
-                   if v not in [None, '', [], {}] and self.clean_obj(v) not in [None, '', [], {}]]
-        else:
+        """Drop null/empty values, and containers left empty by that, at any depth.
+
+        Single pass over an explicit stack: each node is visited once and deep
+        payloads cannot hit the recursion limit. A container is attached to
+        its parent only once it is finished and known to be non-empty, which
+        keeps the key order of a recursive dict/list comprehension.
+        """
+        if not isinstance(obj, (dict, list)):
             return obj
+        root = {} if isinstance(obj, dict) else []
+        entries = iter(obj.items()) if isinstance(obj, dict) else enumerate(obj)
+        stack = [(entries, root, None, None)]
+        while stack:
+            entries, out, parent, key = stack[-1]
+            for k, v in entries:
+                if v in EMPTY_VALUES:
+                    continue
+                if isinstance(v, dict):
+                    stack.append((iter(v.items()), {}, out, k))
+                    break
+                if isinstance(v, list):
+                    stack.append((enumerate(v), [], out, k))
+                    break
+                if isinstance(out, dict):
+                    out[k] = v
+                else:
+                    out.append(v)
+            else:
+                stack.pop()
+                if parent is not None and out:
+                    if isinstance(parent, dict):
+                        parent[key] = out
+                    else:
+                        parent.append(out)
+        return root
+
+    def iter_text_tokens(self, obj):
+        """Keys, strings and numbers of a JSON object in json.dumps order, as dumped.
+
+        Strings keep their JSON escapes, so the patterns see exactly what they
+        saw in the serialized text; there they were always separated by
+        whitespace or quotes, so matching tokens joined by spaces finds the
+        same matches without serializing the whole object.
+        """
+        stack = [obj]
+        while stack:
+            value = stack.pop()
+            if isinstance(value, str):
+                yield encode_basestring(value)[1:-1]
+            elif isinstance(value, dict):
+                for k, v in reversed(list(value.items())):
+                    stack.append(v)
+                    stack.append(k if isinstance(k, str) else json.dumps(k))
+            elif isinstance(value, list):
+                stack.extend(reversed(value))
+            elif isinstance(value, (int, float)) and not isinstance(value, bool):
+                yield json.dumps(value)
 
     def extract_fields(self, obj):
         """Helper to extract fields from JSON"""
         cleaned = self.clean_obj(obj)
-        text = json.dumps(cleaned, ensure_ascii=False)
+        text = ' '.join(self.iter_text_tokens(cleaned))
         pdfs = list(set(PDF_PATTERN.findall(text)))
         phones = list(set(PHONE_PATTERN.findall(text)))
         maps = list(set(MAP_PATTERN.findall(text)))
@@ -71,7 +170,7 @@ class LinkProcessor:
 
     def is_broken_link(self, url, response):
         """Check if link is broken (404, 500, etc.)"""
-        if response.status_code in [404, 410, 500, 502, 503, 504]:
+        if response.status_code in BROKEN_STATUS_CODES:
             return True
         return False
 
@@ -81,50 +180,158 @@ class LinkProcessor:
             return True
         return False
 
-    def process_single_url(self, url, max_retries=3):
-        """Process a single URL and categorize it"""
+    def check_cached(self, url, status, headers, body):
+        """Validators of a response and whether it matches the cached copy (304 or same body)"""
+        if self.cache is None:
+            return False, None
+        cached = self.cache_entries.get(url)
+        info = {'etag': headers.get('ETag'), 'last_modified': headers.get('Last-Modified')}
+        if cached and status == 304:
+            info['etag'] = info['etag'] or cached['etag']
+            info['last_modified'] = info['last_modified'] or cached['last_modified']
+            info['body_hash'] = cached['body_hash']
+            return True, info
+        info['body_hash'] = body_hash(body)
+        return bool(cached) and info['body_hash'] == cached['body_hash'], info
+
+    def fetch_url(self, url, max_retries=MAX_RETRIES):
+        """Fetch a URL: (outcome, data, response info) with outcome one of
+        'ok', 'unchanged' (matches the cache), 'broken' or 'failed'"""
+        headers = conditional_headers(self.cache_entries.get(url))
         for attempt in range(max_retries):
             try:
-                resp = requests.get(url, timeout=15, verify=False)
+                resp = requests.get(url, timeout=FETCH_TIMEOUT, verify=False, headers=headers)
                 
                 # Check if link is broken
                 if self.is_broken_link(url, resp):
-                    self.broken_links.append(url)
-                    return 'broken'
+                    return 'broken', None, None
                 
                 resp.raise_for_status()
-                data = resp.json()
-                
-                # Generate content hash
-                content_hash = self.get_content_hash(data, url)
-                
-                # Check for duplicates
-                if self.is_duplicate_content(content_hash, url):
-                    self.duplicate_links.append(url)
-                    return 'duplicate'
-                
-                # Process successful data
-                self.processed_content_hashes.add(content_hash)
-                self.url_content_map[url] = data
-                self.success_links.append(url)
-                return 'success'
+                unchanged, info = self.check_cached(url, resp.status_code, resp.headers, resp.content)
+                if unchanged:
+                    return 'unchanged', None, info
+                return 'ok', resp.json(), info
                 
             except requests.exceptions.RequestException as e:
                 if attempt == max_retries - 1:
-                    self.failed_links.append(url)
-                    return 'failed'
-                continue
+                    return 'failed', None, None
+                response = getattr(e, 'response', None)
+                retry_after = response.headers.get('Retry-After') if response is not None else None
+                time.sleep(backoff_delay(attempt, retry_after))
             except (json.JSONDecodeError, ValueError) as e:
                 # Invalid JSON response
-                self.failed_links.append(url)
-                return 'failed'
+                return 'failed', None, None
             except Exception as e:
                 if attempt == max_retries - 1:
-                    self.failed_links.append(url)
-                    return 'failed'
-                continue
+                    return 'failed', None, None
+                time.sleep(backoff_delay(attempt))
+        return 'failed', None, None
 
-    def process_links(self, input_file, output_file):
+    def categorize(self, url, outcome, data, info=None):
+        """Record a fetch outcome as success/failed/broken/duplicate"""
+        if outcome == 'broken':
+            self.broken_links.append(url)
+            return 'broken'
+        if outcome not in ('ok', 'unchanged'):
+            self.failed_links.append(url)
+            return 'failed'
+        
+        # Generate content hash (known already when the cached copy is still current)
+        if outcome == 'unchanged':
+            content_hash = self.cache_entries[url]['content_hash']
+        else:
+            content_hash = self.get_content_hash(data, url)
+        
+        # Check for duplicates
+        if self.is_duplicate_content(content_hash, url):
+            self.duplicate_links.append(url)
+            return 'duplicate'
+        
+        # Process successful data
+        self.processed_content_hashes.add(content_hash)
+        if outcome == 'unchanged':
+            self.reused_urls.add(url)
+        if info is not None:
+            info['content_hash'] = content_hash
+        if self.out is not None:
+            self.write_url_data(url, data, info)
+        self.success_links.append(url)
+        return 'success'
+
+    def process_single_url(self, url, max_retries=MAX_RETRIES):
+        """Process a single URL and categorize it"""
+        return self.categorize(url, *self.fetch_url(url, max_retries))
+
+    async def fetch_url_async(self, session, url, host_slots, budget, max_retries=MAX_RETRIES):
+        """aiohttp version of fetch_url; each attempt holds one of the host's slots"""
+        import aiohttp
+
+        slots = host_slots[urlparse(url).netloc]
+        headers = conditional_headers(self.cache_entries.get(url))
+        for attempt in range(max_retries):
+            if not budget.take():
+                return 'failed', None, None
+            retry_after = None
+            try:
+                async with slots:
+                    async with session.get(url, headers=headers) as resp:
+                        if resp.status in BROKEN_STATUS_CODES:
+                            return 'broken', None, None
+                        retry_after = resp.headers.get('Retry-After')
+                        resp.raise_for_status()
+                        body = await resp.read()
+                unchanged, info = self.check_cached(url, resp.status, resp.headers, body)
+                if unchanged:
+                    return 'unchanged', None, info
+                return 'ok', json.loads(body), info
+            except (aiohttp.ClientError, asyncio.TimeoutError) as e:
+                if attempt == max_retries - 1:
+                    return 'failed', None, None
+            except (json.JSONDecodeError, ValueError) as e:
+                # Invalid JSON response
+                return 'failed', None, None
+            except Exception as e:
+                if attempt == max_retries - 1:
+                    return 'failed', None, None
+            await asyncio.sleep(backoff_delay(attempt, retry_after))
+        return 'failed', None, None
+
+    async def crawl_async(self, links, concurrency=ASYNC_CONCURRENCY, per_host=ASYNC_PER_HOST,
+                          max_requests=None, max_retries=MAX_RETRIES, timeout=FETCH_TIMEOUT):
+        """Fetch links concurrently over pooled keep-alive connections.
+
+        Results are categorized in input order, so which copy of repeated
+        content counts as the duplicate matches the serial crawler. At most
+        concurrency requests are in flight (per_host per host), and fetches
+        run at most a few windows ahead of the oldest pending URL.
+        Returns the budget, whose used attribute counts HTTP requests sent.
+        """
+        import aiohttp
+
+        budget = RequestBudget(max_requests)
+        host_slots = defaultdict(lambda: asyncio.Semaphore(per_host))
+        in_flight = asyncio.Semaphore(concurrency)
+        window = max(1, concurrency * ASYNC_WINDOW_FACTOR)
+
+        async def fetch(session, url):
+            async with in_flight:
+                return await self.fetch_url_async(session, url, host_slots, budget, max_retries)
+
+        connector = aiohttp.TCPConnector(limit=concurrency, limit_per_host=per_host, ssl=False)
+        async with aiohttp.ClientSession(connector=connector,
+                                         timeout=aiohttp.ClientTimeout(total=timeout)) as session:
+            pending = deque()
+            next_index = 0
+            with tqdm(total=len(links), desc=f'Processing {self.lang} links') as bar:
+                for url in links:
+                    while next_index < len(links) and len(pending) < window:
+                        pending.append(asyncio.ensure_future(fetch(session, links[next_index])))
+                        next_index += 1
+                    self.categorize(url, *await pending.popleft())
+                    bar.update(1)
+        return budget
+
+    def process_links(self, input_file, output_file, use_async=False, **crawl_options):
         """Process all links from input file"""
         print(f"\nProcessing {self.lang} links...")
         
@@ -134,12 +341,22 @@ class LinkProcessor:
         
         print(f"Total links to process: {len(links)}")
         
-        # Process each link
-        for url in tqdm(links, desc=f'Processing {self.lang} links'):
-            result = self.process_single_url(url)
-        
-        # Write successful data to JSONL file
-        self.write_successful_data(output_file)
+        # Successful data is appended to the JSONL file as each URL completes,
+        # so an interrupted run still leaves usable output
+        self.out = open(output_file, 'w', encoding='utf-8')
+        try:
+            if use_async:
+                budget = asyncio.run(self.crawl_async(links, **crawl_options))
+                print(f"HTTP requests sent: {budget.used}")
+            else:
+                # Process each link
+                for url in tqdm(links, desc=f'Processing {self.lang} links'):
+                    result = self.process_single_url(url)
+        finally:
+            self.out.close()
+            self.out = None
+            if self.cache is not None:
+                self.cache.commit()
         
         # Write categorized links to files
         self.write_categorized_links()
@@ -147,25 +364,41 @@ class LinkProcessor:
         # Print summary
         self.print_summary()
 
-    def write_successful_data(self, output_file):
-        """Write successful data to JSONL file"""
-        with open(output_file, 'w', encoding='utf-8') as out:
-            for url, data in self.url_content_map.items():
-                try:
-                    if isinstance(data, dict) and 'data' in data and isinstance(data['data'], list):
-                        # Handle nested data structure
-                        for item in data['data']:
-                            fields = self.extract_fields(item)
-                            fields['source_url'] = url
-                            fields['lang'] = self.lang
-                            out.write(json.dumps(fields, ensure_ascii=False) + '\n')
-                    else:
-                        fields = self.extract_fields(data)
-                        fields['source_url'] = url
-                        fields['lang'] = self.lang
-                        out.write(json.dumps(fields, ensure_ascii=False) + '\n')
-                except Exception as e:
-                    print(f"Error writing data for {url}: {e}")
+    def write_url_data(self, url, data, info=None):
+        """Append the extracted items of a successful URL to the output"""
+        out = self.out
+        if url in self.reused_urls:
+            # Unchanged since the last run: copy the lines extracted then
+            out.write(self.cache.output(url, self.lang))
+            out.flush()
+            cached = self.cache_entries[url]
+            if (info['etag'], info['last_modified']) != (cached['etag'], cached['last_modified']):
+                self.cache.update_validators(url, self.lang, info['etag'], info['last_modified'])
+            return
+        lines = []
+        try:
+            if isinstance(data, dict) and 'data' in data and isinstance(data['data'], list):
+                # Handle nested data structure
+                for item in data['data']:
+                    fields = self.extract_fields(item)
+                    fields['source_url'] = url
+                    fields['lang'] = self.lang
+                    lines.append(json.dumps(fields, ensure_ascii=False) + '\n')
+                    out.write(lines[-1])
+            else:
+                fields = self.extract_fields(data)
+                fields['source_url'] = url
+                fields['lang'] = self.lang
+                lines.append(json.dumps(fields, ensure_ascii=False) + '\n')
+                out.write(lines[-1])
+        except Exception as e:
+            print(f"Error writing data for {url}: {e}")
+            return
+        finally:
+            out.flush()
+        if self.cache is not None and info is not None:
+            self.cache.put(url, self.lang, info['etag'], info['last_modified'], info['body_hash'],
+                           info['content_hash'], ''.join(lines))
 
     def write_categorized_links(self):
         """Write categorized links to separate files"""
@@ -197,25 +430,50 @@ class LinkProcessor:
         print(f"❌ Failed links: {len(self.failed_links)} (see failed_links_{self.lang}.txt)")
         print(f"🔗 Broken links: {len(self.broken_links)} (see broken_links_{self.lang}.txt)")
         print(f"🔄 Duplicate links: {len(self.duplicate_links)} (see duplicate_links_{self.lang}.txt)")
+        if self.cache is not None:
+            print(f"♻️ Unchanged since last run (output reused): {len(self.reused_urls)}")
         print(f"📊 Success rate: {(len(self.success_links) / (len(self.success_links) + len(self.failed_links) + len(self.broken_links) + len(self.duplicate_links)) * 100):.1f}%")
 
 def main():
     """Main function to process both English and Marathi links"""
+    parser = argparse.ArgumentParser(description='Extract PMC data from the English and Marathi link lists')
+    parser.add_argument('--async', dest='use_async', action='store_true',
+                        help='Fetch links concurrently with aiohttp instead of one at a time')
+    parser.add_argument('--concurrency', type=int, default=ASYNC_CONCURRENCY,
+                        help='Maximum requests in flight (async mode)')
+    parser.add_argument('--per-host', type=int, default=ASYNC_PER_HOST,
+                        help='Maximum concurrent requests per host (async mode)')
+    parser.add_argument('--max-requests', type=int, default=None,
+                        help='Global budget of HTTP requests per link file, retries included (async mode); '
+                             'links left when it runs out are reported as failed')
+    parser.add_argument('--no-cache', action='store_true',
+                        help='Fetch and extract every link in full instead of sending conditional requests')
+    args = parser.parse_args()
+    crawl_options = {}
+    if args.use_async:
+        crawl_options = {'concurrency': args.concurrency, 'per_host': args.per_host,
+                         'max_requests': args.max_requests}
+
     print("🚀 Starting Enhanced PMC Data Extraction...")
     print("=" * 50)
     
     # Create data directory if it doesn't exist
     os.makedirs('data', exist_ok=True)
     
+    # Unchanged responses (304 or same body) reuse the output of the last run
+    cache = None if args.no_cache else HttpCache()
+    
     # Process English links
-    eng_processor = LinkProcessor('en')
-    eng_processor.process_links(ENG_LINKS, OUT_ENG)
+    eng_processor = LinkProcessor('en', cache)
+    eng_processor.process_links(ENG_LINKS, OUT_ENG, args.use_async, **crawl_options)
     
     print("\n" + "=" * 50)
     
     # Process Marathi links
-    mr_processor = LinkProcessor('mr')
-    mr_processor.process_links(MR_LINKS, OUT_MR)
+    mr_processor = LinkProcessor('mr', cache)
+    mr_processor.process_links(MR_LINKS, OUT_MR, args.use_async, **crawl_options)
+    if cache is not None:
+        cache.close()
     
     print("\n" + "=" * 50)
     print("🎉 Enhanced PMC Data Extraction Complete!")
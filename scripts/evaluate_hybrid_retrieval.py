@@ -0,0 +1,132 @@
+#!/usr/bin/env python3
+"""
+Evaluate the BM25 keyword index (and, when available, hybrid retrieval) on
+exact-match lookups.
+
+Builds chatbot/bm25_index.BM25Index from the normalized records and
+generates lookup queries from them: a record's title, the file name of its
+PDF, and phone numbers / long numbers (circular and order numbers)
+appearing in its text. Reports recall@k and MRR of the record each query
+was taken from, the index build time and the query latency.
+
+With --dense, queries are also embedded with the configured OpenAI model
+and searched in the configured vector backend (TOP_K matches, as the chat
+pipeline does), and the dense-only ranking is compared with the RRF fusion.
+That needs API keys or a local index built with real embeddings.
+
+Usage:
+    python scripts/evaluate_hybrid_retrieval.py
+    python scripts/evaluate_hybrid_retrieval.py --data data/pmc_data_normalized.jsonl --queries 500 --dense
+"""
+
+import argparse
+import json
+import os
+import random
+import re
+import sys
+import time
+
+sys.path.append(os.path.join(os.path.dirname(__file__), '..', 'chatbot'))
+from bm25_index import BM25Index, reciprocal_rank_fusion, record_key, HYBRID_CONTEXT_RESULTS
+from record_metadata import extract_text_for_embedding
+
+NUMBER_PATTERN = re.compile(r'\b\d{6,}\b')
+
+def load_records(path):
+    with open(path, 'r', encoding='utf-8') as f:
+        return [json.loads(line) for line in f if line.strip()]
+
+def lookup_queries(records, n, seed=0):
+    """(query, kind, target record id) triples for exact-match lookups"""
+    rng = random.Random(seed)
+    candidates = []
+    for rec in records:
+        if not rec.get('id'):
+            continue
+        if rec.get('title'):
+            candidates.append((rec['title'], 'title', rec['id']))
+        pdf_url = rec.get('pdf_url')
+        if isinstance(pdf_url, str) and pdf_url.lower().endswith('.pdf'):
+            name = os.path.splitext(os.path.basename(pdf_url))[0].replace('_', ' ').replace('-', ' ')
+            candidates.append((name, 'pdf', rec['id']))
+        for number in NUMBER_PATTERN.findall(extract_text_for_embedding(rec))[:2]:
+            candidates.append((number, 'number', rec['id']))
+    rng.shuffle(candidates)
+    return candidates[:n]
+
+def rank_of(ranking, target):
+    """1-based rank of the target record in a ranking, or None"""
+    rank = 0
+    seen = set()
+    for doc in ranking:
+        key = record_key(doc)
+        if key in seen:
+            continue
+        seen.add(key)
+        rank += 1
+        if key == target:
+            return rank
+    return None
+
+def report(label, ranks, k_values):
+    n = len(ranks)
+    cells = [f'R@{k} {sum(1 for r in ranks if r and r <= k) / n:5.1%}' for k in k_values]
+    mrr = sum(1.0 / r for r in ranks if r) / n
+    print(f'{label:<18} ' + ' | '.join(cells) + f' | MRR {mrr:.3f}')
+
+def main():
+    parser = argparse.ArgumentParser(description='Evaluate BM25 / hybrid retrieval on exact-match lookups')
+    parser.add_argument('--data', default='data/pmc_data_normalized.jsonl')
+    parser.add_argument('--queries', type=int, default=300)
+    parser.add_argument('--top-k', type=int, default=15)
+    parser.add_argument('--dense', action='store_true', help='Also evaluate dense-only vs fused rankings')
+    args = parser.parse_args()
+
+    if not os.path.exists(args.data):
+        print(f'{args.data} not found; run scripts/normalize_pmc_data.py first or pass --data')
+        return 1
+    records = load_records(args.data)
+    start = time.perf_counter()
+    bm25 = BM25Index.build(records)
+    build_time = time.perf_counter() - start
+    print(f'BM25 index: {len(bm25)} records, {len(bm25.postings)} terms, built in {build_time:.2f} s')
+
+    queries = lookup_queries(records, args.queries)
+    kinds = sorted({kind for _, kind, _ in queries})
+    print(f'{len(queries)} lookup queries: ' + ', '.join(
+        f'{kind}={sum(1 for q in queries if q[1] == kind)}' for kind in kinds))
+    print('-' * 84)
+
+    k_values = [1, HYBRID_CONTEXT_RESULTS, args.top_k]
+    latencies = []
+    keyword_results = []
+    for query, _, _ in queries:
+        start = time.perf_counter()
+        keyword_results.append(bm25.search(query, args.top_k))
+        latencies.append(time.perf_counter() - start)
+    for kind in kinds:
+        report(f'bm25 {kind}', [rank_of(res, target) for res, (_, k, target) in zip(keyword_results, queries)
+                                if k == kind], k_values)
+    report('bm25 all', [rank_of(res, target) for res, (_, _, target) in zip(keyword_results, queries)], k_values)
+    latencies.sort()
+    print(f'BM25 query latency: p50 {latencies[len(latencies) // 2] * 1000:.2f} ms, '
+          f'p99 {latencies[int(len(latencies) * 0.99)] * 1000:.2f} ms')
+
+    if args.dense:
+        from terminal_chatbot_openai_improved import embed_query, index, TOP_K
+        dense_ranks, fused_ranks = [], []
+        for (query, _, target), keyword in zip(queries, keyword_results):
+            embedding = embed_query(query)
+            if embedding is None:
+                continue
+            dense = index.query(vector=embedding, top_k=TOP_K, include_metadata=True).get('matches', [])
+            dense_ranks.append(rank_of(dense, target))
+            fused_ranks.append(rank_of(reciprocal_rank_fusion([dense, keyword]), target))
+        print('-' * 84)
+        report('dense only', dense_ranks, k_values)
+        report('hybrid (RRF)', fused_ranks, k_values)
+    return 0
+
+if __name__ == '__main__':
+    sys.exit(main())
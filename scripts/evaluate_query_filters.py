@@ -0,0 +1,213 @@
+#!/usr/bin/env python3
+"""
+Evaluate query-analysis filters (chatbot/query_analysis.py) on the chat retrieval path.
+
+Writes a temporary local index over the normalized records, embedded with
+hashed bag-of-words vectors (so similarity follows the shared words, with
+no API calls), and generates queries from records: the record type or
+department a record has, named the way a citizen would ("fire brigade",
+"electrical department"), plus a few words of its title. Each query runs
+through search_index + hybrid_rank of terminal_chatbot_openai_improved:
+
+    unfiltered   plain TOP_K search, fused with BM25, HYBRID_CONTEXT_RESULTS records
+    filtered     analyze_query's filter, FILTERED_TOP_K / FILTERED_CONTEXT_RESULTS
+
+and reports the share of context records that have the metadata the query
+names (precision), how often the source record reaches the context, the
+context size and the latency. First checks that the local index's value
+index returns the same rows as a scan for every generated filter, and that
+the async search (asearch_index) sends the unfiltered fallback query only
+when the filtered one returns fewer than FILTERED_CONTEXT_RESULTS matches.
+
+Exits with status 1 if the value index disagrees with the scan, if the
+async search queries the fallback when it is not needed (or skips it when
+it is), or if the filtered context is less precise than the unfiltered one.
+
+Usage:
+    python scripts/evaluate_query_filters.py
+    python scripts/evaluate_query_filters.py --data data/pmc_data_normalized.jsonl --queries 400
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import random
+import sys
+import tempfile
+import time
+import zlib
+
+import numpy as np
+
+sys.path.append(os.path.join(os.path.dirname(__file__), '..', 'chatbot'))
+import bm25_index
+from bm25_index import tokenize, record_key
+from local_index import LocalIndexWriter, matches_filter
+from record_metadata import filter_metadata, extract_text_for_embedding
+from query_analysis import GENERIC_VALUES, FILTERED_TOP_K, FILTERED_CONTEXT_RESULTS
+from intent_router import classify_query
+
+DIM = 512
+
+def hashed_embedding(text):
+    """Bag-of-words vector: each token adds +-1 to a hashed dimension"""
+    vector = np.zeros(DIM, dtype=np.float32)
+    for token in tokenize(text):
+        h = zlib.crc32(token.encode('utf-8'))
+        vector[h % DIM] += 1.0 if (h >> 16) & 1 else -1.0
+    return vector
+
+def build_index(records, path):
+    writer = LocalIndexWriter(path)
+    writer.upsert([
+        {'id': rec['id'], 'values': hashed_embedding(extract_text_for_embedding(rec)), 'metadata': filter_metadata(rec)}
+        for rec in records if rec.get('id')
+    ])
+    writer.save()
+
+def generate_queries(records, vocabulary, n, seed=0):
+    """(query, source record id) pairs naming the record's type or department"""
+    rng = random.Random(seed)
+    candidates = []
+    for rec in records:
+        title_words = [w for w in (rec.get('title') or '').lower().split() if w.isalpha()]
+        if not rec.get('id') or len(title_words) < 2:
+            continue
+        for field in ('record_type', 'department'):
+            value = rec.get(field)
+            if not value or (field, value) not in vocabulary.values or value.lower() in GENERIC_VALUES:
+                continue
+            name = value.replace('_', ' ').lower()
+            if field == 'department':
+                name = rng.choice([name, name.replace(' department', '')])
+            words = [w for w in title_words if w not in name][:3]
+            candidates.append((f'{name} {" ".join(words)}', rec['id']))
+    rng.shuffle(candidates)
+    return candidates[:n]
+
+def check_value_index(index, filters):
+    """Filters on which the value index and a full scan disagree"""
+    wrong = []
+    for f in filters:
+        expected = [row for row in range(len(index)) if matches_filter(index.metadata[row], f)]
+        if index.filter_rows(f).tolist() != expected:
+            wrong.append(f)
+    return wrong
+
+class CountingAsyncIndex:
+    """Async index wrapper that counts the queries sent to it"""
+
+    def __init__(self, async_index):
+        self.async_index = async_index
+        self.queries = 0
+
+    async def query(self, **kwargs):
+        self.queries += 1
+        return await self.async_index.query(**kwargs)
+
+    async def close(self):
+        await self.async_index.close()
+
+def check_fallback_queries(chat, analyzed):
+    """(vector queries sent, filtered queries whose query count was wrong) for asearch_index"""
+    counting = CountingAsyncIndex(chat.get_async_index())
+    chat._async_index = counting
+
+    async def run():
+        sent = wrong = 0
+        for query, _, named in analyzed:
+            if named is None:
+                continue
+            query_emb = hashed_embedding(query)
+            intent = classify_query(query)
+            query_filter = chat.analyze_query(query, intent)
+            if query_filter is None:
+                continue
+            filtered = chat.index.query(vector=query_emb, top_k=FILTERED_TOP_K, filter=query_filter)['matches']
+            expected = 1 if len(filtered) >= FILTERED_CONTEXT_RESULTS else 2
+            before = counting.queries
+            await chat.asearch_index(query_emb, intent, query_filter)
+            sent += counting.queries - before
+            wrong += counting.queries - before != expected
+        return sent, wrong
+
+    try:
+        return asyncio.run(run())
+    finally:
+        chat._async_index = None
+
+def main():
+    parser = argparse.ArgumentParser(description='Evaluate query-analysis filters on the chat retrieval path')
+    parser.add_argument('--data', default='data/pmc_data_normalized.jsonl')
+    parser.add_argument('--queries', type=int, default=300)
+    args = parser.parse_args()
+
+    if not os.path.exists(args.data):
+        print(f'{args.data} not found; run scripts/normalize_pmc_data.py first or pass --data')
+        return 1
+    with open(args.data, 'r', encoding='utf-8') as f:
+        records = [json.loads(line) for line in f if line.strip()]
+
+    with tempfile.TemporaryDirectory() as tmp:
+        build_index(records, tmp)
+        os.environ.update({'RETRIEVER_BACKEND': 'local', 'LOCAL_INDEX_DIR': tmp})
+        bm25_index.BM25_DATA_FILE = args.data
+        stdout, sys.stdout = sys.stdout, open(os.devnull, 'w')
+        import terminal_chatbot_openai_improved as chat
+        vocabulary = chat.get_query_vocabulary()
+        sys.stdout = stdout
+
+        queries = generate_queries(records, vocabulary, args.queries)
+        analyzed = [(query, target, vocabulary.query_filter(query, classify_query(query).ward)) for query, target in queries]
+        filters = [f for _, _, f in analyzed if f is not None]
+        n_filtered = len(filters)
+        filters += [{'$and': [{'record_type': {'$in': ['circular', 'news']}}, {'date_epoch': {'$gte': 0}}]},
+                    {'record_type': {'$ne': 'circular'}}, {'lang': 'en'}]
+        wrong = check_value_index(chat.index, filters)
+        print(f'{len(chat.index)} rows; value index vs scan on {len(filters)} filters: {len(wrong)} mismatches')
+        for f in wrong[:5]:
+            print(f'MISMATCH {f}')
+        sent, wrong_fallbacks = check_fallback_queries(chat, analyzed)
+        print(f'async search: {sent} vector queries for {n_filtered} filtered queries; '
+              f'{wrong_fallbacks} with an unneeded or missing fallback query')
+
+        # The chat endpoints classify the query before analyze_query
+        wards = [(query, classify_query(query).ward) for query, _ in queries]
+        start = time.perf_counter()
+        for query, ward in wards:
+            vocabulary.query_filter(query, ward)
+        analyze_us = (time.perf_counter() - start) / len(queries) * 1e6
+        print(f'{len(queries)} queries, {n_filtered} with a filter; query analysis {analyze_us:.1f} us/query')
+        print('-' * 72)
+
+        results = {}
+        for label in ('unfiltered', 'filtered'):
+            precise = total = found = chars = 0
+            elapsed = 0.0
+            for query, target, named in analyzed:
+                if named is None:
+                    continue
+                query_emb = hashed_embedding(query)
+                intent = classify_query(query)
+                start = time.perf_counter()
+                query_filter = chat.analyze_query(query, intent) if label == 'filtered' else None
+                matches, search_filter = chat.search_index(query_emb, intent, query_filter)
+                docs, context_results = chat.hybrid_rank(query, matches, search_filter, query_filter)
+                context = docs[:context_results]
+                elapsed += time.perf_counter() - start
+                precise += sum(1 for d in context if matches_filter(d.metadata, named))
+                total += len(context)
+                found += any(record_key(d) == target for d in context)
+                chars += len(chat.format_pinecone_results(context))
+            n = n_filtered
+            results[label] = precise / total
+            print(f'{label:<11} precision {precise / total:6.1%} | source record in context {found / n:6.1%} | '
+                  f'{total / n:4.1f} records, {chars / n:7.0f} chars | {elapsed / n * 1000:6.2f} ms')
+    print('-' * 72)
+    failed = bool(wrong) or wrong_fallbacks > 0 or results['filtered'] < results['unfiltered']
+    print('OK' if not failed else 'FAILED')
+    return 1 if failed else 0
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,100 @@
+"""
+Persistent conditional-request cache for the PMC crawler.
+
+For every URL (per language) that produced output, stores the response
+validators (ETag, Last-Modified), a SHA-256 of the raw body, the content
+hash used for duplicate detection, and the JSONL lines extracted from it.
+The next crawl sends If-None-Match / If-Modified-Since; on 304, or on a
+200 whose body hashes the same, the stored lines are written as-is without
+parsing, hashing or re-extracting the payload. The store is a single SQLite
+file (WAL mode).
+
+Configuration (environment variables):
+    CRAWL_CACHE_PATH   SQLite file (default data/http_cache.sqlite3)
+"""
+
+import hashlib
+import os
+import sqlite3
+
+CRAWL_CACHE_PATH = os.getenv('CRAWL_CACHE_PATH', 'data/http_cache.sqlite3')
+
+def body_hash(body):
+    """Hash of a raw response body"""
+    return hashlib.sha256(body).hexdigest()
+
+class HttpCache:
+    """SQLite-backed map of (url, lang) -> validators, hashes and extracted output"""
+
+    def __init__(self, path=CRAWL_CACHE_PATH):
+        self.path = path
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self._conn = sqlite3.connect(path)
+        self._conn.execute('PRAGMA journal_mode=WAL')
+        self._conn.execute('PRAGMA synchronous=NORMAL')
+        self._conn.execute(
+            'CREATE TABLE IF NOT EXISTS responses ('
+            ' url TEXT NOT NULL,'
+            ' lang TEXT NOT NULL,'
+            ' etag TEXT,'
+            ' last_modified TEXT,'
+            ' body_hash TEXT NOT NULL,'
+            ' content_hash TEXT NOT NULL,'
+            ' output TEXT NOT NULL,'
+            ' PRIMARY KEY (url, lang))'
+        )
+        self._conn.commit()
+
+    def __len__(self):
+        return self._conn.execute('SELECT COUNT(*) FROM responses').fetchone()[0]
+
+    def validators(self, lang):
+        """{url: {'etag', 'last_modified', 'body_hash', 'content_hash'}} for a language"""
+        rows = self._conn.execute(
+            'SELECT url, etag, last_modified, body_hash, content_hash FROM responses WHERE lang = ?', (lang,)
+        )
+        return {
+            url: {'etag': etag, 'last_modified': last_modified, 'body_hash': bh, 'content_hash': ch}
+            for url, etag, last_modified, bh, ch in rows
+        }
+
+    def output(self, url, lang):
+        """The JSONL lines stored for a URL, or None"""
+        row = self._conn.execute(
+            'SELECT output FROM responses WHERE url = ? AND lang = ?', (url, lang)
+        ).fetchone()
+        return row[0] if row else None
+
+    def put(self, url, lang, etag, last_modified, body_hash, content_hash, output):
+        """Store a response; call commit() to make a batch of puts durable"""
+        self._conn.execute(
+            'INSERT OR REPLACE INTO responses (url, lang, etag, last_modified, body_hash, content_hash, output) '
+            'VALUES (?, ?, ?, ?, ?, ?, ?)',
+            (url, lang, etag, last_modified, body_hash, content_hash, output)
+        )
+
+    def update_validators(self, url, lang, etag, last_modified):
+        """Refresh the validators of an unchanged response"""
+        self._conn.execute(
+            'UPDATE responses SET etag = ?, last_modified = ? WHERE url = ? AND lang = ?',
+            (etag, last_modified, url, lang)
+        )
+
+    def commit(self):
+        self._conn.commit()
+
+    def close(self):
+        self._conn.commit()
+        self._conn.close()
+
+def conditional_headers(cached):
+    """Request headers that let the server answer 304 for a cached response"""
+    headers = {}
+    if cached:
+        if cached.get('etag'):
+            headers['If-None-Match'] = cached['etag']
+        if cached.get('last_modified'):
+            headers['If-Modified-Since'] = cached['last_modified']
+    return headers
@@ -0,0 +1,205 @@
+#!/usr/bin/env python3
+"""
+Load test: async /chat pipeline vs the previous blocking endpoint.
+
+Starts the local stub server (OpenAI + Pinecone) with realistic per-stage
+latencies, then serves two apps with uvicorn, each in its own process:
+
+  * baseline - a sync ``def`` endpoint doing the blocking embed, index.query
+               and chat completion calls, as /chat did before
+  * async    - the real ``chatbot_api_improved`` app
+
+and fires the same concurrent workload at each, reporting p50/p99 latency
+and requests per second. With --stream the async app is also driven through
+/chat/stream and the time to the first SSE token is reported.
+
+Usage:
+    python scripts/load_test_chat.py --requests 400 --concurrency 200
+    python scripts/load_test_chat.py --stream
+"""
+
+import argparse
+import asyncio
+import multiprocessing
+import os
+import socket
+import statistics
+import sys
+import time
+
+import httpx
+import uvicorn
+
+from stub_api_server import start_stub_server_process
+
+sys.path.append(os.path.join(os.path.dirname(__file__), '..', 'chatbot'))
+
+QUERIES = [
+    "What is the property tax due date?",
+    "Show me the latest circular",
+    "Ward office contact numbers for Kothrud",
+    "How do I apply for building permission?",
+]
+
+def percentile(values, pct):
+    ordered = sorted(values)
+    k = min(len(ordered) - 1, int(round(pct / 100.0 * (len(ordered) - 1))))
+    return ordered[k]
+
+def build_baseline_app():
+    """The pre-async /chat shape: a sync endpoint making blocking calls"""
+    from fastapi import FastAPI
+    from chatbot_api_improved import ChatRequest, ChatResponse
+    from terminal_chatbot_openai_improved import (
+        embed_query, index, TOP_K, CONTEXT_RESULTS, format_pinecone_results, build_llm_prompt
+    )
+    from openai_client import get_openai_client
+
+    app = FastAPI()
+
+    @app.post("/chat", response_model=ChatResponse)
+    def chat_endpoint(request: ChatRequest):
+        query_emb = embed_query(request.user_input)
+        results = index.query(vector=query_emb, top_k=TOP_K, include_metadata=True)
+        docs = results.get('matches', [])
+        prompt = build_llm_prompt(request.user_input, format_pinecone_results(docs[:CONTEXT_RESULTS]), [], 'en')
+        response = get_openai_client().chat.completions.create(
+            model="gpt-4o",
+            messages=[{"role": "user", "content": prompt}],
+            max_tokens=1024,
+            temperature=0.2
+        )
+        return ChatResponse(answer=response.choices[0].message.content.strip())
+
+    return app
+
+def _serve_app(label, port, env):
+    os.environ.update(env)
+    # The chat pipeline logs every prompt; keep the report readable
+    sys.stdout = open(os.devnull, 'w')
+    if label == 'baseline':
+        app = build_baseline_app()
+    else:
+        from chatbot_api_improved import app
+    uvicorn.run(app, host='127.0.0.1', port=port, log_level='warning')
+
+class AppServerProcess:
+    """Run one of the apps under uvicorn in a child process"""
+
+    def __init__(self, label, port, env):
+        self.process = multiprocessing.Process(target=_serve_app, args=(label, port, env), daemon=True)
+        self.port = port
+        self.url = f'http://127.0.0.1:{port}'
+
+    def __enter__(self):
+        self.process.start()
+        deadline = time.time() + 30
+        while time.time() < deadline:
+            try:
+                socket.create_connection(('127.0.0.1', self.port), timeout=0.2).close()
+                break
+            except OSError:
+                time.sleep(0.1)
+        return self
+
+    def __exit__(self, *exc):
+        self.process.terminate()
+        self.process.join()
+
+async def fire(url, n_requests, concurrency, first_token_latencies=None):
+    """Send n_requests chat requests with at most `concurrency` in flight.
+
+    When first_token_latencies is a list, requests go to /chat/stream and the
+    time to the first token event of each is appended to it.
+    """
+    semaphore = asyncio.Semaphore(concurrency)
+    latencies = []
+    errors = 0
+    limits = httpx.Limits(max_connections=concurrency, max_keepalive_connections=concurrency)
+    async with httpx.AsyncClient(limits=limits, timeout=300) as client:
+        async def one(i):
+            nonlocal errors
+            payload = {'user_input': QUERIES[i % len(QUERIES)]}
+            async with semaphore:
+                start = time.perf_counter()
+                try:
+                    if first_token_latencies is None:
+                        resp = await client.post(f'{url}/chat', json=payload)
+                        resp.raise_for_status()
+                    else:
+                        first_token = None
+                        async with client.stream('POST', f'{url}/chat/stream', json=payload) as resp:
+                            resp.raise_for_status()
+                            async for line in resp.aiter_lines():
+                                if first_token is None and line == 'event: token':
+                                    first_token = (time.perf_counter() - start) * 1000
+                        first_token_latencies.append(first_token)
+                    latencies.append((time.perf_counter() - start) * 1000)
+                except Exception:
+                    errors += 1
+
+        start = time.perf_counter()
+        await asyncio.gather(*(one(i) for i in range(n_requests)))
+        elapsed = time.perf_counter() - start
+    return latencies, errors, elapsed
+
+def report(label, latencies, errors, elapsed):
+    if not latencies:
+        print(f'{label:<10} all {errors} requests failed')
+        return
+    print(f'{label:<10} p50 {percentile(latencies, 50):8.1f} ms | p99 {percentile(latencies, 99):8.1f} ms | '
+          f'mean {statistics.mean(latencies):8.1f} ms | {len(latencies) / elapsed:7.1f} req/s | errors {errors}')
+
+def main():
+    parser = argparse.ArgumentParser(description='Load test the /chat endpoint against local stubs')
+    parser.add_argument('--requests', type=int, default=400)
+    parser.add_argument('--concurrency', type=int, default=200)
+    parser.add_argument('--embed-latency-ms', type=float, default=50)
+    parser.add_argument('--query-latency-ms', type=float, default=30)
+    parser.add_argument('--chat-latency-ms', type=float, default=3000)
+    parser.add_argument('--port', type=int, default=8765)
+    parser.add_argument('--stream', action='store_true', help='Also measure time to first token on /chat/stream')
+    args = parser.parse_args()
+
+    stub = start_stub_server_process(dim=256, route_latency={
+        '/embeddings': args.embed_latency_ms / 1000.0,
+        '/query': args.query_latency_ms / 1000.0,
+        '/chat/completions': args.chat_latency_ms / 1000.0,
+    })
+    env = {
+        'OPENAI_BASE_URL': stub.base_url,
+        'OPENAI_API_KEY': 'stub-key',
+        'PINECONE_API_KEY': 'stub-key',
+        'PINECONE_HOST': stub.host_url,
+        'OPENAI_POOL_SIZE': os.getenv('OPENAI_POOL_SIZE', str(max(100, args.concurrency))),
+    }
+
+    print(f'{args.requests} requests, concurrency {args.concurrency}; stub latency: embed {args.embed_latency_ms} ms, '
+          f'query {args.query_latency_ms} ms, chat {args.chat_latency_ms} ms')
+    print('-' * 96)
+
+    results = {}
+    for label in ['baseline', 'async']:
+        with AppServerProcess(label, args.port, env) as server:
+            results[label] = asyncio.run(fire(server.url, args.requests, args.concurrency))
+        report(label, *results[label])
+
+    if args.stream:
+        first_tokens = []
+        with AppServerProcess('async', args.port, env) as server:
+            results['stream'] = asyncio.run(fire(server.url, args.requests, args.concurrency, first_tokens))
+        report('stream', *results['stream'])
+        first_tokens = [t for t in first_tokens if t is not None]
+        if first_tokens:
+            print(f'{"":<10} time to first token: p50 {percentile(first_tokens, 50):8.1f} ms | '
+                  f'p99 {percentile(first_tokens, 99):8.1f} ms')
+
+    print('-' * 96)
+    base_rps = len(results['baseline'][0]) / results['baseline'][2]
+    async_rps = len(results['async'][0]) / results['async'][2]
+    if base_rps:
+        print(f'Throughput: {async_rps / base_rps:.1f}x the blocking endpoint')
+    stub.shutdown()
+
+if __name__ == '__main__':
+    main()
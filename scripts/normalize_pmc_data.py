@@ -1,11 +1,20 @@
 import os
+import sys
 import json
 import hashlib
 import re
+import argparse
+import tempfile
+from concurrent.futures import ProcessPoolExecutor
 from tqdm import tqdm
 from bs4 import BeautifulSoup
+from bs4.dammit import EntitySubstitution
+from html.parser import HTMLParser
 import html
 
+sys.path.append(os.path.join(os.path.dirname(__file__), '..', 'chatbot'))
+from record_metadata import record_date_fields
+
 # Enhanced type mapping for better classification
 RAW_TYPE_TO_MAIN_TYPE = {
     # Circulars, Notices, Orders
@@ -125,6 +134,73 @@ RAW_TYPE_TO_MAIN_TYPE = {
     'license': 'construction', 'License': 'construction',
 }
 
+_WHITESPACE = re.compile(r'\s+')
+
+class HTMLTextExtractor(HTMLParser):
+    """Streaming tag stripper producing the same text nodes as BeautifulSoup.
+    
+    BeautifulSoup's 'html.parser' builder is driven by this same stdlib
+    parser; this subclass skips building a tree and keeps only the strings
+    get_text() would return: character data split at every tag, comment,
+    declaration and processing instruction, CDATA included, script/style
+    content and non-text nodes left out.
+    """
+    
+    def __init__(self):
+        super().__init__(convert_charrefs=False)
+        self.strings = []
+        self._data = []
+        self._raw_text_tag = None
+    
+    def _end_string(self):
+        if self._data:
+            if self._raw_text_tag is None:
+                self.strings.append(''.join(self._data))
+            self._data = []
+    
+    def handle_data(self, data):
+        self._data.append(data)
+    
+    def handle_entityref(self, name):
+        # Unknown entities stay literal, as BeautifulSoup does
+        self._data.append(EntitySubstitution.HTML_ENTITY_TO_CHARACTER.get(name, '&' + name))
+    
+    def handle_starttag(self, tag, attrs):
+        self._end_string()
+        if tag in ('script', 'style'):
+            self._raw_text_tag = tag
+    
+    def handle_startendtag(self, tag, attrs):
+        self._end_string()
+    
+    def handle_endtag(self, tag):
+        self._end_string()
+        if tag == self._raw_text_tag:
+            self._raw_text_tag = None
+    
+    def unknown_decl(self, data):
+        self._end_string()
+        if data.upper().startswith('CDATA['):
+            self.strings.append(data[len('CDATA['):])
+    
+    def handle_comment(self, data):
+        self._end_string()
+    
+    def handle_decl(self, decl):
+        self._end_string()
+    
+    def handle_pi(self, data):
+        self._end_string()
+    
+    def close(self):
+        super().close()
+        self._end_string()
+
+def _needs_beautifulsoup(text):
+    """Markup the streaming extractor doesn't mirror exactly (rare in PMC data)."""
+    # Numeric references that survive html.unescape and template contents get special handling
+    return '&#' in text or '<template' in text.lower()
+
 def clean_html_text(text):
     """Clean HTML content and extract meaningful text."""
     if not text:
@@ -133,12 +209,19 @@ def clean_html_text(text):
     # Decode HTML entities
     text = html.unescape(text)
     
-    # Remove HTML tags
-    soup = BeautifulSoup(text, 'html.parser')
-    text = soup.get_text(separator=' ', strip=True)
+    # Remove HTML tags; plain strings (most fields) need no parsing at all
+    if '<' in text or '&' in text:
+        if _needs_beautifulsoup(text):
+            soup = BeautifulSoup(text, 'html.parser')
+            text = soup.get_text(separator=' ', strip=True)
+        else:
+            parser = HTMLTextExtractor()
+            parser.feed(text)
+            parser.close()
+            text = ' '.join(s for s in (string.strip() for string in parser.strings) if s)
     
     # Clean up whitespace
-    text = re.sub(r'\s+', ' ', text)
+    text = _WHITESPACE.sub(' ', text)
     text = text.strip()
     
     return text
@@ -219,8 +302,86 @@ def extract_all_text_content(record):
     
     return "\n".join(text_parts)
 
-def map_to_main_type(record, source_url=None):
-    """Enhanced type mapping with better pattern matching."""
+# Keywords checked against the title (and, as a last resort, the full content)
+# when no RAW_TYPE_TO_MAIN_TYPE key matches; earlier entries take priority
+KEYWORDS_MAPPING = {
+    'circular': ['circular', 'notice', 'order', 'notification'],
+    'department': ['department', 'contact', 'officer', 'directory'],
+    'project': ['project', 'development', 'infrastructure', 'construction'],
+    'event': ['event', 'competition', 'exhibition', 'program', 'campaign'],
+    'news': ['news', 'update', 'press', 'announcement'],
+    'hospital': ['hospital', 'medical', 'health', 'clinic', 'blood bank'],
+    'school': ['school', 'education', 'academy', 'college'],
+    'service': ['service', 'online', 'application', 'portal', 'digital'],
+    'tax': ['tax', 'property tax', 'revenue', 'payment', 'bill'],
+    'utility': ['water', 'electricity', 'supply', 'utility'],
+    'waste': ['waste', 'garbage', 'sanitation', 'cleaning', 'plastic'],
+    'transport': ['transport', 'traffic', 'bus', 'parking'],
+    'construction': ['building', 'construction', 'permit', 'license'],
+}
+
+def _trie_pattern(words):
+    """Regex matching the longest of `words` at a position, built as a character trie."""
+    trie = {}
+    for word in words:
+        node = trie
+        for ch in word:
+            node = node.setdefault(ch, {})
+        node[''] = True
+    
+    def build(node):
+        terminal = '' in node
+        branches = [re.escape(ch) + build(child) for ch, child in sorted(node.items()) if ch]
+        if not branches:
+            return ''
+        body = branches[0] if len(branches) == 1 else '(?:' + '|'.join(branches) + ')'
+        # Greedy optional group: prefer the longer word, fall back to the one ending here
+        return f'(?:{body})?' if terminal else body
+    
+    return build(trie)
+
+class KeywordClassifier:
+    """Substring classifier equivalent to trying (keyword, type) pairs in order.
+    
+    Returns the type of the first pair whose lowercased keyword occurs anywhere
+    in the text, using one regex pass instead of a substring scan per keyword.
+    """
+    
+    def __init__(self, pairs):
+        priority = {}
+        for rank, (keyword, main_type) in enumerate(pairs):
+            priority.setdefault(keyword.lower(), (rank, main_type))
+        # The regex reports the longest keyword starting at each position; every
+        # shorter keyword matching there is a prefix of it, so fold their ranks in
+        self._best = {
+            keyword: min(value for other, value in priority.items() if keyword.startswith(other))
+            for keyword in priority
+        }
+        self._pattern = re.compile('(?=(' + _trie_pattern(priority) + '))')
+    
+    def classify(self, text_lower):
+        """Type for already-lowercased text, or None when no keyword occurs."""
+        best = None
+        for match in self._pattern.finditer(text_lower):
+            candidate = self._best[match.group(1)]
+            if best is None or candidate < best:
+                best = candidate
+                if best[0] == 0:
+                    break
+        return best[1] if best else None
+
+# Compiled once at import
+RAW_TYPE_CLASSIFIER = KeywordClassifier(RAW_TYPE_TO_MAIN_TYPE.items())
+KEYWORD_CLASSIFIER = KeywordClassifier(
+    (keyword, main_type) for main_type, keywords in KEYWORDS_MAPPING.items() for keyword in keywords
+)
+
+def map_to_main_type(record, source_url=None, full_content=None):
+    """Enhanced type mapping with better pattern matching.
+    
+    full_content is the record's extract_all_text_content() output, if the
+    caller already has it; it is only needed for the content fallback.
+    """
     # Try to use explicit record_type/content_type/content_type_name
     for key in ['record_type', 'content_type', 'content_type_name', 'type']:
         val = record.get(key)
@@ -231,48 +392,21 @@ def map_to_main_type(record, source_url=None):
     title = record.get('title', '')
     title_lower = title.lower()
     
-    # Check for exact matches first
-    for raw, main in RAW_TYPE_TO_MAIN_TYPE.items():
-        if raw.lower() in title_lower:
-            return main
-    
-    # Check for partial matches and keywords
-    keywords_mapping = {
-        'circular': ['circular', 'notice', 'order', 'notification'],
-        'department': ['department', 'contact', 'officer', 'directory'],
-        'project': ['project', 'development', 'infrastructure', 'construction'],
-        'event': ['event', 'competition', 'exhibition', 'program', 'campaign'],
-        'news': ['news', 'update', 'press', 'announcement'],
-        'hospital': ['hospital', 'medical', 'health', 'clinic', 'blood bank'],
-        'school': ['school', 'education', 'academy', 'college'],
-        'service': ['service', 'online', 'application', 'portal', 'digital'],
-        'tax': ['tax', 'property tax', 'revenue', 'payment', 'bill'],
-        'utility': ['water', 'electricity', 'supply', 'utility'],
-        'waste': ['waste', 'garbage', 'sanitation', 'cleaning', 'plastic'],
-        'transport': ['transport', 'traffic', 'bus', 'parking'],
-        'construction': ['building', 'construction', 'permit', 'license'],
-    }
-    
-    for main_type, keywords in keywords_mapping.items():
-        for keyword in keywords:
-            if keyword in title_lower:
-                return main_type
+    # Check for exact matches first, then partial matches and keywords
+    main_type = RAW_TYPE_CLASSIFIER.classify(title_lower) or KEYWORD_CLASSIFIER.classify(title_lower)
+    if main_type:
+        return main_type
     
     # Try to use source_url
     if source_url:
-        url_lower = source_url.lower()
-        for raw, main in RAW_TYPE_TO_MAIN_TYPE.items():
-            if raw.lower() in url_lower:
-                return main
+        main_type = RAW_TYPE_CLASSIFIER.classify(source_url.lower())
+        if main_type:
+            return main_type
     
     # Fallback based on content analysis
-    all_text = extract_all_text_content(record).lower()
-    for main_type, keywords in keywords_mapping.items():
-        for keyword in keywords:
-            if keyword in all_text:
-                return main_type
-    
-    return 'other'
+    if full_content is None:
+        full_content = extract_all_text_content(record)
+    return KEYWORD_CLASSIFIER.classify(full_content.lower()) or 'other'
 
 def get_id(fields):
     """Generate a unique hash for a record based on key fields."""
@@ -324,95 +458,207 @@ def extract_from_node(node, source_url, lang):
     }
     
     # Add type assignment using enhanced mapping
-    main_type = map_to_main_type(node, source_url)
+    main_type = map_to_main_type(node, source_url, full_content)
     record['record_type'] = main_type
     record['type'] = main_type  # Alias for clarity
     
+    # Canonical date_iso/date_epoch, so retrieval sorts and filters by date without parsing
+    record.update(record_date_fields(record))
+    
     # Clean the record
     record = clean_dict(record)
     record['id'] = get_id(record)
     
     return record
 
+def iter_entry_nodes(entry):
+    """Yield the item nodes contained in one input line."""
+    # If the entry is a list, treat each item as a node
+    if isinstance(entry, list):
+        return entry
+    if 'raw' in entry:
+        raw = entry['raw']
+        if isinstance(raw, dict):
+            if 'data' in raw and 'nodes' in raw['data']:
+                return raw['data']['nodes']
+            if 'budgets' in raw:
+                return raw['budgets']
+            if 'election_level1' in raw:
+                return raw['election_level1']
+            return [raw]
+        if isinstance(raw, list):
+            return raw
+        return [raw]
+    return [entry]
+
+def iter_line_records(lines, lang):
+    """Stream normalized records from an iterable of JSONL input lines."""
+    for line in lines:
+        records = []
+        try:
+            entry = json.loads(line)
+            source_url = entry.get('source_url') if isinstance(entry, dict) else None
+            for node in iter_entry_nodes(entry):
+                record = extract_from_node(node, source_url, lang)
+                if record:
+                    records.append(record)
+        except Exception as e:
+            print(f'Error processing line: {e}')
+        yield from records
+
+def iter_file_records(input_path, lang):
+    """Stream normalized records from a file, one input line at a time."""
+    with open(input_path, 'r', encoding='utf-8') as f:
+        yield from iter_line_records(tqdm(f, desc=f'Processing {input_path}'), lang)
+
+def iter_shard_lines(input_path, start, end):
+    """Yield the lines whose first byte lies in [start, end) of a file."""
+    with open(input_path, 'rb') as f:
+        if start:
+            # Land on the first line starting at or after `start`
+            f.seek(start - 1)
+            f.readline()
+        while f.tell() < end:
+            line = f.readline()
+            if not line:
+                break
+            yield line.decode('utf-8')
+
+def plan_shards(data_dir, files, shard_size):
+    """Split the input files into (path, lang, start, end) byte ranges, in output order."""
+    shards = []
+    for fname in files:
+        path = os.path.join(data_dir, fname)
+        size = os.path.getsize(path)
+        lang = file_language(fname)
+        for start in range(0, max(size, 1), shard_size):
+            shards.append((path, lang, start, min(start + shard_size, size)))
+    return shards
+
+def normalize_shard(shard, tmp_dir):
+    """Worker: normalize one byte range into a temporary JSONL file.
+
+    Returns (shard, tmp_path, count, type_counts); records go to disk rather
+    than back through the pool, so memory per worker stays flat.
+    """
+    path, lang, start, end = shard
+    fd, tmp_path = tempfile.mkstemp(suffix='.jsonl', dir=tmp_dir)
+    os.close(fd)
+    count, type_counts = write_records(iter_line_records(iter_shard_lines(path, start, end), lang), tmp_path)
+    return shard, tmp_path, count, type_counts
+
+def normalize_parallel(data_dir, files, out_path, workers, shard_size):
+    """Normalize all files on a process pool; return (total, type_counts).
+
+    Shards are merged in input order, so the output is identical to a
+    single-process run.
+    """
+    shards = plan_shards(data_dir, files, shard_size)
+    total = 0
+    type_counts = {}
+    file_counts = {}
+    tmp_out = out_path + '.tmp'
+    with tempfile.TemporaryDirectory(dir=data_dir) as tmp_dir, open(tmp_out, 'wb') as out:
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            # map() yields results in submission order while workers run ahead
+            results = pool.map(normalize_shard, shards, [tmp_dir] * len(shards))
+            for shard, tmp_path, count, shard_types in tqdm(results, total=len(shards), desc='Merging shards'):
+                with open(tmp_path, 'rb') as f:
+                    while True:
+                        block = f.read(1 << 20)
+                        if not block:
+                            break
+                        out.write(block)
+                os.remove(tmp_path)
+                total += count
+                file_counts[shard[0]] = file_counts.get(shard[0], 0) + count
+                for rec_type, n in shard_types.items():
+                    type_counts[rec_type] = type_counts.get(rec_type, 0) + n
+    os.replace(tmp_out, out_path)
+    for path, count in file_counts.items():
+        print(f"Extracted {count} records from {os.path.basename(path)}")
+    return total, type_counts
+
 def process_file(input_path, lang):
     """Process a single file with enhanced error handling."""
-    output = []
-    with open(input_path, 'r', encoding='utf-8') as f:
-        for line in tqdm(f, desc=f'Processing {input_path}'):
-            try:
-                entry = json.loads(line)
-                source_url = entry.get('source_url') if isinstance(entry, dict) else None
-                nodes = []
-                
-                # If the entry is a list, treat each item as a node
-                if isinstance(entry, list):
-                    nodes = entry
-                elif 'raw' in entry:
-                    raw = entry['raw']
-                    if isinstance(raw, dict):
-                        if 'data' in raw and 'nodes' in raw['data']:
-                            nodes = raw['data']['nodes']
-                        elif 'budgets' in raw:
-                            nodes = raw['budgets']
-                        elif 'election_level1' in raw:
-                            nodes = raw['election_level1']
-                        else:
-                            nodes = [raw]
-                    elif isinstance(raw, list):
-                        nodes = raw
-                    else:
-                        nodes = [raw]
-                else:
-                    nodes = [entry]
-                
-                for node in nodes:
-                    record = extract_from_node(node, source_url, lang)
-                    if record:
-                        output.append(record)
-                        
-            except Exception as e:
-                print(f'Error processing line: {e}')
-                continue
-    
-    return output
+    return list(iter_file_records(input_path, lang))
+
+def list_input_files(data_dir):
+    """Raw crawler output files (everything except the normalized output)."""
+    return sorted(f for f in os.listdir(data_dir) if f.endswith('.jsonl') and not f.endswith('normalized.jsonl'))
+
+def file_language(fname):
+    return 'en' if 'en' in fname else 'mr' if 'mr' in fname else 'unknown'
+
+def write_records(records, out_path):
+    """Stream records to out_path as JSONL; return (total, type_counts).
+
+    Output goes to a temporary file that replaces out_path at the end, so an
+    interrupted run never leaves a truncated normalized file behind.
+    """
+    total = 0
+    type_counts = {}
+    tmp_path = out_path + '.tmp'
+    with open(tmp_path, 'w', encoding='utf-8') as out:
+        for rec in records:
+            out.write(json.dumps(rec, ensure_ascii=False) + '\n')
+            total += 1
+            rec_type = rec.get('record_type', 'unknown')
+            type_counts[rec_type] = type_counts.get(rec_type, 0) + 1
+    os.replace(tmp_path, out_path)
+    return total, type_counts
 
 def main():
     """Main function to process all data files."""
-    data_dir = 'data'
-    files = [f for f in os.listdir(data_dir) if f.endswith('.jsonl') and not f.endswith('normalized.jsonl')]
+    parser = argparse.ArgumentParser(description='Normalize crawled PMC data into pmc_data_normalized.jsonl')
+    parser.add_argument('--data-dir', default='data')
+    parser.add_argument('--workers', type=int, default=1,
+                        help='Worker processes (1 = single process, 0 = one per CPU core)')
+    parser.add_argument('--shard-size-mb', type=float, default=4,
+                        help='Byte range of input handed to a worker at a time')
+    args = parser.parse_args()
+    
+    data_dir = args.data_dir
+    files = list_input_files(data_dir)
     
     if not files:
         print("No input files found in data directory")
         return
     
-    all_records = []
-    
-    for fname in files:
-        lang = 'en' if 'en' in fname else 'mr' if 'mr' in fname else 'unknown'
-        print(f"\nProcessing {fname} (language: {lang})")
-        records = process_file(os.path.join(data_dir, fname), lang)
-        all_records.extend(records)
-        print(f"Extracted {len(records)} records from {fname}")
-    
-    # Write normalized output
     out_path = os.path.join(data_dir, 'pmc_data_normalized.jsonl')
-    with open(out_path, 'w', encoding='utf-8') as out:
-        for rec in all_records:
-            out.write(json.dumps(rec, ensure_ascii=False) + '\n')
+    workers = args.workers or os.cpu_count() or 1
+    if workers > 1:
+        print(f"Normalizing {len(files)} files with {workers} worker processes")
+        total, type_counts = normalize_parallel(
+            data_dir, files, out_path, workers, max(1, int(args.shard_size_mb * 1024 * 1024))
+        )
+    else:
+        total, type_counts = normalize_serial(data_dir, files, out_path)
     
     print(f'\nNormalization complete!')
-    print(f'Total records processed: {len(all_records)}')
+    print(f'Total records processed: {total}')
     print(f'Output written to: {out_path}')
     
     # Print some statistics
-    type_counts = {}
-    for rec in all_records:
-        rec_type = rec.get('record_type', 'unknown')
-        type_counts[rec_type] = type_counts.get(rec_type, 0) + 1
-    
     print(f'\nRecord type distribution:')
     for rec_type, count in sorted(type_counts.items(), key=lambda x: x[1], reverse=True):
         print(f'  {rec_type}: {count}')
 
+def normalize_serial(data_dir, files, out_path):
+    """Normalize all files in this process; return (total, type_counts)."""
+    # Records stream straight from the input files to the output, so memory
+    # stays flat regardless of corpus size
+    def all_records():
+        for fname in files:
+            lang = file_language(fname)
+            print(f"\nProcessing {fname} (language: {lang})")
+            count = 0
+            for record in iter_file_records(os.path.join(data_dir, fname), lang):
+                count += 1
+                yield record
+            print(f"Extracted {count} records from {fname}")
+    
+    return write_records(all_records(), out_path)
+
 if __name__ == '__main__':
-    main() 
\ No newline at end of file
+    main()
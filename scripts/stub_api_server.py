@@ -0,0 +1,322 @@
+#!/usr/bin/env python3
+"""
+Local OpenAI/Pinecone-compatible stub server for benchmarks and load tests.
+
+Implements just enough of the OpenAI REST API (``/v1/embeddings`` and
+``/v1/chat/completions``, including ``stream=True``) and the Pinecone data plane (``/query``,
+``/vectors/upsert``) to exercise the chatbot and ingestion code without network access or API
+cost. Embeddings are deterministic per input text, and an artificial
+latency can be injected per request or per route (plus per embedding input).
+A fraction of OpenAI requests can be rejected with 429 to exercise retry logic.
+
+The server is a small asyncio HTTP/1.1 implementation with keep-alive, so
+hundreds of concurrent connections cost no threads.
+
+Usage:
+    python scripts/stub_api_server.py --port 8100 --latency-ms 20
+    OPENAI_BASE_URL=http://127.0.0.1:8100/v1 OPENAI_API_KEY=stub \\
+    PINECONE_HOST=http://127.0.0.1:8100 PINECONE_API_KEY=stub python ...
+"""
+
+import argparse
+import asyncio
+import hashlib
+import json
+import multiprocessing
+import random
+import socket
+import threading
+import time
+
+DEFAULT_DIM = 1536
+STUB_ANSWER = "This is a stub answer from the local OpenAI server. See [PMC](https://www.pmc.gov.in/en)."
+REASONS = {200: 'OK', 404: 'Not Found', 429: 'Too Many Requests'}
+
+def stub_embedding(text, dim):
+    """Deterministic unit-length pseudo-embedding for a text"""
+    seed = int(hashlib.sha256(text.encode('utf-8')).hexdigest()[:16], 16)
+    rng = random.Random(seed)
+    vec = [rng.uniform(-1.0, 1.0) for _ in range(dim)]
+    norm = sum(v * v for v in vec) ** 0.5
+    return [v / norm for v in vec]
+
+class StubServer:
+    """Asyncio HTTP server answering OpenAI and Pinecone requests with canned data"""
+
+    def __init__(self, host='127.0.0.1', port=0, latency=0.0, dim=DEFAULT_DIM, route_latency=None,
+                 item_latency=0.0, fail_rate=0.0):
+        self.host = host
+        self.port = port
+        self.latency = latency
+        self.route_latency = route_latency or {}
+        self.item_latency = item_latency
+        self.fail_rate = fail_rate
+        self.dim = dim
+        self.request_count = 0
+        self.rejected_count = 0
+        self._server = None
+
+    @property
+    def host_url(self):
+        return f'http://{self.host}:{self.port}'
+
+    @property
+    def base_url(self):
+        return f'{self.host_url}/v1'
+
+    def latency_for(self, path):
+        """Per-route latency (matched by path suffix), falling back to the default"""
+        for suffix, latency in self.route_latency.items():
+            if path.endswith(suffix):
+                return latency
+        return self.latency
+
+    async def start(self):
+        # Load tests open hundreds of connections at once, so use a deep backlog
+        self._server = await asyncio.start_server(self._handle_connection, self.host, self.port, backlog=1024)
+        self.port = self._server.sockets[0].getsockname()[1]
+
+    async def close(self):
+        """Stop accepting connections and drop the open ones"""
+        self._server.close()
+        current = asyncio.current_task()
+        for task in asyncio.all_tasks():
+            if task is not current:
+                task.cancel()
+
+    async def serve_forever(self):
+        await self.start()
+        async with self._server:
+            await self._server.serve_forever()
+
+    async def _handle_connection(self, reader, writer):
+        sock = writer.get_extra_info('socket')
+        if sock is not None:
+            # Avoid Nagle/delayed-ACK stalls between the header and body writes
+            sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+        try:
+            while True:
+                request_line = await reader.readline()
+                if not request_line:
+                    break
+                method, path, _ = request_line.decode('latin-1').split(' ', 2)
+                headers = {}
+                while True:
+                    line = await reader.readline()
+                    if line in (b'\r\n', b'\n', b''):
+                        break
+                    name, _, value = line.decode('latin-1').partition(':')
+                    headers[name.strip().lower()] = value.strip()
+                length = int(headers.get('content-length', 0))
+                body = await reader.readexactly(length) if length else b''
+                request = json.loads(body) if body else {}
+
+                self.request_count += 1
+                latency = self.latency_for(path)
+                if path.endswith('/embeddings') and self.item_latency:
+                    inputs = request.get('input', '')
+                    latency += self.item_latency * (1 if isinstance(inputs, str) else len(inputs))
+                if self.fail_rate and path.startswith('/v1/') and random.random() < self.fail_rate:
+                    self.rejected_count += 1
+                    self._write_json(writer, 429, {'error': {'message': 'Rate limit reached (stub)', 'type': 'requests'}},
+                                     extra_headers={'Retry-After': '0'})
+                elif path.endswith('/chat/completions') and request.get('stream'):
+                    await self._stream_chat(writer, request, latency)
+                else:
+                    if latency:
+                        await asyncio.sleep(latency)
+                    status, payload = self.route(method, path, request)
+                    self._write_json(writer, status, payload)
+                await writer.drain()
+                if headers.get('connection', '').lower() == 'close':
+                    break
+        except (ConnectionError, asyncio.IncompleteReadError, asyncio.CancelledError):
+            pass
+        finally:
+            writer.close()
+
+    def _write_json(self, writer, status, payload, extra_headers=None):
+        body = json.dumps(payload).encode('utf-8')
+        extra = ''.join(f'{name}: {value}\r\n' for name, value in (extra_headers or {}).items())
+        head = (
+            f'HTTP/1.1 {status} {REASONS.get(status, "OK")}\r\n'
+            f'Content-Type: application/json\r\n'
+            f'Content-Length: {len(body)}\r\n'
+            f'{extra}'
+            f'Connection: keep-alive\r\n\r\n'
+        )
+        writer.write(head.encode('latin-1') + body)
+
+    async def _stream_chat(self, writer, request, latency):
+        """Stream STUB_ANSWER word by word as chat.completion.chunk SSE events,
+        spreading the route latency evenly across the tokens."""
+        writer.write(
+            b'HTTP/1.1 200 OK\r\n'
+            b'Content-Type: text/event-stream\r\n'
+            b'Transfer-Encoding: chunked\r\n'
+            b'Connection: keep-alive\r\n\r\n'
+        )
+        tokens = [word + ' ' for word in STUB_ANSWER.split(' ')]
+        tokens[-1] = tokens[-1].rstrip()
+
+        def write_chunk(data):
+            writer.write(f'{len(data):x}\r\n'.encode('latin-1') + data + b'\r\n')
+
+        for token in tokens:
+            if latency:
+                await asyncio.sleep(latency / len(tokens))
+            chunk = {
+                'id': 'chatcmpl-stub',
+                'object': 'chat.completion.chunk',
+                'created': int(time.time()),
+                'model': request.get('model', 'stub'),
+                'choices': [{'index': 0, 'delta': {'content': token}, 'finish_reason': None}]
+            }
+            write_chunk(f'data: {json.dumps(chunk)}\n\n'.encode('utf-8'))
+            await writer.drain()
+        write_chunk(b'data: [DONE]\n\n')
+        writer.write(b'0\r\n\r\n')
+
+    def route(self, method, path, request):
+        """Return (status, payload) for a request"""
+        if path.endswith('/embeddings'):
+            inputs = request.get('input', '')
+            if isinstance(inputs, str):
+                inputs = [inputs]
+            data = [
+                {'object': 'embedding', 'index': i, 'embedding': stub_embedding(text, self.dim)}
+                for i, text in enumerate(inputs)
+            ]
+            tokens = sum(len(text) // 4 + 1 for text in inputs)
+            return 200, {
+                'object': 'list',
+                'data': data,
+                'model': request.get('model', 'stub'),
+                'usage': {'prompt_tokens': tokens, 'total_tokens': tokens}
+            }
+        if path.endswith('/chat/completions'):
+            return 200, {
+                'id': 'chatcmpl-stub',
+                'object': 'chat.completion',
+                'created': int(time.time()),
+                'model': request.get('model', 'stub'),
+                'choices': [{
+                    'index': 0,
+                    'message': {'role': 'assistant', 'content': STUB_ANSWER},
+                    'finish_reason': 'stop'
+                }],
+                'usage': {'prompt_tokens': 0, 'completion_tokens': 0, 'total_tokens': 0}
+            }
+        if path.endswith('/query'):
+            top_k = int(request.get('topK', 10))
+            matches = [
+                {
+                    'id': f'stub-record-{i}',
+                    'score': 1.0 - i * 0.01,
+                    'metadata': {
+                        'title': f'Stub PMC record {i}',
+                        'description': 'Stub record returned by the local Pinecone server.',
+                        'date': f'{(i % 28) + 1:02d}/01/2024',
+                        'record_type': 'circular',
+                        'url': 'https://www.pmc.gov.in/en'
+                    }
+                }
+                for i in range(top_k)
+            ]
+            return 200, {'matches': matches, 'namespace': request.get('namespace', '')}
+        if path.endswith('/vectors/upsert'):
+            return 200, {'upsertedCount': len(request.get('vectors', []))}
+        return 404, {'error': {'message': f'Unknown path {path}'}}
+
+class _ThreadedStub:
+    """The stub server running on its own event loop in a daemon thread"""
+
+    def __init__(self, server):
+        self.server = server
+        self.loop = asyncio.new_event_loop()
+        started = threading.Event()
+
+        def run():
+            asyncio.set_event_loop(self.loop)
+            self.loop.run_until_complete(server.start())
+            started.set()
+            self.loop.run_forever()
+
+        self.thread = threading.Thread(target=run, daemon=True)
+        self.thread.start()
+        started.wait()
+
+    def __getattr__(self, name):
+        return getattr(self.server, name)
+
+    def shutdown(self):
+        asyncio.run_coroutine_threadsafe(self.server.close(), self.loop).result()
+        self.loop.call_soon_threadsafe(self.loop.stop)
+        self.thread.join()
+        self.loop.close()
+
+def start_stub_server(host='127.0.0.1', port=0, latency=0.0, dim=DEFAULT_DIM, route_latency=None,
+                      item_latency=0.0, fail_rate=0.0):
+    """Start the stub server on a background thread and return it"""
+    return _ThreadedStub(StubServer(host, port, latency=latency, dim=dim, route_latency=route_latency,
+                                    item_latency=item_latency, fail_rate=fail_rate))
+
+def _serve(host, port, latency, dim, route_latency, item_latency, fail_rate):
+    asyncio.run(StubServer(host, port, latency=latency, dim=dim, route_latency=route_latency,
+                           item_latency=item_latency, fail_rate=fail_rate).serve_forever())
+
+class StubServerProcess:
+    """The stub server in a child process, so it doesn't share the caller's GIL"""
+
+    def __init__(self, host='127.0.0.1', port=0, latency=0.0, dim=DEFAULT_DIM, route_latency=None,
+                 item_latency=0.0, fail_rate=0.0):
+        if not port:
+            # Reserve a free port for the child to bind
+            with socket.socket() as sock:
+                sock.bind((host, 0))
+                port = sock.getsockname()[1]
+        self.host_url = f'http://{host}:{port}'
+        self.base_url = f'{self.host_url}/v1'
+        self.process = multiprocessing.Process(
+            target=_serve, args=(host, port, latency, dim, route_latency, item_latency, fail_rate), daemon=True
+        )
+        self.process.start()
+        # Wait until the child accepts connections
+        deadline = time.time() + 10
+        while time.time() < deadline:
+            try:
+                socket.create_connection((host, port), timeout=0.2).close()
+                break
+            except OSError:
+                time.sleep(0.05)
+
+    def shutdown(self):
+        self.process.terminate()
+        self.process.join()
+
+def start_stub_server_process(host='127.0.0.1', port=0, latency=0.0, dim=DEFAULT_DIM, route_latency=None,
+                              item_latency=0.0, fail_rate=0.0):
+    """Start the stub server in a separate process and return a handle to it"""
+    return StubServerProcess(host=host, port=port, latency=latency, dim=dim, route_latency=route_latency,
+                             item_latency=item_latency, fail_rate=fail_rate)
+
+def main():
+    parser = argparse.ArgumentParser(description='Local OpenAI/Pinecone-compatible stub server')
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8100)
+    parser.add_argument('--latency-ms', type=float, default=0.0, help='Artificial latency per request')
+    parser.add_argument('--item-latency-ms', type=float, default=0.0, help='Extra latency per embedding input')
+    parser.add_argument('--fail-rate', type=float, default=0.0, help='Fraction of OpenAI requests rejected with 429')
+    parser.add_argument('--dim', type=int, default=DEFAULT_DIM, help='Embedding dimension')
+    args = parser.parse_args()
+
+    server = StubServer(args.host, args.port, latency=args.latency_ms / 1000.0, dim=args.dim,
+                        item_latency=args.item_latency_ms / 1000.0, fail_rate=args.fail_rate)
+    print(f'Stub server listening on {server.host_url} (OpenAI base URL: {server.base_url})')
+    try:
+        asyncio.run(server.serve_forever())
+    except KeyboardInterrupt:
+        print('\nStopping stub server')
+
+if __name__ == '__main__':
+    main()